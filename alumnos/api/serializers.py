@@ -199,3 +199,27 @@ class PartialViewAlumnoCursoSerializer(serializers.ModelSerializer):
             "alumno",
             "curso",
         ]
+
+
+class MateriaHistorialSerializer(serializers.Serializer):
+    materia = serializers.IntegerField()
+    nombre_materia = serializers.CharField()
+    promedio = serializers.FloatField()
+    nota_final = serializers.FloatField()
+
+
+class AnioHistorialSerializer(serializers.Serializer):
+    anio_lectivo = serializers.IntegerField()
+    nombre_anio_lectivo = serializers.CharField()
+    curso = serializers.IntegerField()
+    nombre_curso = serializers.CharField()
+    materias = MateriaHistorialSerializer(many=True)
+    promedio_general = serializers.FloatField(allow_null=True)
+    porcentaje_asistencia = serializers.FloatField(allow_null=True)
+    dias_lectivos = serializers.IntegerField()
+    porcentaje_dias_lectivos = serializers.FloatField(allow_null=True)
+
+
+class HistorialAlumnoSerializer(serializers.Serializer):
+    alumno = serializers.IntegerField()
+    anios = AnioHistorialSerializer(many=True)
@@ -5,6 +5,11 @@ urlpatterns = [
     path("", views.create_alumno, name="alumno-create"),
     path("list/", views.list_alumno, name="alumno-list"),
     path("<int:pk>/", views.mix_alumno, name="mix-alumno"),
+    path(
+        "<int:pk>/historial/",
+        views.historial_alumno_view,
+        name="alumno-historial",
+    ),
     path("curso/", views.create_alumno_curso, name="alumnocurso-create"),
     path(
         "curso/multiple/",
@@ -13,7 +13,9 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from ontrack import responses
 from users.models import User
-from alumnos.models import Alumno, AlumnoCurso
+from alumnos.models import Alumno, AlumnoCurso, invalidar_historiales
+from alumnos.historial import historial_alumno
+from calificaciones.models import invalidar_boletines
 from django.core.validators import validate_integer
 from itertools import chain
 from django.core.exceptions import ValidationError
@@ -28,6 +30,7 @@ class AlumnoViewSet(ModelViewSet):
     OK_VIEW = {200: serializers.ViewAlumnoSerializer()}
     OK_LIST = {200: serializers.ViewAlumnoSerializer(many=True)}
     OK_CREATED = {201: ""}
+    OK_HISTORIAL = {200: serializers.HistorialAlumnoSerializer()}
 
     anio_lectivo_parameter = openapi.Parameter(
         "anio_lectivo",
@@ -240,12 +243,38 @@ class AlumnoViewSet(ModelViewSet):
             data = serializer.errors
             return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(
+        operation_id="historial_alumno",
+        operation_description="""
+        Obtener el historial académico de un Alumno utilizando su id.
+        Por cada año lectivo que cursó se devuelve:
+        -  curso y año lectivo
+        -  materias (promedio y nota final de cada una, calculados igual que en promedio y nota-final)
+        -  promedio_general (promedio de las materias)
+        -  porcentaje_asistencia (sobre las asistencias cargadas)
+        -  porcentaje_dias_lectivos (sobre los días lectivos transcurridos)
+
+        Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
+        """,
+        responses={**OK_HISTORIAL, **responses.STANDARD_ERRORS},
+    )
+    def historial(self, request, pk=None):
+        alumno = get_object_or_404(
+            Alumno.objects.filter(institucion_id=request.user.institucion_id),
+            pk=pk,
+        )
+        serializer = serializers.HistorialAlumnoSerializer(
+            historial_alumno(alumno.pk)
+        )
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
 
 create_alumno = AlumnoViewSet.as_view({"post": "create"})
 list_alumno = AlumnoViewSet.as_view({"get": "list"})
 mix_alumno = AlumnoViewSet.as_view(
     {"get": "get", "patch": "update", "delete": "destroy"}
 )
+historial_alumno_view = AlumnoViewSet.as_view({"get": "historial"})
 
 
 def check_alumno_curso_no_seguimiento(id_alumno_curso_list):
@@ -526,6 +555,8 @@ class AlumnoCursoViewSet(ModelViewSet):
             )
 
         retrieved_alumno_curso.delete()
+        invalidar_boletines([retrieved_alumno_curso.curso_id])
+        invalidar_historiales([retrieved_alumno_curso.alumno_id])
         return Response(status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
@@ -587,6 +618,8 @@ class AlumnoCursoViewSet(ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
             serializer.save()
+            invalidar_boletines([curso.pk])
+            invalidar_historiales([alumno.pk])
             return Response(status=status.HTTP_201_CREATED)
         else:
             for item in serializer.errors.values():
@@ -711,6 +744,8 @@ class AlumnoCursoViewSet(ModelViewSet):
                 serializer.validated_data.remove(a)
 
             serializer.save()
+            invalidar_boletines([cursos[0].pk])
+            invalidar_historiales(a.pk for a in alumnos)
             return Response(status=status.HTTP_201_CREATED)
         else:
             values = [a.values() for a in serializer.errors]
@@ -764,6 +799,8 @@ class AlumnoCursoViewSet(ModelViewSet):
                 )
 
             AlumnoCurso.objects.filter(id__in=id_list).delete()
+            invalidar_boletines(ac.curso_id for ac in to_delete)
+            invalidar_historiales(ac.alumno_id for ac in to_delete)
 
             return Response(status=status.HTTP_200_OK)
 
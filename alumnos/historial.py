@@ -0,0 +1,105 @@
+"""
+Historial académico de un alumno: por cada año lectivo que cursó, el
+promedio y la nota final de cada materia y su porcentaje de asistencia.
+"""
+import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, FloatField, Sum
+from alumnos.models import AlumnoCurso, clave_version_historial
+from asistencias.models import Asistencia
+from calificaciones.models import Calificacion
+from ontrack.versiones import version
+
+HISTORIAL_CACHE_SEGUNDOS = getattr(
+    settings, "ALUMNOS_HISTORIAL_CACHE_SEGUNDOS", 3600
+)
+
+
+def historial_alumno(alumno):
+    """
+    Arma el historial con tres consultas sin importar la cantidad de años:
+    los cursos del alumno, sus calificaciones agrupadas por año lectivo y
+    materia, y sus asistencias agrupadas por AlumnoCurso. Queda cacheado
+    hasta que cambie algo del alumno (y hasta el día siguiente, porque los
+    días lectivos transcurridos cambian con la fecha).
+    """
+    hoy = datetime.date.today()
+    clave = "alumnos:historial:{}:{}:{}".format(
+        alumno, version(clave_version_historial(alumno)), hoy.isoformat()
+    )
+    historial = cache.get(clave)
+    if historial is not None:
+        return historial
+
+    alumnos_curso = list(
+        AlumnoCurso.objects.filter(alumno_id=alumno)
+        .select_related("anio_lectivo", "curso")
+        .order_by("anio_lectivo__fecha_desde", "id")
+    )
+    notas = {}
+    for nota in (
+        Calificacion.objects.filter(alumno_id=alumno)
+        .values("evaluacion__anio_lectivo_id", "evaluacion__materia_id")
+        .annotate(
+            nombre_materia=F("evaluacion__materia__nombre"),
+            promedio=Avg("puntaje"),
+            nota_final=Sum(
+                F("puntaje") * F("evaluacion__ponderacion"),
+                output_field=FloatField(),
+            ),
+        )
+        .order_by("nombre_materia")
+    ):
+        notas.setdefault(nota["evaluacion__anio_lectivo_id"], []).append(
+            {
+                "materia": nota["evaluacion__materia_id"],
+                "nombre_materia": nota["nombre_materia"],
+                "promedio": nota["promedio"],
+                "nota_final": nota["nota_final"],
+            }
+        )
+    asistencias = {
+        fila["alumno_curso_id"]: fila
+        for fila in Asistencia.objects.filter(alumno_curso__alumno_id=alumno)
+        .values("alumno_curso_id")
+        .annotate(total=Sum("asistio"), cantidad=Count("id"))
+        .order_by()
+    }
+
+    anios = []
+    for alumno_curso in alumnos_curso:
+        anio_lectivo = alumno_curso.anio_lectivo
+        materias = notas.get(anio_lectivo.id, [])
+        asistencia = asistencias.get(
+            alumno_curso.id, {"total": 0, "cantidad": 0}
+        )
+        # Igual que en el porcentaje de asistencia: sobre los días lectivos
+        # transcurridos, los días sin asistencia cargada cuentan como ausencias
+        dias_lectivos = anio_lectivo.cantidad_dias_lectivos(
+            None, min(anio_lectivo.fecha_hasta, hoy)
+        )
+        anios.append(
+            {
+                "anio_lectivo": anio_lectivo.id,
+                "nombre_anio_lectivo": anio_lectivo.nombre,
+                "curso": alumno_curso.curso_id,
+                "nombre_curso": alumno_curso.curso.nombre,
+                "materias": materias,
+                "promedio_general": sum(m["promedio"] for m in materias)
+                / len(materias)
+                if materias
+                else None,
+                "porcentaje_asistencia": asistencia["total"]
+                / asistencia["cantidad"]
+                if asistencia["cantidad"]
+                else None,
+                "dias_lectivos": dias_lectivos,
+                "porcentaje_dias_lectivos": asistencia["total"] / dias_lectivos
+                if dias_lectivos
+                else None,
+            }
+        )
+    historial = {"alumno": alumno, "anios": anios}
+    cache.set(clave, historial, HISTORIAL_CACHE_SEGUNDOS)
+    return historial
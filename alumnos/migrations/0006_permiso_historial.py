@@ -0,0 +1,17 @@
+# Generated by Django 3.0.8 on 2026-10-18 12:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0005_auto_20201023_2011'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='alumno',
+            options={'permissions': [('list_alumno', 'Puede listar alumnos'), ('historial_alumno', 'Puede consultar el historial académico de un alumno')]},
+        ),
+    ]
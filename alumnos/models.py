@@ -2,6 +2,7 @@ from django.db import models
 from curricula.models import Curso, AnioLectivo
 from instituciones.models import Institucion
 from django.core.exceptions import ValidationError
+from ontrack.versiones import incrementar_versiones
 import re
 
 NAME_REGEX = "[A-Za-z]{2,25}( [A-Za-z]{2,25})?"
@@ -88,7 +89,13 @@ class Alumno(models.Model):
         return self.nombre + " " + self.apellido
 
     class Meta:
-        permissions = [("list_alumno", "Puede listar alumnos")]
+        permissions = [
+            ("list_alumno", "Puede listar alumnos"),
+            (
+                "historial_alumno",
+                "Puede consultar el historial académico de un alumno",
+            ),
+        ]
 
 
 class AlumnoCurso(models.Model):
@@ -116,3 +123,17 @@ class AlumnoCurso(models.Model):
                 "Puede borrar multiples alumnocurso",
             ),
         ]
+
+
+def clave_version_historial(alumno):
+    return f"alumnos:historial:{alumno}:version"
+
+
+def invalidar_historiales(alumnos):
+    """
+    Invalida los historiales académicos cacheados de los alumnos, después de
+    un cambio en sus cursos, calificaciones o asistencias.
+    """
+    incrementar_versiones(
+        clave_version_historial(alumno) for alumno in set(alumnos)
+    )
@@ -11,9 +11,16 @@ from rest_framework.utils.serializer_helpers import ReturnList
 from unittest.mock import patch, Mock
 from curricula.models import Materia, Evaluacion
 from calificaciones.models import Calificacion
+from asistencias.models import Asistencia
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from ontrack.tests_utils import CACHE_LOCAL
+from django.test.utils import CaptureQueriesContext
 import datetime
 
 
+@override_settings(CACHES=CACHE_LOCAL)
 class AlumnoTests(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -456,6 +463,7 @@ class AlumnoTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+@override_settings(CACHES=CACHE_LOCAL)
 class AlumnoCursoTests(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -505,6 +513,11 @@ class AlumnoCursoTests(APITestCase):
                 name="Puede listar alumnocurso con evaluaciones"
             )
         )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(
+                name="Puede consultar el historial académico de un alumno"
+            )
+        )
         cls.group_admin.save()
 
         cls.group_docente = Group.objects.create(name="Docente")
@@ -1338,6 +1351,22 @@ class AlumnoCursoTests(APITestCase):
         response = self.client.get("/api/alumnos/curso/list/")
         self.assertEqual(response.data["count"], 5)
 
+    def test_destroy_alumno_curso_cache_caido(self):
+        """
+        Test de que el AlumnoCurso se borra aunque el cache no responda
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        with patch("ontrack.versiones.cache") as cache_caido:
+            cache_caido.add.side_effect = ConnectionError
+            with self.assertLogs("ontrack.versiones", level="ERROR"):
+                response = self.client.delete(
+                    f"/api/alumnos/curso/{self.curso_1.id}/"
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get("/api/alumnos/curso/list/")
+        self.assertEqual(response.data["count"], 5)
+
     def test_destroy_alumno_curso_admin_incorrect(self):
         """
         Test de borrado correcto de AlumnoCurso por admin incorrecto
@@ -1384,3 +1413,90 @@ class AlumnoCursoTests(APITestCase):
         response = self.client.delete("/api/alumnos/curso/20/")
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_historial_alumno(self):
+        """
+        Test del historial académico de un alumno: un elemento por año
+        lectivo con sus materias y su asistencia
+        """
+        cache.clear()
+        self.client.force_authenticate(user=self.user_admin)
+        for dia, asistio in ((4, 1), (5, 0)):
+            Asistencia.objects.create(
+                alumno_curso=self.alumno_curso_1,
+                fecha=datetime.date(2019, 3, dia),
+                asistio=asistio,
+            )
+        url = f"/api/alumnos/{self.alumno_1.id}/historial/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        anios = response.data["anios"]
+        self.assertEqual(
+            [a["anio_lectivo"] for a in anios],
+            [self.anio_lectivo_1.id, self.anio_lectivo_2.id],
+        )
+        self.assertEqual(anios[0]["curso"], self.curso_1.id)
+        self.assertEqual(len(anios[0]["materias"]), 1)
+        self.assertEqual(anios[0]["materias"][0]["promedio"], 65)
+        self.assertAlmostEqual(anios[0]["materias"][0]["nota_final"], 59)
+        self.assertEqual(anios[0]["promedio_general"], 65)
+        self.assertEqual(anios[0]["porcentaje_asistencia"], 0.5)
+        self.assertEqual(anios[1]["materias"], [])
+        self.assertIsNone(anios[1]["promedio_general"])
+        self.assertIsNone(anios[1]["porcentaje_asistencia"])
+
+    def test_historial_alumno_dos_cursos_mismo_anio(self):
+        """
+        Test de que un alumno con dos cursos en el mismo año lectivo no
+        duplica sus calificaciones en el historial
+        """
+        cache.clear()
+        self.client.force_authenticate(user=self.user_admin)
+        AlumnoCurso.objects.create(
+            alumno=self.alumno_1,
+            curso=self.curso_2,
+            anio_lectivo=self.anio_lectivo_1,
+        )
+        url = f"/api/alumnos/{self.alumno_1.id}/historial/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        anios = response.data["anios"]
+        self.assertEqual(len(anios), 3)
+        for anio in anios[:2]:
+            self.assertEqual(len(anio["materias"]), 1)
+            self.assertEqual(anio["materias"][0]["promedio"], 65)
+            self.assertAlmostEqual(anio["materias"][0]["nota_final"], 59)
+
+    # Los tests no confirman la transacción: el cache se invalida al guardar
+    @patch("asistencias.models.transaction.on_commit", lambda f: f())
+    def test_historial_alumno_cacheado(self):
+        """
+        Test de que el historial se sirve del cache y se invalida al cargar
+        una asistencia del alumno
+        """
+        cache.clear()
+        self.client.force_authenticate(user=self.user_admin)
+        url = f"/api/alumnos/{self.alumno_1.id}/historial/"
+        response = self.client.get(url)
+        self.assertIsNone(response.data["anios"][0]["porcentaje_asistencia"])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertFalse(
+            any(
+                "calificaciones_calificacion" in q["sql"]
+                for q in context.captured_queries
+            )
+        )
+
+        Asistencia.objects.create(
+            alumno_curso=self.alumno_curso_1,
+            fecha=datetime.date(2019, 3, 4),
+            asistio=1,
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.data["anios"][0]["porcentaje_asistencia"], 1)
+
+        response = self.client.get(f"/api/alumnos/{self.alumno_5.id}/historial/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
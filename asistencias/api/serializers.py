@@ -76,6 +76,8 @@ class ViewAsistenciaSerializer(serializers.ModelSerializer):
 
 class AsistenciaAnioLectivoSerializer(serializers.Serializer):
     porcentaje = serializers.FloatField()
+    dias_lectivos = serializers.IntegerField()
+    porcentaje_dias_lectivos = serializers.FloatField()
     alumno_curso = ViewAlumnoCursoSerializer(many=False)
     fecha_desde = serializers.DateField(
         required=False, format=settings.DATE_INPUT_FORMAT[0]
@@ -84,3 +86,104 @@ class AsistenciaAnioLectivoSerializer(serializers.Serializer):
         required=False, format=settings.DATE_INPUT_FORMAT[0]
     )
 
+
+class PorcentajeAlumnoCursoSerializer(serializers.Serializer):
+    alumno_curso = serializers.IntegerField(source="id")
+    alumno = serializers.IntegerField(source="alumno_id")
+    nombre = serializers.CharField(source="alumno__nombre")
+    apellido = serializers.CharField(source="alumno__apellido")
+    porcentaje = serializers.FloatField()
+    porcentaje_dias_lectivos = serializers.FloatField()
+    presentes = serializers.IntegerField()
+    ausentes = serializers.IntegerField()
+    ultima_ausencia = serializers.DateField(
+        format=settings.DATE_INPUT_FORMAT[0]
+    )
+
+
+class AsistenciaCursoSerializer(serializers.Serializer):
+    curso = serializers.IntegerField()
+    anio_lectivo = serializers.IntegerField()
+    fecha_desde = serializers.DateField(
+        required=False, format=settings.DATE_INPUT_FORMAT[0]
+    )
+    fecha_hasta = serializers.DateField(
+        required=False, format=settings.DATE_INPUT_FORMAT[0]
+    )
+    dias_lectivos = serializers.IntegerField()
+    alumnos = PorcentajeAlumnoCursoSerializer(many=True)
+
+
+class HeatmapAsistenciaSerializer(serializers.Serializer):
+    curso = serializers.IntegerField()
+    anio_lectivo = serializers.IntegerField()
+    alumnos_curso = serializers.ListField(child=serializers.IntegerField())
+    meses = serializers.ListField(child=serializers.CharField())
+    valores = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.FloatField(allow_null=True)
+        )
+    )
+
+
+class FaltanteAsistenciaSerializer(serializers.Serializer):
+    curso = serializers.IntegerField()
+    nombre = serializers.CharField()
+    fecha = serializers.DateField(format=settings.DATE_INPUT_FORMAT[0])
+    alumnos = serializers.IntegerField()
+    faltantes = serializers.IntegerField()
+
+
+class RiesgoAsistenciaSerializer(serializers.Serializer):
+    alumno_curso = serializers.IntegerField(source="alumno_curso_id")
+    alumno = serializers.IntegerField(source="alumno_curso__alumno_id")
+    nombre = serializers.CharField(source="alumno_curso__alumno__nombre")
+    apellido = serializers.CharField(source="alumno_curso__alumno__apellido")
+    curso = serializers.IntegerField(source="alumno_curso__curso_id")
+    racha_actual = serializers.IntegerField()
+    racha_maxima = serializers.IntegerField()
+    ultima_presencia = serializers.DateField(
+        format=settings.DATE_INPUT_FORMAT[0]
+    )
+    ultima_fecha = serializers.DateField(format=settings.DATE_INPUT_FORMAT[0])
+
+
+class MatrizAsistenciaSerializer(serializers.Serializer):
+    curso = serializers.PrimaryKeyRelatedField(
+        queryset=Curso.objects.all(), many=False, required=True
+    )
+    fechas = serializers.ListField(
+        child=serializers.DateField(input_formats=settings.DATE_INPUT_FORMAT),
+        allow_empty=False,
+    )
+    alumnos_curso = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False
+    )
+    valores = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.FloatField(
+                allow_null=True, min_value=0, max_value=1
+            )
+        )
+    )
+
+    def validate(self, data):
+        """
+        Verificar que la matriz tenga una fila por alumno y una columna por
+        fecha, sin alumnos ni fechas repetidos
+        """
+        if len(set(data["fechas"])) != len(data["fechas"]):
+            raise serializers.ValidationError(
+                "No se pueden repetir fechas en una misma carga"
+            )
+        if len(set(data["alumnos_curso"])) != len(data["alumnos_curso"]):
+            raise serializers.ValidationError(
+                "No se pueden repetir alumnos en una misma carga"
+            )
+        if len(data["valores"]) != len(data["alumnos_curso"]) or any(
+            len(fila) != len(data["fechas"]) for fila in data["valores"]
+        ):
+            raise serializers.ValidationError(
+                "La matriz debe tener una fila por alumno y una columna por fecha"
+            )
+        return data
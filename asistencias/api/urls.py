@@ -15,4 +15,24 @@ urlpatterns = [
         views.hoy_asistencia_anio_lectivo,
         name="asistencia-anio-lectivo-hoy",
     ),
+    path(
+        "stats/porcentaje/curso/",
+        views.porcentaje_asistencia_curso,
+        name="asistencia-porcentaje-curso",
+    ),
+    path(
+        "stats/heatmap/", views.heatmap_asistencia, name="asistencia-heatmap",
+    ),
+    path(
+        "stats/riesgo/", views.riesgo_asistencia, name="asistencia-riesgo",
+    ),
+    path("matriz/", views.matriz_asistencia, name="asistencia-matriz"),
+    path(
+        "exportar/", views.exportar_asistencia, name="asistencia-exportar",
+    ),
+    path(
+        "faltantes/",
+        views.faltantes_asistencia,
+        name="asistencia-faltantes",
+    ),
 ]
@@ -15,18 +15,118 @@ from users.models import User
 from alumnos.models import Alumno, AlumnoCurso
 from django.core.validators import validate_integer
 from asistencias.api import serializers
-from asistencias.models import Asistencia
+from asistencias.models import (
+    Asistencia,
+    RachaAsistencia,
+    ResumenMensualAsistencia,
+    acumulado_asistencia,
+    cursos_sin_asistencia,
+    guardar_asistencias,
+    porcentaje_asistencia,
+    reconstruir_acumulados,
+)
 from itertools import chain
 import re
+import csv
+import io
 import datetime
-from django.db.models import Avg
-import django_rq
-from asistencias.rq_funcions import alumno_asistencia_redesign
-from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from itertools import groupby
+from objetivos.recalculo import recalcular_asistencia, recalcular_asistencias
 
 DATE_REGEX = r"(?:(?:31(\/|-|\.)(?:0?[13578]|1[02]))\1|(?:(?:29|30)(\/|-|\.)(?:0?[13-9]|1[0-2])\2))(?:(?:1[6-9]|[2-9]\d)?\d{2})$|^(?:29(\/|-|\.)0?2\3(?:(?:(?:1[6-9]|[2-9]\d)?(?:0[48]|[2468][048]|[13579][26])|(?:(?:16|[2468][048]|[3579][26])00))))$|^(?:0?[1-9]|1\d|2[0-8])(\/|-|\.)(?:(?:0?[1-9])|(?:1[0-2]))\4(?:(?:1[6-9]|[2-9]\d)?\d{2})"
 
 
+def motivo_dia_no_lectivo(anio_lectivo, fecha):
+    """
+    Devuelve por qué no se puede cargar asistencia en la fecha, o None si
+    es un día lectivo del Año Lectivo según su calendario.
+    """
+    if (
+        anio_lectivo.fecha_desde < fecha < anio_lectivo.fecha_hasta
+        and anio_lectivo.es_dia_lectivo(fecha)
+    ):
+        return None
+    if fecha.weekday() >= 5 and not anio_lectivo.es_dia_lectivo(fecha):
+        return "No se pueden cargar asistencias para fines de semana"
+    if not anio_lectivo.fecha_desde < fecha < anio_lectivo.fecha_hasta:
+        return "La fecha especificada no se encuentra dentro del Año Lectivo"
+    return "No se pueden cargar asistencias para días no lectivos"
+
+
+def leer_matriz_csv(archivo, curso):
+    """
+    Convierte un CSV con encabezado alumno_curso,<fecha>,<fecha>... y una
+    fila por alumno en los datos que espera MatrizAsistenciaSerializer.
+    Las celdas vacías no cargan asistencia.
+    """
+    filas = csv.reader(io.TextIOWrapper(archivo, encoding="utf-8-sig"))
+    encabezado = next(filas, [])
+    filas = [fila for fila in filas if fila]
+    return {
+        "curso": curso,
+        "fechas": [fecha.strip() for fecha in encabezado[1:]],
+        "alumnos_curso": [fila[0].strip() for fila in filas],
+        "valores": [
+            [valor.strip() or None for valor in fila[1:]] for fila in filas
+        ],
+    }
+
+
+class Echo:
+    """
+    Buffer que devuelve lo que se le escribe, para que csv.writer genere
+    las líneas de a una sin acumularlas.
+    """
+
+    def write(self, value):
+        return value
+
+
+def filas_exportacion(asistencias):
+    """
+    Genera el encabezado y una fila por alumno con sus asistencias por fecha.
+    Las asistencias se recorren con un cursor del lado del servidor ordenadas
+    por alumno, así que sólo se tiene en memoria la fila del alumno actual.
+    """
+    fechas = list(
+        asistencias.order_by("fecha")
+        .values_list("fecha", flat=True)
+        .distinct()
+    )
+    columnas = {fecha: i for i, fecha in enumerate(fechas)}
+    yield ["alumno_curso", "apellido", "nombre"] + [
+        fecha.strftime("%d/%m/%Y") for fecha in fechas
+    ]
+
+    filas = (
+        asistencias.order_by(
+            "alumno_curso__alumno__apellido",
+            "alumno_curso__alumno__nombre",
+            "alumno_curso_id",
+            "fecha",
+        )
+        .values_list(
+            "alumno_curso_id",
+            "alumno_curso__alumno__apellido",
+            "alumno_curso__alumno__nombre",
+            "fecha",
+            "asistio",
+        )
+        .iterator(chunk_size=2000)
+    )
+    for (alumno_curso, apellido, nombre), asistencias_alumno in groupby(
+        filas, key=lambda fila: fila[:3]
+    ):
+        valores = [None] * len(fechas)
+        for *_, fecha, asistio in asistencias_alumno:
+            valores[columnas[fecha]] = asistio
+        yield [alumno_curso, apellido, nombre] + valores
+
+
 class AsistenciaViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated, permission_required("asistencia")]
     OK_EMPTY = {200: ""}
@@ -36,6 +136,12 @@ class AsistenciaViewSet(ModelViewSet):
     OK_VIEW_PORCENTAJE = {
         200: serializers.AsistenciaAnioLectivoSerializer(many=True)
     }
+    OK_VIEW_PORCENTAJE_CURSO = {200: serializers.AsistenciaCursoSerializer()}
+    OK_VIEW_HEATMAP = {200: serializers.HeatmapAsistenciaSerializer()}
+    OK_LIST_RIESGO = {200: serializers.RiesgoAsistenciaSerializer(many=True)}
+    OK_LIST_FALTANTES = {
+        200: serializers.FaltanteAsistenciaSerializer(many=True)
+    }
 
     alumno_curso_parameter = openapi.Parameter(
         "alumno_curso",
@@ -88,6 +194,54 @@ class AsistenciaViewSet(ModelViewSet):
         pattern="DD-MM-YYYY",
     )
 
+    curso_parameter_riesgo = openapi.Parameter(
+        "curso",
+        openapi.IN_QUERY,
+        description="Id del Curso por el que queremos filtrar. Si no se pasa, se consulta toda la institución",
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    )
+
+    anio_lectivo_parameter_riesgo = openapi.Parameter(
+        "anio_lectivo",
+        openapi.IN_QUERY,
+        description="Id del AnioLectivo por el que queremos filtrar",
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    )
+
+    minimo_parameter = openapi.Parameter(
+        "minimo",
+        openapi.IN_QUERY,
+        description="Cantidad mínima de ausencias consecutivas. Por defecto 3",
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    )
+
+    actualizar_parameter = openapi.Parameter(
+        "actualizar",
+        openapi.IN_QUERY,
+        description="Si es true, sobrescribe las asistencias ya cargadas en lugar de rechazar la carga",
+        type=openapi.TYPE_BOOLEAN,
+        required=False,
+    )
+
+    curso_parameter_porcentaje = openapi.Parameter(
+        "curso",
+        openapi.IN_QUERY,
+        description="Id del Curso del cual queremos los porcentajes de asistencias",
+        type=openapi.TYPE_INTEGER,
+        required=True,
+    )
+
+    anio_lectivo_parameter_porcentaje = openapi.Parameter(
+        "anio_lectivo",
+        openapi.IN_QUERY,
+        description="Id del AnioLectivo del cual queremos los porcentajes de asistencias",
+        type=openapi.TYPE_INTEGER,
+        required=True,
+    )
+
     fecha_hasta_parameter_porcentaje = openapi.Parameter(
         "fecha_hasta",
         openapi.IN_QUERY,
@@ -277,13 +431,12 @@ class AsistenciaViewSet(ModelViewSet):
             asistencia_retrieved.descripcion = serializer.validated_data.get(
                 "descripcion", asistencia_retrieved.descripcion
             )
-            asistencia_retrieved.save()
-            django_rq.enqueue(
-                alumno_asistencia_redesign,
-                asistencia_retrieved.alumno_curso.alumno.id,
-                timezone.now(),
-                asistencia_retrieved.fecha,
-            )
+            with transaction.atomic():
+                asistencia_retrieved.save()
+                recalcular_asistencia(
+                    asistencia_retrieved.alumno_curso.alumno.id,
+                    asistencia_retrieved.fecha,
+                )
             return Response(status=status.HTTP_200_OK)
         else:
             return Response(
@@ -304,13 +457,9 @@ class AsistenciaViewSet(ModelViewSet):
             return Response(status=status.HTTP_404_NOT_FOUND,)
         alumno_id = retrieved_asistencia.alumno_curso.alumno.id
         retrieved_asistencia_fecha = retrieved_asistencia.fecha
-        retrieved_asistencia.delete()
-        django_rq.enqueue(
-            alumno_asistencia_redesign,
-            alumno_id,
-            timezone.now(),
-            retrieved_asistencia_fecha,
-        )
+        with transaction.atomic():
+            retrieved_asistencia.delete()
+            recalcular_asistencia(alumno_id, retrieved_asistencia_fecha)
         return Response(status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
@@ -335,48 +484,29 @@ class AsistenciaViewSet(ModelViewSet):
                     data={"detail": "No encontrado."},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            if serializer.validated_data["fecha"].weekday() >= 5:
-                return Response(
-                    data={
-                        "detail": "No se pueden cargar asistencias para fines de semana"
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            if not (
-                serializer.validated_data[
-                    "alumno_curso"
-                ].anio_lectivo.fecha_desde
-                < serializer.validated_data["fecha"]
-                < serializer.validated_data[
-                    "alumno_curso"
-                ].anio_lectivo.fecha_hasta
-            ):
+            motivo = motivo_dia_no_lectivo(
+                serializer.validated_data["alumno_curso"].anio_lectivo,
+                serializer.validated_data["fecha"],
+            )
+            if motivo:
                 return Response(
-                    data={
-                        "detail": "La fecha especificada no se encuentra dentro del Año Lectivo"
-                    },
+                    data={"detail": motivo},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            asistencias_existentes = Asistencia.objects.filter(
-                fecha__exact=serializer.validated_data["fecha"],
-                alumno_curso__id__exact=serializer.validated_data[
-                    "alumno_curso"
-                ].id,
-            )
-            if len(asistencias_existentes) != 0:
+            try:
+                with transaction.atomic():
+                    serializer.save()
+                    recalcular_asistencia(
+                        serializer.validated_data["alumno_curso"].alumno.id,
+                        serializer.validated_data["fecha"],
+                    )
+            except IntegrityError:
                 return Response(
                     data={
                         "detail": "Ya existen una asistencia cargada para el alumno en el día especificado. Se debe modificar o borrar dicha asistencia"
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            serializer.save()
-            django_rq.enqueue(
-                alumno_asistencia_redesign,
-                serializer.validated_data["alumno_curso"].alumno.id,
-                timezone.now(),
-                serializer.validated_data["fecha"],
-            )
             return Response(status=status.HTTP_201_CREATED)
         else:
             for value in serializer.errors.values():
@@ -405,10 +535,14 @@ class AsistenciaViewSet(ModelViewSet):
         -  No se puede pasar una lista vacía
         -  No se pueden cargar asistencias de cursos distintos al mismo tiempo
         -  No se pueden cargar asistencias para distintas fechas al mismo tiempo
-        -  No se pueden cargar asistencias para fines de semana
+        -  No se pueden cargar asistencias para fines de semana ni para feriados o recesos del calendario de la institución
         -  No se pueden cargar asistencias para fechas fuera del rango del Año Lectivo
         -  No se puede cargar una asistencia si ya existe una asistencia para un alumno_curso de la lista. En este caso se debe borrar o modificar la asistencia a través de otros endpoints.
+
+        Si se pasa el query_param actualizar=true, las asistencias ya cargadas para el día se sobrescriben en lugar de rechazarse.
+        Sólo se recalculan los objetivos de los alumnos cuyo valor de asistencia cambió.
         """,
+        manual_parameters=[actualizar_parameter],
         request_body=serializers.CreateAsistenciaSerializer(many=True),
         responses={**OK_CREATED, **responses.STANDARD_ERRORS},
     )
@@ -469,53 +603,66 @@ class AsistenciaViewSet(ModelViewSet):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            if serializer.validated_data[0]["fecha"].weekday() >= 5:
+            motivo = motivo_dia_no_lectivo(
+                serializer.validated_data[0]["alumno_curso"].anio_lectivo,
+                serializer.validated_data[0]["fecha"],
+            )
+            if motivo:
                 return Response(
-                    data={
-                        "detail": "No se pueden cargar asistencias para fines de semana"
-                    },
+                    data={"detail": motivo},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            if not (
-                serializer.validated_data[0][
-                    "alumno_curso"
-                ].anio_lectivo.fecha_desde
-                < serializer.validated_data[0]["fecha"]
-                < serializer.validated_data[0][
-                    "alumno_curso"
-                ].anio_lectivo.fecha_hasta
-            ):
-                return Response(
-                    data={
-                        "detail": "La fecha especificada no se encuentra dentro del Año Lectivo"
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            asistencias_existentes = Asistencia.objects.filter(
-                fecha__exact=serializer.validated_data[0]["fecha"],
-                alumno_curso__id__in=[
-                    a.get("alumno_curso").id for a in serializer.validated_data
-                ],
-            )
-            if len(asistencias_existentes) != 0:
+            fecha = serializer.validated_data[0]["fecha"]
+            alumnos_id = {
+                asis["alumno_curso"].id: asis["alumno_curso"].alumno_id
+                for asis in serializer.validated_data
+            }
+            if request.query_params.get("actualizar", None) == "true":
+                # Sobrescribe el día completo en una sola sentencia y
+                # recalcula sólo los alumnos cuyo valor cambió
+                with transaction.atomic():
+                    cambios = guardar_asistencias(
+                        [
+                            (
+                                asis["alumno_curso"].id,
+                                asis["fecha"],
+                                asis["asistio"],
+                                asis.get("descripcion", None),
+                            )
+                            for asis in serializer.validated_data
+                        ]
+                    )
+                    alumnos_curso = set(ac for ac, _ in cambios)
+                    if alumnos_curso:
+                        reconstruir_acumulados(alumnos_curso)
+                        recalcular_asistencias(
+                            set(alumnos_id[ac] for ac in alumnos_curso), fecha
+                        )
+                return Response(status=status.HTTP_201_CREATED)
+            try:
+                # Una sola inserción y un solo recálculo de los acumulados
+                # para todo el día, en lugar de uno por asistencia
+                with transaction.atomic():
+                    Asistencia.objects.bulk_create(
+                        [
+                            Asistencia(
+                                alumno_curso=asis["alumno_curso"],
+                                fecha=asis["fecha"],
+                                asistio=asis["asistio"],
+                                descripcion=asis.get("descripcion", None),
+                            )
+                            for asis in serializer.validated_data
+                        ]
+                    )
+                    reconstruir_acumulados(alumnos_id.keys())
+                    recalcular_asistencias(set(alumnos_id.values()), fecha)
+            except IntegrityError:
                 return Response(
                     data={
                         "detail": "Ya existen asistencias cargadas para algun alumno de los listados en el día especificado. Se debe modificar o borrar dicha asistencia"
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            alumnos_id = set(
-                asis["alumno_curso"].alumno.id
-                for asis in serializer.validated_data
-            )
-            for alum in alumnos_id:
-                django_rq.enqueue(
-                    alumno_asistencia_redesign,
-                    alum,
-                    timezone.now(),
-                    max(a["fecha"] for a in serializer.validated_data),
-                )
-            serializer.save()
             return Response(status=status.HTTP_201_CREATED)
         else:
             values = [a.values() for a in serializer.errors]
@@ -655,13 +802,15 @@ class AsistenciaViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        alumnos_id = set(asis.alumno_curso.alumno.id for asis in queryset)
-
-        queryset.delete()
+        afectados = set(
+            queryset.values_list("alumno_curso_id", "alumno_curso__alumno_id")
+        )
 
-        for alum in alumnos_id:
-            django_rq.enqueue(
-                alumno_asistencia_redesign, alum, timezone.now(), fecha_desde,
+        with transaction.atomic():
+            queryset.delete()
+            reconstruir_acumulados(set(ac for ac, _ in afectados))
+            recalcular_asistencias(
+                set(alumno for _, alumno in afectados), fecha_desde
             )
         return Response(status=status.HTTP_200_OK)
 
@@ -672,6 +821,9 @@ class AsistenciaViewSet(ModelViewSet):
         Es necesario ingresar el alumno_curso, sobre el cual se obtiene el porcentaje calculado desde el inicio al fin del AnioLectivo.
         Se puede refinar el porcentaje pasando los parámetros fecha_desde y fecha_hasta (con valores dentro del AnioLectivo). En este
         caso, es necesario pasar ambas fechas, o ninguna.
+        El porcentaje se calcula sobre los días con asistencia cargada. Además se devuelven los dias_lectivos transcurridos
+        en el rango según el calendario de la institución, y el porcentaje_dias_lectivos, en el que los días lectivos sin
+        asistencia cargada cuentan como ausencias.
 
         Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
         """,
@@ -684,10 +836,6 @@ class AsistenciaViewSet(ModelViewSet):
     )
     @action(detail=False, methods=["GET"], name="porcentaje")
     def porcentaje(self, request, pk=None):
-        queryset = Asistencia.objects.filter(
-            alumno_curso__alumno__institucion__exact=request.user.institucion
-        )
-
         alumno_curso = request.query_params.get("alumno_curso", None)
         fecha_desde = request.query_params.get("fecha_desde", None)
         fecha_hasta = request.query_params.get("fecha_hasta", None)
@@ -711,7 +859,6 @@ class AsistenciaViewSet(ModelViewSet):
                     data={"detail": "No encontrado."},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            queryset = queryset.filter(alumno_curso__exact=alumno_curso)
 
         if (fecha_desde and not fecha_hasta) or (
             fecha_hasta and not fecha_desde
@@ -743,7 +890,6 @@ class AsistenciaViewSet(ModelViewSet):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            queryset = queryset.filter(fecha__gte=fecha_desde)
 
         if fecha_hasta:
             if not re.compile(DATE_REGEX).match(fecha_hasta):
@@ -767,7 +913,6 @@ class AsistenciaViewSet(ModelViewSet):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            queryset = queryset.filter(fecha__lte=fecha_hasta)
 
             if fecha_hasta <= fecha_desde:
                 return Response(
@@ -775,10 +920,29 @@ class AsistenciaViewSet(ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        porcentaje = queryset.aggregate(Avg("asistio"))["asistio__avg"]
+        # Dos búsquedas sobre las sumas acumuladas en lugar de promediar
+        porcentaje = porcentaje_asistencia(
+            alumno_curso.id, fecha_desde, fecha_hasta
+        )
+        # Sobre los días lectivos transcurridos del calendario, los días sin
+        # asistencia cargada cuentan como ausencias
+        hasta_hoy = min(
+            fecha_hasta or alumno_curso.anio_lectivo.fecha_hasta,
+            datetime.date.today(),
+        )
+        dias_lectivos = alumno_curso.anio_lectivo.cantidad_dias_lectivos(
+            fecha_desde, hasta_hoy
+        )
+        total, _ = acumulado_asistencia(
+            alumno_curso.id, fecha_desde, hasta_hoy
+        )
 
         data = {
             "porcentaje": porcentaje if porcentaje else 0.0,
+            "dias_lectivos": dias_lectivos,
+            "porcentaje_dias_lectivos": total / dias_lectivos
+            if dias_lectivos
+            else 0.0,
             "alumno_curso": alumno_curso,
             "fecha_desde": fecha_desde if fecha_desde else None,
             "fecha_hasta": fecha_hasta if fecha_hasta else None,
@@ -789,6 +953,596 @@ class AsistenciaViewSet(ModelViewSet):
         )
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(
+        operation_id="get_porcentaje_asistencias_curso",
+        operation_description="""
+        Obtener el porcentaje de asistencias de todos los alumnos de un curso en un Año Lectivo.
+        Para cada alumno se devuelve el porcentaje, la cantidad de presentes (asistio mayor a 0), la cantidad de ausentes
+        (asistio igual a 0) y la fecha de la última ausencia.
+        También se devuelven los dias_lectivos transcurridos según el calendario de la institución y, para cada alumno,
+        el porcentaje_dias_lectivos, en el que los días lectivos sin asistencia cargada cuentan como ausencias.
+        Es necesario ingresar el curso y el anio_lectivo. Se puede refinar el cálculo pasando los parámetros fecha_desde
+        y fecha_hasta (con valores dentro del AnioLectivo). En este caso, es necesario pasar ambas fechas, o ninguna.
+
+        Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
+        """,
+        manual_parameters=[
+            curso_parameter_porcentaje,
+            anio_lectivo_parameter_porcentaje,
+            fecha_desde_parameter_porcentaje,
+            fecha_hasta_parameter_porcentaje,
+        ],
+        responses={**OK_VIEW_PORCENTAJE_CURSO, **responses.STANDARD_ERRORS},
+    )
+    @action(detail=False, methods=["GET"], name="porcentaje_curso")
+    def porcentaje_curso(self, request):
+        curso = request.query_params.get("curso", None)
+        anio_lectivo = request.query_params.get("anio_lectivo", None)
+        fecha_desde = request.query_params.get("fecha_desde", None)
+        fecha_hasta = request.query_params.get("fecha_hasta", None)
+
+        if not curso or not anio_lectivo:
+            return Response(
+                data={
+                    "detail": "Es necesario ingresar un curso y un anio_lectivo"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not curso.isnumeric() or not anio_lectivo.isnumeric():
+            return Response(
+                data={
+                    "detail": "Los valores de curso y anio_lectivo deben ser numéricos"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        curso = get_object_or_404(
+            Curso.objects.filter(
+                anio__carrera__institucion=request.user.institucion
+            ),
+            pk=int(curso),
+        )
+        anio_lectivo = get_object_or_404(
+            AnioLectivo.objects.filter(institucion=request.user.institucion),
+            pk=int(anio_lectivo),
+        )
+
+        if (fecha_desde and not fecha_hasta) or (
+            fecha_hasta and not fecha_desde
+        ):
+            return Response(
+                data={"detail": "Es necesario ingresar un rango de fechas"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rango = Q()
+        if fecha_desde:
+            if not re.compile(DATE_REGEX).match(
+                fecha_desde
+            ) or not re.compile(DATE_REGEX).match(fecha_hasta):
+                return Response(
+                    data={
+                        "detail": "La fecha ingresada no está correctamente expresada"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            temp = fecha_desde.split("-")
+            fecha_desde = datetime.date(
+                int(temp[2]), int(temp[1]), int(temp[0])
+            )
+            temp = fecha_hasta.split("-")
+            fecha_hasta = datetime.date(
+                int(temp[2]), int(temp[1]), int(temp[0])
+            )
+            if not (
+                anio_lectivo.fecha_desde
+                <= fecha_desde
+                < fecha_hasta
+                <= anio_lectivo.fecha_hasta
+            ):
+                return Response(
+                    data={
+                        "detail": "Las fechas ingresadas son inválidas o no se encuentran en el rango del AnioLectivo"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            rango = Q(asistencia__fecha__gte=fecha_desde) & Q(
+                asistencia__fecha__lte=fecha_hasta
+            )
+
+        hasta_hoy = min(
+            fecha_hasta or anio_lectivo.fecha_hasta, datetime.date.today()
+        )
+        dias_lectivos = anio_lectivo.cantidad_dias_lectivos(
+            fecha_desde, hasta_hoy
+        )
+
+        # Una sola consulta agrupada por AlumnoCurso para todo el curso
+        ausente = rango & Q(asistencia__asistio=0)
+        alumnos = (
+            AlumnoCurso.objects.filter(curso=curso, anio_lectivo=anio_lectivo)
+            .values("id", "alumno_id", "alumno__nombre", "alumno__apellido")
+            .annotate(
+                porcentaje=Coalesce(
+                    Avg("asistencia__asistio", filter=rango), 0.0
+                ),
+                presentes=Count(
+                    "asistencia", filter=rango & Q(asistencia__asistio__gt=0)
+                ),
+                ausentes=Count("asistencia", filter=ausente),
+                ultima_ausencia=Max("asistencia__fecha", filter=ausente),
+                total=Coalesce(
+                    Sum(
+                        "asistencia__asistio",
+                        filter=rango & Q(asistencia__fecha__lte=hasta_hoy),
+                    ),
+                    0.0,
+                ),
+            )
+            .order_by("alumno__apellido", "alumno__nombre")
+        )
+        for alumno in alumnos:
+            alumno["porcentaje_dias_lectivos"] = (
+                alumno["total"] / dias_lectivos if dias_lectivos else 0.0
+            )
+
+        data = {
+            "curso": curso.id,
+            "anio_lectivo": anio_lectivo.id,
+            "fecha_desde": fecha_desde,
+            "fecha_hasta": fecha_hasta,
+            "dias_lectivos": dias_lectivos,
+            "alumnos": alumnos,
+        }
+        serializer = serializers.AsistenciaCursoSerializer(data, many=False)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_id="get_heatmap_asistencias_curso",
+        operation_description="""
+        Obtener el porcentaje de asistencias de cada alumno de un curso en cada mes del Año Lectivo.
+        Es necesario ingresar el curso y el anio_lectivo.
+        La respuesta es compacta: alumnos_curso contiene los ids de AlumnoCurso (ordenados por apellido y nombre),
+        meses las etiquetas MM/YYYY, y valores una fila por alumno con un valor por mes (null si no hay asistencias).
+
+        Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
+        """,
+        manual_parameters=[
+            curso_parameter_porcentaje,
+            anio_lectivo_parameter_porcentaje,
+        ],
+        responses={**OK_VIEW_HEATMAP, **responses.STANDARD_ERRORS},
+    )
+    @action(detail=False, methods=["GET"], name="heatmap")
+    def heatmap(self, request):
+        curso = request.query_params.get("curso", None)
+        anio_lectivo = request.query_params.get("anio_lectivo", None)
+
+        if not curso or not anio_lectivo:
+            return Response(
+                data={
+                    "detail": "Es necesario ingresar un curso y un anio_lectivo"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not curso.isnumeric() or not anio_lectivo.isnumeric():
+            return Response(
+                data={
+                    "detail": "Los valores de curso y anio_lectivo deben ser numéricos"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        curso = get_object_or_404(
+            Curso.objects.filter(
+                anio__carrera__institucion=request.user.institucion
+            ),
+            pk=int(curso),
+        )
+        anio_lectivo = get_object_or_404(
+            AnioLectivo.objects.filter(institucion=request.user.institucion),
+            pk=int(anio_lectivo),
+        )
+
+        meses = []
+        mes = anio_lectivo.fecha_desde.replace(day=1)
+        while mes <= anio_lectivo.fecha_hasta:
+            meses.append(mes)
+            mes = (mes + datetime.timedelta(days=32)).replace(day=1)
+        columnas = {mes: i for i, mes in enumerate(meses)}
+
+        alumnos_curso = list(
+            AlumnoCurso.objects.filter(curso=curso, anio_lectivo=anio_lectivo)
+            .order_by("alumno__apellido", "alumno__nombre")
+            .values_list("id", flat=True)
+        )
+        filas = {
+            alumno_curso: i for i, alumno_curso in enumerate(alumnos_curso)
+        }
+        valores = [[None] * len(meses) for _ in alumnos_curso]
+
+        resumenes = ResumenMensualAsistencia.objects.filter(
+            alumno_curso_id__in=alumnos_curso,
+            mes__gte=meses[0],
+            mes__lte=meses[-1],
+        ).values_list("alumno_curso_id", "mes", "total", "cantidad")
+        for alumno_curso, mes, total, cantidad in resumenes:
+            valores[filas[alumno_curso]][columnas[mes]] = total / cantidad
+
+        data = {
+            "curso": curso.id,
+            "anio_lectivo": anio_lectivo.id,
+            "alumnos_curso": alumnos_curso,
+            "meses": [mes.strftime("%m/%Y") for mes in meses],
+            "valores": valores,
+        }
+        serializer = serializers.HeatmapAsistenciaSerializer(data, many=False)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_id="create_matriz_asistencias",
+        operation_description="""
+        Carga de asistencias de un curso para varios días en una sola llamada.
+        Se recibe una matriz con una fila por alumno_curso y una columna por fecha. Las celdas en null no cargan asistencia.
+        También se puede enviar un archivo CSV en el campo file, con el encabezado alumno_curso,DD/MM/YYYY,... y una fila por alumno;
+        en ese caso el curso se indica como campo del formulario o como query param y las celdas vacías no cargan asistencia.
+        Todos los alumnos deben pertenecer al curso y al mismo Año Lectivo, y todas las fechas deben ser días lectivos según el calendario de la institución.
+        Los objetivos de cada alumno se recalculan una sola vez, desde la fecha más temprana cargada.
+        """,
+        manual_parameters=[actualizar_parameter],
+        request_body=serializers.MatrizAsistenciaSerializer,
+        responses={**OK_CREATED, **responses.STANDARD_ERRORS},
+    )
+    @action(detail=False, methods=["POST"], name="matriz")
+    def matriz(self, request):
+        if "file" in request.FILES:
+            try:
+                data = leer_matriz_csv(
+                    request.FILES["file"],
+                    request.data.get(
+                        "curso", request.query_params.get("curso")
+                    ),
+                )
+            except UnicodeDecodeError:
+                return Response(
+                    data={
+                        "detail": "El archivo debe estar codificado en UTF-8"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        else:
+            data = request.data
+        serializer = serializers.MatrizAsistenciaSerializer(data=data)
+        if not serializer.is_valid():
+            if any(
+                error.code == "does_not_exist"
+                for error in serializer.errors.get("curso", [])
+            ):
+                return Response(
+                    data={"detail": "No encontrado."},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            return Response(
+                data=serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        curso = serializer.validated_data["curso"]
+        fechas = serializer.validated_data["fechas"]
+        ids = serializer.validated_data["alumnos_curso"]
+        if curso.anio.carrera.institucion != request.user.institucion:
+            return Response(
+                data={"detail": "No encontrado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        alumnos_curso = {
+            alumno_curso.id: alumno_curso
+            for alumno_curso in AlumnoCurso.objects.filter(
+                id__in=ids, curso=curso
+            ).select_related("anio_lectivo")
+        }
+        if len(alumnos_curso) != len(ids):
+            return Response(
+                data={"detail": "No encontrado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        anios_lectivos = set(
+            alumno_curso.anio_lectivo
+            for alumno_curso in alumnos_curso.values()
+        )
+        if len(anios_lectivos) != 1:
+            return Response(
+                data={
+                    "detail": "No se pueden cargar asistencias para distintos Años Lectivos al mismo tiempo"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        anio_lectivo = anios_lectivos.pop()
+        for fecha in fechas:
+            motivo = motivo_dia_no_lectivo(anio_lectivo, fecha)
+            if motivo:
+                return Response(
+                    data={"detail": motivo},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        asistencias = [
+            (alumno_curso, fecha, asistio, None)
+            for alumno_curso, fila in zip(
+                ids, serializer.validated_data["valores"]
+            )
+            for fecha, asistio in zip(fechas, fila)
+            if asistio is not None
+        ]
+        if not asistencias:
+            return Response(
+                data={"detail": "No se recibió ninguna información"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            with transaction.atomic():
+                if request.query_params.get("actualizar", None) == "true":
+                    cambios = guardar_asistencias(asistencias)
+                else:
+                    Asistencia.objects.bulk_create(
+                        [
+                            Asistencia(
+                                alumno_curso_id=alumno_curso,
+                                fecha=fecha,
+                                asistio=asistio,
+                            )
+                            for alumno_curso, fecha, asistio, _ in asistencias
+                        ]
+                    )
+                    cambios = [
+                        (alumno_curso, fecha)
+                        for alumno_curso, fecha, _, _ in asistencias
+                    ]
+
+                # Un recálculo por alumno desde su fecha más temprana,
+                # agrupando en un solo pedido a los que comparten fecha
+                desde = {}
+                for alumno_curso, fecha in cambios:
+                    desde[alumno_curso] = min(
+                        fecha, desde.get(alumno_curso, fecha)
+                    )
+                if desde:
+                    reconstruir_acumulados(desde.keys())
+                alumnos_por_fecha = {}
+                for alumno_curso, fecha in desde.items():
+                    alumnos_por_fecha.setdefault(fecha, set()).add(
+                        alumnos_curso[alumno_curso].alumno_id
+                    )
+                for fecha, alumnos in alumnos_por_fecha.items():
+                    recalcular_asistencias(alumnos, fecha)
+        except IntegrityError:
+            return Response(
+                data={
+                    "detail": "Ya existen asistencias cargadas para algun alumno de los listados en alguna de las fechas especificadas. Se debe modificar o borrar dicha asistencia"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_id="export_asistencias",
+        operation_description="""
+        Exportar a CSV las asistencias de un curso entre dos fechas, con una fila por alumno y una columna por fecha.
+        Es necesario pasar el curso y la fecha_desde (si no se pasa fecha_hasta, actúa cómo fecha única).
+        El archivo se genera a medida que se envía, por lo que el consumo de memoria no depende del rango pedido.
+        """,
+        manual_parameters=[
+            curso_parameter_porcentaje,
+            fecha_desde_parameter,
+            fecha_hasta_parameter,
+        ],
+        responses={**OK_EMPTY, **responses.STANDARD_ERRORS},
+    )
+    @action(detail=False, methods=["GET"], name="exportar")
+    def exportar(self, request):
+        curso = request.query_params.get("curso", None)
+        fecha_desde = request.query_params.get("fecha_desde", None)
+        fecha_hasta = request.query_params.get("fecha_hasta", None)
+
+        if not curso:
+            return Response(
+                data={"detail": "Es necesario ingresar un curso"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not curso.isnumeric():
+            return Response(
+                data={"detail": "El valor de curso no es numérico"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not fecha_desde:
+            return Response(
+                data={
+                    "detail": "Es necesario ingresar al menos la fecha_desde"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fechas = []
+        for fecha in (fecha_desde, fecha_hasta or fecha_desde):
+            if not re.compile(DATE_REGEX).match(fecha):
+                return Response(
+                    data={
+                        "detail": "La fecha ingresada no está correctamente expresada"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            temp = fecha.split("-")
+            fechas.append(
+                datetime.date(int(temp[2]), int(temp[1]), int(temp[0]))
+            )
+        fecha_desde, fecha_hasta = fechas
+        if fecha_hasta < fecha_desde:
+            return Response(
+                data={"detail": "Las fechas ingresadas son inválidas"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        curso = get_object_or_404(
+            Curso.objects.filter(
+                anio__carrera__institucion=request.user.institucion
+            ),
+            pk=int(curso),
+        )
+
+        filas = filas_exportacion(
+            Asistencia.objects.filter(
+                alumno_curso__curso=curso,
+                fecha__gte=fecha_desde,
+                fecha__lte=fecha_hasta,
+            )
+        )
+        nombre = "asistencias_{}_{:%Y%m%d}_{:%Y%m%d}".format(
+            curso.id, fecha_desde, fecha_hasta
+        )
+
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(fila) for fila in filas),
+            content_type="text/csv",
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="{nombre}.csv"'
+        return response
+
+    @swagger_auto_schema(
+        operation_id="list_faltantes_asistencias",
+        operation_description="""
+        Listar los cursos de la institución que no tienen la asistencia completa en días lectivos.
+        Por cada curso y fecha se devuelve la cantidad de alumnos inscriptos y la cantidad que no tiene asistencia cargada.
+        Si no se pasan fechas se consulta el día de hoy. Si se pasa sólo fecha_desde, actúa como fecha única.
+        El rango no puede superar los 366 días.
+
+        Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
+        """,
+        manual_parameters=[fecha_desde_parameter, fecha_hasta_parameter],
+        responses={**OK_LIST_FALTANTES, **responses.STANDARD_ERRORS},
+    )
+    @action(detail=False, methods=["GET"], name="faltantes")
+    def faltantes(self, request):
+        fecha_desde = request.query_params.get("fecha_desde", None)
+        fecha_hasta = request.query_params.get("fecha_hasta", None)
+
+        if fecha_hasta and not fecha_desde:
+            return Response(
+                data={
+                    "detail": "Es necesario ingresar al menos la fecha_desde"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fechas = []
+        for fecha in (fecha_desde, fecha_hasta or fecha_desde):
+            if not fecha:
+                fechas.append(datetime.date.today())
+                continue
+            if not re.compile(DATE_REGEX).match(fecha):
+                return Response(
+                    data={
+                        "detail": "La fecha ingresada no está correctamente expresada"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            temp = fecha.split("-")
+            fechas.append(
+                datetime.date(int(temp[2]), int(temp[1]), int(temp[0]))
+            )
+        fecha_desde, fecha_hasta = fechas
+        if not 0 <= (fecha_hasta - fecha_desde).days < 366:
+            return Response(
+                data={"detail": "Las fechas ingresadas son inválidas"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        faltantes = cursos_sin_asistencia(
+            request.user.institucion.id, fecha_desde, fecha_hasta
+        )
+        serializer = serializers.FaltanteAsistenciaSerializer(
+            faltantes, many=True
+        )
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_id="list_riesgo_asistencias",
+        operation_description="""
+        Listar los alumnos con ausencias consecutivas, de un curso o de toda la institución.
+        Se devuelven los alumnos cuya racha actual de ausencias (asistencias cargadas con asistio igual a 0, consecutivas hasta la
+        última asistencia cargada) es mayor o igual a minimo, ordenados de mayor a menor racha. Para cada alumno se devuelve además
+        su racha más larga, la fecha de su último presente y la fecha de su última asistencia cargada.
+        La racha cuenta asistencias cargadas, no días lectivos: un día lectivo sin asistencia cargada no suma ausencias ni corta la racha,
+        así que un curso que no cargó asistencias durante una semana no hace crecer la racha de sus alumnos.
+
+        Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
+        """,
+        manual_parameters=[
+            curso_parameter_riesgo,
+            anio_lectivo_parameter_riesgo,
+            minimo_parameter,
+        ],
+        responses={**OK_LIST_RIESGO, **responses.STANDARD_ERRORS},
+    )
+    @action(detail=False, methods=["GET"], name="riesgo")
+    def riesgo(self, request):
+        curso = request.query_params.get("curso", None)
+        anio_lectivo = request.query_params.get("anio_lectivo", None)
+        minimo = request.query_params.get("minimo", "3")
+
+        if any(
+            valor is not None and not valor.isnumeric()
+            for valor in (curso, anio_lectivo, minimo)
+        ):
+            return Response(
+                data={
+                    "detail": "Los valores de curso, anio_lectivo y minimo deben ser numéricos"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if int(minimo) < 1:
+            return Response(
+                data={"detail": "El valor de minimo debe ser mayor a 0"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rachas = RachaAsistencia.objects.filter(
+            alumno_curso__alumno__institucion=request.user.institucion,
+            racha_actual__gte=int(minimo),
+        )
+        if curso:
+            curso = get_object_or_404(
+                Curso.objects.filter(
+                    anio__carrera__institucion=request.user.institucion
+                ),
+                pk=int(curso),
+            )
+            rachas = rachas.filter(alumno_curso__curso=curso)
+        if anio_lectivo:
+            anio_lectivo = get_object_or_404(
+                AnioLectivo.objects.filter(
+                    institucion=request.user.institucion
+                ),
+                pk=int(anio_lectivo),
+            )
+            rachas = rachas.filter(alumno_curso__anio_lectivo=anio_lectivo)
+
+        rachas = rachas.values(
+            "alumno_curso_id",
+            "alumno_curso__alumno_id",
+            "alumno_curso__alumno__nombre",
+            "alumno_curso__alumno__apellido",
+            "alumno_curso__curso_id",
+            "racha_actual",
+            "racha_maxima",
+            "ultima_presencia",
+            "ultima_fecha",
+        ).order_by(
+            "-racha_actual",
+            F("ultima_presencia").asc(nulls_first=True),
+            "alumno_curso__alumno__apellido",
+            "alumno_curso__alumno__nombre",
+        )
+        serializer = serializers.RiesgoAsistenciaSerializer(rachas, many=True)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
 
 create_asistencia = AsistenciaViewSet.as_view({"post": "create"})
 mix_asistencia = AsistenciaViewSet.as_view(
@@ -799,4 +1553,12 @@ mix_asistencia_multiple = AsistenciaViewSet.as_view(
 )
 list_asistencia = AsistenciaViewSet.as_view({"get": "list"})
 hoy_asistencia_anio_lectivo = AsistenciaViewSet.as_view({"get": "porcentaje"})
+porcentaje_asistencia_curso = AsistenciaViewSet.as_view(
+    {"get": "porcentaje_curso"}
+)
+heatmap_asistencia = AsistenciaViewSet.as_view({"get": "heatmap"})
+matriz_asistencia = AsistenciaViewSet.as_view({"post": "matriz"})
+exportar_asistencia = AsistenciaViewSet.as_view({"get": "exportar"})
+faltantes_asistencia = AsistenciaViewSet.as_view({"get": "faltantes"})
+riesgo_asistencia = AsistenciaViewSet.as_view({"get": "riesgo"})
 
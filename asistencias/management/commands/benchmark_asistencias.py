@@ -0,0 +1,85 @@
+import datetime
+import random
+import timeit
+from statistics import mean
+from django.core.management.base import BaseCommand
+from asistencias.rq_funcions import promedios_acumulados
+
+
+def promedios_por_reescaneo(asistencias, date_recalculate):
+    """
+    Algoritmo anterior de calculate_asistencia_redesign: recalcula el
+    promedio de todo el prefijo para cada fecha (cuadrático).
+    """
+    promedios = []
+    for index in reversed(range(len(asistencias))):
+        if asistencias[index][0] < date_recalculate:
+            break
+        promedio = mean([a[1] for a in asistencias[: index + 1]])
+        promedios.append((asistencias[index][0], promedio))
+    return promedios[::-1]
+
+
+def promedios_incrementales(asistencias, date_recalculate):
+    prefijo = [a[1] for a in asistencias if a[0] < date_recalculate]
+    return promedios_acumulados(
+        [a for a in asistencias if a[0] >= date_recalculate],
+        sum(prefijo),
+        len(prefijo),
+    )
+
+
+def anio_sintetico(dias, desde):
+    asistencias = []
+    fecha = desde
+    while len(asistencias) < dias:
+        if fecha.weekday() < 5:
+            asistencias.append((fecha, random.choice([0, 0.5, 1, 1, 1])))
+        fecha += datetime.timedelta(days=1)
+    return asistencias
+
+
+class Command(BaseCommand):
+    help = "Compara el recálculo de promedios de asistencia anterior (reescaneo) con el acumulado incremental"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=200)
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        asistencias = anio_sintetico(
+            options["dias"], datetime.date(2020, 3, 2)
+        )
+        fechas = {
+            "inicio del año": asistencias[0][0],
+            "noviembre": datetime.date(2020, 11, 2),
+        }
+        for nombre, fecha in fechas.items():
+            anterior = promedios_por_reescaneo(asistencias, fecha)
+            nuevo = promedios_incrementales(asistencias, fecha)
+            iguales = len(anterior) == len(nuevo) and all(
+                a[0] == n[0] and abs(a[1] - n[1]) < 1e-9
+                for a, n in zip(anterior, nuevo)
+            )
+            t_anterior = min(
+                timeit.repeat(
+                    lambda: promedios_por_reescaneo(asistencias, fecha),
+                    number=1,
+                    repeat=options["repeticiones"],
+                )
+            )
+            t_nuevo = min(
+                timeit.repeat(
+                    lambda: promedios_incrementales(asistencias, fecha),
+                    number=1,
+                    repeat=options["repeticiones"],
+                )
+            )
+            self.stdout.write(
+                f"Recálculo desde {nombre} ({len(nuevo)} días de {len(asistencias)}): "
+                f"reescaneo {t_anterior * 1000:.2f} ms, "
+                f"acumulado {t_nuevo * 1000:.3f} ms "
+                f"(x{t_anterior / t_nuevo:.0f}), "
+                f"resultados {'iguales' if iguales else 'DISTINTOS'}"
+            )
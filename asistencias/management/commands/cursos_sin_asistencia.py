@@ -0,0 +1,49 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from curricula.models import AnioLectivo
+from asistencias.models import cursos_sin_asistencia
+
+
+class Command(BaseCommand):
+    help = "Lista los cursos sin asistencia cargada en un día lectivo y deja el resultado en cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fecha", help="Fecha a revisar (DD/MM/YYYY). Por defecto, hoy"
+        )
+        parser.add_argument(
+            "--institucion",
+            type=int,
+            nargs="*",
+            help="Revisar sólo estas instituciones",
+        )
+
+    def handle(self, *args, **options):
+        fecha = datetime.date.today()
+        if options["fecha"]:
+            try:
+                fecha = datetime.datetime.strptime(
+                    options["fecha"], "%d/%m/%Y"
+                ).date()
+            except ValueError:
+                raise CommandError("La fecha debe tener el formato DD/MM/YYYY")
+
+        instituciones = options["institucion"] or (
+            AnioLectivo.objects.filter(
+                fecha_desde__lte=fecha, fecha_hasta__gte=fecha
+            )
+            .order_by("institucion_id")
+            .values_list("institucion_id", flat=True)
+            .distinct()
+        )
+        for institucion in instituciones:
+            faltantes = cursos_sin_asistencia(institucion, fecha, fecha)
+            self.stdout.write(
+                f"Institución {institucion}: {len(faltantes)} cursos sin asistencia completa"
+            )
+            for faltante in faltantes:
+                self.stdout.write(
+                    "    {nombre} ({curso}): {faltantes} de {alumnos} alumnos".format(
+                        **faltante
+                    )
+                )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from alumnos.models import AlumnoCurso
+from asistencias.models import reconstruir_acumulados
+
+
+class Command(BaseCommand):
+    help = "Regenera las sumas acumuladas de asistencias usadas para calcular porcentajes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument(
+            "--alumno-curso",
+            type=int,
+            nargs="*",
+            help="Regenerar sólo estos AlumnoCurso",
+        )
+
+    def handle(self, *args, **options):
+        alumnos_curso = options["alumno_curso"] or list(
+            AlumnoCurso.objects.order_by("id").values_list("id", flat=True)
+        )
+        filas = 0
+        for inicio in range(0, len(alumnos_curso), options["lote"]):
+            with transaction.atomic():
+                filas += reconstruir_acumulados(
+                    alumnos_curso[inicio : inicio + options["lote"]]
+                )
+        self.stdout.write(
+            f"{len(alumnos_curso)} alumnos_curso, {filas} días acumulados"
+        )
@@ -0,0 +1,46 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0005_auto_20201023_2011'),
+        ('asistencias', '0004_auto_20200804_0218'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcumuladoAsistencia',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('total', models.FloatField(default=0)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('alumno_curso', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, to='alumnos.AlumnoCurso')),
+            ],
+            options={
+                'unique_together': {('alumno_curso', 'fecha')},
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO asistencias_acumuladoasistencia
+                (alumno_curso_id, fecha, total, cantidad)
+            SELECT
+                alumno_curso_id,
+                fecha,
+                SUM(SUM(asistio)) OVER (
+                    PARTITION BY alumno_curso_id ORDER BY fecha
+                ),
+                SUM(COUNT(*)) OVER (
+                    PARTITION BY alumno_curso_id ORDER BY fecha
+                )
+            FROM asistencias_asistencia
+            GROUP BY alumno_curso_id, fecha
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
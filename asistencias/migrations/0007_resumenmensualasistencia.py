@@ -0,0 +1,42 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0005_auto_20201023_2011'),
+        ('asistencias', '0006_permiso_porcentaje_curso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensualAsistencia',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('total', models.FloatField(default=0)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('alumno_curso', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, to='alumnos.AlumnoCurso')),
+            ],
+            options={
+                'unique_together': {('alumno_curso', 'mes')},
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO asistencias_resumenmensualasistencia
+                (alumno_curso_id, mes, total, cantidad)
+            SELECT
+                alumno_curso_id,
+                date_trunc('month', fecha)::date,
+                SUM(asistio),
+                COUNT(*)
+            FROM asistencias_asistencia
+            GROUP BY alumno_curso_id, date_trunc('month', fecha)
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,84 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("asistencias", "0008_permiso_heatmap"),
+    ]
+
+    operations = [
+        # Deja sólo la asistencia más reciente de cada alumno_curso y fecha
+        migrations.RunSQL(
+            """
+            DELETE FROM asistencias_asistencia a
+            USING asistencias_asistencia b
+            WHERE a.alumno_curso_id = b.alumno_curso_id
+                AND a.fecha = b.fecha
+                AND a.id < b.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        # Vuelve a generar los acumulados sin los duplicados borrados
+        migrations.RunSQL(
+            [
+                "DELETE FROM asistencias_acumuladoasistencia",
+                """
+                INSERT INTO asistencias_acumuladoasistencia
+                    (alumno_curso_id, fecha, total, cantidad)
+                SELECT
+                    alumno_curso_id,
+                    fecha,
+                    SUM(SUM(asistio)) OVER (
+                        PARTITION BY alumno_curso_id ORDER BY fecha
+                    ),
+                    SUM(COUNT(*)) OVER (
+                        PARTITION BY alumno_curso_id ORDER BY fecha
+                    )
+                FROM asistencias_asistencia
+                GROUP BY alumno_curso_id, fecha
+                """,
+                "DELETE FROM asistencias_resumenmensualasistencia",
+                """
+                INSERT INTO asistencias_resumenmensualasistencia
+                    (alumno_curso_id, mes, total, cantidad)
+                SELECT
+                    alumno_curso_id,
+                    date_trunc('month', fecha)::date,
+                    SUM(asistio),
+                    COUNT(*)
+                FROM asistencias_asistencia
+                GROUP BY alumno_curso_id, date_trunc('month', fecha)
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        # Índice único que además cubre asistio, para leerlo sin ir a la tabla
+        migrations.RunSQL(
+            [
+                """
+                CREATE UNIQUE INDEX asistencia_unica_alumno_curso_fecha
+                ON asistencias_asistencia (alumno_curso_id, fecha)
+                INCLUDE (asistio)
+                """,
+                """
+                ALTER TABLE asistencias_asistencia
+                ADD CONSTRAINT asistencia_unica_alumno_curso_fecha
+                UNIQUE USING INDEX asistencia_unica_alumno_curso_fecha
+                """,
+            ],
+            reverse_sql="""
+            ALTER TABLE asistencias_asistencia
+            DROP CONSTRAINT asistencia_unica_alumno_curso_fecha
+            """,
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="asistencia",
+                    constraint=models.UniqueConstraint(
+                        fields=("alumno_curso", "fecha"),
+                        name="asistencia_unica_alumno_curso_fecha",
+                    ),
+                ),
+            ],
+        ),
+    ]
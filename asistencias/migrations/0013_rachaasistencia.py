@@ -0,0 +1,50 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def calcular_rachas(apps, schema_editor):
+    Asistencia = apps.get_model("asistencias", "Asistencia")
+    RachaAsistencia = apps.get_model("asistencias", "RachaAsistencia")
+    rachas = []
+    racha = None
+    for alumno_curso, fecha, asistio in (
+        Asistencia.objects.order_by("alumno_curso_id", "fecha")
+        .values_list("alumno_curso_id", "fecha", "asistio")
+        .iterator()
+    ):
+        if racha is None or racha.alumno_curso_id != alumno_curso:
+            racha = RachaAsistencia(alumno_curso_id=alumno_curso)
+            rachas.append(racha)
+        if asistio == 0:
+            racha.racha_actual += 1
+            racha.racha_maxima = max(racha.racha_maxima, racha.racha_actual)
+        else:
+            racha.racha_actual = 0
+            racha.ultima_presencia = fecha
+        racha.ultima_fecha = fecha
+    RachaAsistencia.objects.bulk_create(rachas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0005_auto_20201023_2011'),
+        ('asistencias', '0012_permiso_faltantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RachaAsistencia',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('racha_actual', models.IntegerField(db_index=True, default=0)),
+                ('racha_maxima', models.IntegerField(default=0)),
+                ('ultima_presencia', models.DateField(blank=True, null=True)),
+                ('ultima_fecha', models.DateField(blank=True, null=True)),
+                ('alumno_curso', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='racha_asistencia', to='alumnos.AlumnoCurso')),
+            ],
+        ),
+        migrations.RunPython(calcular_rachas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencias', '0013_rachaasistencia'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='asistencia',
+            options={'permissions': [('list_asistencia', 'Puede listar asistencias'), ('create_multiple_asistencia', 'Puede crear multiples asistencias'), ('destroy_curso_dia_asistencia', 'Puede borrar multiples asistencias'), ('porcentaje_asistencia', 'Puede obtener el porcentaje de asistencias'), ('porcentaje_curso_asistencia', 'Puede obtener el porcentaje de asistencias de un curso'), ('heatmap_asistencia', 'Puede obtener el mapa mensual de asistencias de un curso'), ('matriz_asistencia', 'Puede cargar asistencias de varios días'), ('exportar_asistencia', 'Puede exportar asistencias'), ('faltantes_asistencia', 'Puede listar los cursos sin asistencias cargadas'), ('riesgo_asistencia', 'Puede listar los alumnos con ausencias consecutivas')]},
+        ),
+    ]
@@ -1,5 +1,17 @@
-from django.db import models
-from alumnos.models import AlumnoCurso
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from ontrack.versiones import incrementar_versiones, version
+from django.db.models import F
+from django.db.models.functions import TruncMonth
+from alumnos.models import AlumnoCurso, invalidar_historiales
+from curricula.models import AnioLectivo
+import datetime
+import hashlib
+
+FALTANTES_CACHE_SEGUNDOS = getattr(
+    settings, "ASISTENCIAS_FALTANTES_CACHE_SEGUNDOS", 3600
+)
 
 # Create your models here.
 class Asistencia(models.Model):
@@ -14,7 +26,51 @@ class Asistencia(models.Model):
     def __str__(self):
         return self.alumno_curso.alumno.nombre + " " + str(self.fecha)
 
+    def save(self, *args, **kwargs):
+        self.fecha = self._meta.get_field("fecha").to_python(self.fecha)
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = (
+                    Asistencia.objects.filter(pk=self.pk)
+                    .values_list("alumno_curso_id", "fecha", "asistio")
+                    .first()
+                )
+            super(Asistencia, self).save(*args, **kwargs)
+            alumnos = set()
+            if anterior:
+                alumnos.update(acumular_asistencia(*anterior, signo=-1))
+            alumnos.update(
+                acumular_asistencia(
+                    self.alumno_curso_id, self.fecha, self.asistio
+                )
+            )
+            if anterior:
+                reconstruir_rachas({anterior[0], self.alumno_curso_id})
+            else:
+                actualizar_racha(
+                    self.alumno_curso_id, self.fecha, self.asistio
+                )
+            invalidar_cache_asistencias(alumnos)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            borrados = super(Asistencia, self).delete(*args, **kwargs)
+            invalidar_cache_asistencias(
+                acumular_asistencia(
+                    self.alumno_curso_id, self.fecha, self.asistio, signo=-1
+                )
+            )
+            reconstruir_rachas([self.alumno_curso_id])
+        return borrados
+
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["alumno_curso", "fecha"],
+                name="asistencia_unica_alumno_curso_fecha",
+            )
+        ]
         permissions = [
             ("list_asistencia", "Puede listar asistencias"),
             (
@@ -29,4 +85,435 @@ class Asistencia(models.Model):
                 "porcentaje_asistencia",
                 "Puede obtener el porcentaje de asistencias",
             ),
+            (
+                "porcentaje_curso_asistencia",
+                "Puede obtener el porcentaje de asistencias de un curso",
+            ),
+            (
+                "heatmap_asistencia",
+                "Puede obtener el mapa mensual de asistencias de un curso",
+            ),
+            (
+                "matriz_asistencia",
+                "Puede cargar asistencias de varios días",
+            ),
+            ("exportar_asistencia", "Puede exportar asistencias"),
+            (
+                "faltantes_asistencia",
+                "Puede listar los cursos sin asistencias cargadas",
+            ),
+            (
+                "riesgo_asistencia",
+                "Puede listar los alumnos con ausencias consecutivas",
+            ),
+        ]
+
+
+class AcumuladoAsistencia(models.Model):
+    """
+    Suma acumulada de las asistencias de un AlumnoCurso hasta cada día con
+    asistencias cargadas (inclusive). El promedio de cualquier rango sale de
+    restar dos filas.
+    """
+
+    alumno_curso = models.ForeignKey(
+        to=AlumnoCurso, on_delete=models.CASCADE, blank=True
+    )
+    fecha = models.DateField()
+    total = models.FloatField(default=0)
+    cantidad = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.alumno_curso_id} {self.fecha}: {self.total}/{self.cantidad}"
+
+    class Meta:
+        unique_together = ["alumno_curso", "fecha"]
+
+
+class ResumenMensualAsistencia(models.Model):
+    """
+    Suma y cantidad de asistencias de un AlumnoCurso en un mes. El mes se
+    guarda como su primer día.
+    """
+
+    alumno_curso = models.ForeignKey(
+        to=AlumnoCurso, on_delete=models.CASCADE, blank=True
+    )
+    mes = models.DateField()
+    total = models.FloatField(default=0)
+    cantidad = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.alumno_curso_id} {self.mes:%m/%Y}: {self.total}"
+
+    class Meta:
+        unique_together = ["alumno_curso", "mes"]
+
+
+class RachaAsistencia(models.Model):
+    """
+    Racha de ausencias de un AlumnoCurso: ausencias consecutivas hasta su
+    última asistencia cargada, la racha más larga y el último día presente.
+    Una asistencia con asistio igual a 0 es una ausencia. La racha se cuenta
+    sobre las asistencias cargadas, en orden de fecha, y no sobre los días
+    lectivos: un día sin asistencia cargada no la suma ni la corta.
+    """
+
+    alumno_curso = models.OneToOneField(
+        to=AlumnoCurso,
+        on_delete=models.CASCADE,
+        related_name="racha_asistencia",
+    )
+    racha_actual = models.IntegerField(default=0, db_index=True)
+    racha_maxima = models.IntegerField(default=0)
+    ultima_presencia = models.DateField(blank=True, null=True)
+    ultima_fecha = models.DateField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.alumno_curso_id}: {self.racha_actual}"
+
+    def sumar(self, fecha, asistio):
+        """
+        Agrega una asistencia posterior a ultima_fecha.
+        """
+        if asistio == 0:
+            self.racha_actual += 1
+            self.racha_maxima = max(self.racha_maxima, self.racha_actual)
+        else:
+            self.racha_actual = 0
+            self.ultima_presencia = fecha
+        self.ultima_fecha = fecha
+
+
+def invalidar_cache_asistencias(alumnos):
+    """
+    Recibe pares (institucion, alumno) de las asistencias que cambiaron e
+    invalida los cursos sin asistencia y los historiales cacheados, una sola
+    vez al confirmar la transacción. Si el cache no responde el cambio se
+    guarda igual: los resultados cacheados vencen solos.
+    """
+    alumnos = list(alumnos)
+
+    def invalidar():
+        invalidar_faltantes(institucion for institucion, _ in alumnos)
+        invalidar_historiales(alumno for _, alumno in alumnos)
+
+    if alumnos:
+        transaction.on_commit(invalidar)
+
+
+def acumular_asistencia(alumno_curso, fecha, asistio, signo=1):
+    """
+    Suma (o resta, con signo=-1) una asistencia a las filas acumuladas desde
+    su fecha en adelante y al resumen de su mes. Se llama dentro de la
+    transacción del cambio y devuelve el par (institucion, alumno) para
+    invalidar el cache.
+    """
+    # Bloquea al AlumnoCurso para serializar los cambios de sus acumulados
+    alumnos = list(
+        AlumnoCurso.objects.select_for_update(of=("self",))
+        .filter(pk=alumno_curso)
+        .values_list("alumno__institucion_id", "alumno_id")
+    )
+    acumulados = AcumuladoAsistencia.objects.filter(
+        alumno_curso_id=alumno_curso
+    )
+    if signo > 0 and not acumulados.filter(fecha=fecha).exists():
+        previo = acumulados.filter(fecha__lt=fecha).order_by("-fecha").first()
+        AcumuladoAsistencia.objects.create(
+            alumno_curso_id=alumno_curso,
+            fecha=fecha,
+            total=previo.total if previo else 0,
+            cantidad=previo.cantidad if previo else 0,
+        )
+
+    acumulados.filter(fecha__gte=fecha).update(
+        total=F("total") + signo * asistio, cantidad=F("cantidad") + signo
+    )
+
+    if signo < 0 and not Asistencia.objects.filter(
+        alumno_curso_id=alumno_curso, fecha=fecha
+    ).exists():
+        acumulados.filter(fecha=fecha).delete()
+
+    resumen, _ = ResumenMensualAsistencia.objects.get_or_create(
+        alumno_curso_id=alumno_curso, mes=fecha.replace(day=1)
+    )
+    if resumen.cantidad + signo > 0:
+        ResumenMensualAsistencia.objects.filter(pk=resumen.pk).update(
+            total=F("total") + signo * asistio,
+            cantidad=F("cantidad") + signo,
+        )
+    else:
+        resumen.delete()
+    return alumnos
+
+
+def reconstruir_acumulados(alumnos_curso):
+    """
+    Vuelve a generar las filas acumuladas y los resúmenes mensuales de los
+    AlumnoCurso indicados a partir de sus asistencias. Se usa tras cargas y
+    borrados masivos, con una llamada por lote, y en el comando
+    reconstruir_acumulados_asistencias.
+    """
+    alumnos_curso = list(alumnos_curso)
+    invalidar_cache_asistencias(
+        AlumnoCurso.objects.select_for_update(of=("self",))
+        .filter(pk__in=alumnos_curso)
+        .order_by("id")
+        .values_list("alumno__institucion_id", "alumno_id")
+    )
+    AcumuladoAsistencia.objects.filter(
+        alumno_curso_id__in=alumnos_curso
+    ).delete()
+
+    dias = (
+        Asistencia.objects.filter(alumno_curso_id__in=alumnos_curso)
+        .values_list("alumno_curso_id", "fecha")
+        .annotate(total=models.Sum("asistio"), cantidad=models.Count("id"))
+        .order_by("alumno_curso_id", "fecha")
+    )
+
+    acumulados = []
+    actual, total, cantidad = None, 0, 0
+    for alumno_curso, fecha, total_dia, cantidad_dia in dias:
+        if alumno_curso != actual:
+            actual, total, cantidad = alumno_curso, 0, 0
+        total += total_dia
+        cantidad += cantidad_dia
+        acumulados.append(
+            AcumuladoAsistencia(
+                alumno_curso_id=alumno_curso,
+                fecha=fecha,
+                total=total,
+                cantidad=cantidad,
+            )
+        )
+    AcumuladoAsistencia.objects.bulk_create(acumulados)
+    reconstruir_rachas(alumnos_curso)
+
+    ResumenMensualAsistencia.objects.filter(
+        alumno_curso_id__in=alumnos_curso
+    ).delete()
+    meses = (
+        Asistencia.objects.filter(alumno_curso_id__in=alumnos_curso)
+        .annotate(mes=TruncMonth("fecha"))
+        .values_list("alumno_curso_id", "mes")
+        .annotate(total=models.Sum("asistio"), cantidad=models.Count("id"))
+    )
+    ResumenMensualAsistencia.objects.bulk_create(
+        [
+            ResumenMensualAsistencia(
+                alumno_curso_id=alumno_curso,
+                mes=mes,
+                total=total,
+                cantidad=cantidad,
+            )
+            for alumno_curso, mes, total, cantidad in meses
+        ]
+    )
+    return len(acumulados)
+
+
+def actualizar_racha(alumno_curso, fecha, asistio):
+    """
+    Suma una asistencia nueva a la racha del AlumnoCurso. Si es posterior a
+    la última cargada (el caso de la carga diaria) se actualiza sólo la fila
+    de la racha; si no, se reconstruye la racha del alumno.
+    """
+    racha, _ = RachaAsistencia.objects.get_or_create(
+        alumno_curso_id=alumno_curso
+    )
+    if racha.ultima_fecha and fecha <= racha.ultima_fecha:
+        reconstruir_rachas([alumno_curso])
+        return
+    racha.sumar(fecha, asistio)
+    racha.save()
+
+
+def reconstruir_rachas(alumnos_curso):
+    """
+    Vuelve a calcular las rachas de los AlumnoCurso indicados recorriendo
+    sus asistencias en orden. Se usa tras cambios que no son una asistencia
+    nueva al final (modificaciones, borrados, cargas masivas).
+    """
+    rachas = {
+        alumno_curso: RachaAsistencia(alumno_curso_id=alumno_curso)
+        for alumno_curso in alumnos_curso
+    }
+    asistencias = (
+        Asistencia.objects.filter(alumno_curso_id__in=rachas.keys())
+        .order_by("alumno_curso_id", "fecha")
+        .values_list("alumno_curso_id", "fecha", "asistio")
+    )
+    for alumno_curso, fecha, asistio in asistencias.iterator():
+        rachas[alumno_curso].sumar(fecha, asistio)
+    RachaAsistencia.objects.filter(alumno_curso_id__in=rachas.keys()).delete()
+    RachaAsistencia.objects.bulk_create(rachas.values())
+
+
+def guardar_asistencias(asistencias):
+    """
+    Inserta o sobrescribe en una sola sentencia las asistencias recibidas como
+    (alumno_curso, fecha, asistio, descripcion). Una descripción vacía no
+    pisa la existente. Devuelve los pares (alumno_curso, fecha) cuyo valor de
+    asistio cambió o que no existían, para recalcular sólo esos alumnos.
+    No actualiza los acumulados: hay que llamar a reconstruir_acumulados.
+    """
+    if not asistencias:
+        return []
+    valores = ", ".join(["(%s, %s::date, %s::float8, %s)"] * len(asistencias))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH nuevas (alumno_curso_id, fecha, asistio, descripcion) AS (
+                VALUES {valores}
+            ),
+            anteriores AS (
+                SELECT a.alumno_curso_id, a.fecha, a.asistio
+                FROM asistencias_asistencia a
+                JOIN nuevas n USING (alumno_curso_id, fecha)
+            ),
+            escritas AS (
+                INSERT INTO asistencias_asistencia
+                    (alumno_curso_id, fecha, asistio, descripcion,
+                     fecha_creacion)
+                SELECT alumno_curso_id, fecha, asistio, descripcion, now()
+                FROM nuevas
+                ON CONFLICT (alumno_curso_id, fecha) DO UPDATE SET
+                    asistio = EXCLUDED.asistio,
+                    descripcion = COALESCE(
+                        EXCLUDED.descripcion,
+                        asistencias_asistencia.descripcion
+                    )
+                RETURNING alumno_curso_id, fecha, asistio
+            )
+            SELECT e.alumno_curso_id, e.fecha
+            FROM escritas e
+            LEFT JOIN anteriores a USING (alumno_curso_id, fecha)
+            WHERE a.asistio IS DISTINCT FROM e.asistio
+            """,
+            [valor for asistencia in asistencias for valor in asistencia],
+        )
+        return cursor.fetchall()
+
+
+def acumulado_asistencia(alumno_curso, fecha_desde=None, fecha_hasta=None):
+    """
+    Suma y cantidad de asistencias de un AlumnoCurso entre dos fechas
+    (inclusive), a partir de las filas acumuladas: dos búsquedas por índice.
+    """
+    acumulados = AcumuladoAsistencia.objects.filter(
+        alumno_curso_id=alumno_curso
+    ).order_by("-fecha")
+
+    hasta = acumulados
+    if fecha_hasta:
+        hasta = hasta.filter(fecha__lte=fecha_hasta)
+    hasta = hasta.values_list("total", "cantidad").first() or (0, 0)
+
+    antes = (0, 0)
+    if fecha_desde:
+        antes = acumulados.filter(fecha__lt=fecha_desde).values_list(
+            "total", "cantidad"
+        ).first() or (0, 0)
+
+    return hasta[0] - antes[0], hasta[1] - antes[1]
+
+
+def porcentaje_asistencia(alumno_curso, fecha_desde=None, fecha_hasta=None):
+    """
+    Promedio de asistencias de un AlumnoCurso entre dos fechas (inclusive)
+    sobre los días que tienen asistencia cargada.
+    """
+    total, cantidad = acumulado_asistencia(
+        alumno_curso, fecha_desde, fecha_hasta
+    )
+    return total / cantidad if cantidad else 0.0
+
+
+def _clave_version_faltantes(institucion):
+    return f"asistencias:faltantes:{institucion}:version"
+
+
+def invalidar_faltantes(instituciones):
+    """
+    Invalida los cursos sin asistencia cacheados de las instituciones,
+    cambiando la versión que forma parte de sus claves.
+    """
+    incrementar_versiones(
+        _clave_version_faltantes(institucion)
+        for institucion in set(instituciones)
+    )
+
+
+def cursos_sin_asistencia(institucion, fecha_desde, fecha_hasta):
+    """
+    Devuelve los pares (curso, fecha) de días lectivos entre dos fechas
+    (inclusive) en los que algún alumno inscripto del curso no tiene
+    asistencia cargada, con la cantidad de alumnos y de faltantes. Los días
+    lectivos salen del mapa de bits de cada AnioLectivo y la búsqueda es un
+    único anti-join sobre el rango completo. El resultado queda cacheado
+    hasta que se cargue o borre una asistencia de la institución.
+    """
+    anios_lectivos = []
+    fechas = []
+    for anio_lectivo in AnioLectivo.objects.filter(
+        institucion_id=institucion,
+        fecha_desde__lte=fecha_hasta,
+        fecha_hasta__gte=fecha_desde,
+    ):
+        fecha = max(fecha_desde, anio_lectivo.fecha_desde)
+        while fecha <= min(fecha_hasta, anio_lectivo.fecha_hasta):
+            if anio_lectivo.es_dia_lectivo(fecha):
+                anios_lectivos.append(anio_lectivo.id)
+                fechas.append(fecha)
+            fecha += datetime.timedelta(days=1)
+    if not fechas:
+        return []
+
+    # Los días lectivos forman parte de la clave para que un cambio en el
+    # calendario no devuelva un resultado viejo
+    dias = hashlib.md5(
+        repr(list(zip(anios_lectivos, fechas))).encode()
+    ).hexdigest()
+    clave = "asistencias:faltantes:{}:{}:{}".format(
+        institucion, version(_clave_version_faltantes(institucion)), dias
+    )
+    faltantes = cache.get(clave)
+    if faltantes is not None:
+        return faltantes
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            WITH dias (anio_lectivo_id, fecha) AS (
+                SELECT * FROM unnest(%s::integer[], %s::date[])
+            )
+            SELECT ac.curso_id, c.nombre, d.fecha,
+                COUNT(*) AS alumnos,
+                COUNT(*) FILTER (WHERE a.id IS NULL) AS faltantes
+            FROM dias d
+            JOIN alumnos_alumnocurso ac
+                ON ac.anio_lectivo_id = d.anio_lectivo_id
+            JOIN curricula_curso c ON c.id = ac.curso_id
+            LEFT JOIN asistencias_asistencia a
+                ON a.alumno_curso_id = ac.id AND a.fecha = d.fecha
+            GROUP BY ac.curso_id, c.nombre, d.fecha
+            HAVING COUNT(*) FILTER (WHERE a.id IS NULL) > 0
+            ORDER BY d.fecha, c.nombre
+            """,
+            [anios_lectivos, fechas],
+        )
+        faltantes = [
+            {
+                "curso": curso,
+                "nombre": nombre,
+                "fecha": fecha,
+                "alumnos": alumnos,
+                "faltantes": cantidad,
+            }
+            for curso, nombre, fecha, alumnos, cantidad in cursor.fetchall()
         ]
+    cache.set(clave, faltantes, FALTANTES_CACHE_SEGUNDOS)
+    return faltantes
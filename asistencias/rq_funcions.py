@@ -1,93 +1,102 @@
 from asistencias.models import Asistencia
-from objetivos.models import Objetivo, AlumnoObjetivo
-from statistics import mean
-from django.utils import timezone
-
-
-def alumno_asistencia_redesign(alumno, datetime_requested, date_recalculate):
-
-    objetivos = Objetivo.objects.filter(
-        seguimiento__alumnos__alumno__id=alumno,
-        seguimiento__en_progreso=True,
-        seguimiento__anio_lectivo__fecha_desde__lte=date_recalculate,
-        seguimiento__anio_lectivo__fecha_hasta__gte=date_recalculate,
-        tipo_objetivo__nombre__icontains="Asistencia",
-        tipo_objetivo__cuantitativo=True,
-        tipo_objetivo__multiple=False,
-    )
-
-    if should_recalculate(alumno, datetime_requested, objetivos):
-        calculate_asistencia_redesign(objetivos, alumno, date_recalculate)
-
-
-def should_recalculate(alumno, datetime_requested, objetivos):
-    if not objetivos:
-        return False
-
-    alumno_objetivo = AlumnoObjetivo.objects.filter(
-        objetivo__id__exact=objetivos[0].id,
-        alumno_curso__alumno__id=alumno,
-        fecha_calculo__isnull=False,
-    ).order_by("-fecha_calculo")
-
-    if (
-        alumno_objetivo
-        and alumno_objetivo[0].fecha_calculo > datetime_requested
-    ):
-        return False
-    return True
-
-
-def calculate_asistencia_redesign(objetivos, alumno, date_recalculate):
-    objetivos_ids = [o.id for o in objetivos]
-    AlumnoObjetivo.objects.filter(
-        objetivo__id__in=objetivos_ids,
-        fecha_relacionada__gte=date_recalculate,
-        alumno_curso__alumno__id=alumno,
-    ).delete()
-
-    anio_lectivo = objetivos[0].seguimiento.anio_lectivo
-    alumno_curso = [
-        alumno_curso
-        for alumno_curso in objetivos[0].seguimiento.alumnos.all()
-        if alumno_curso.alumno.id == alumno
-    ][0]
-
-    create_datetime = timezone.now()
-
-    asistencias = Asistencia.objects.filter(
-        fecha__gte=anio_lectivo.fecha_desde,
-        fecha__lte=anio_lectivo.fecha_hasta,
-        alumno_curso__alumno__id__exact=alumno,
-    ).order_by("fecha")
-
-    fechas = [
-        asistencia.fecha
-        for asistencia in asistencias
-        if asistencia.fecha >= date_recalculate
+from objetivos.calculadores import CalculadorObjetivo
+from objetivos.models import AlumnoObjetivo, EventoRecalculo
+from django.db.models import Sum, Count
+from itertools import groupby
+from operator import itemgetter
+
+
+class AsistenciaAcumulada:
+    """
+    Suma acumulada de las asistencias de un alumno.
+    Cada nuevo día se agrega en O(1), sin volver a recorrer el año.
+    """
+
+    def __init__(self, total=0, cantidad=0):
+        self.total = total
+        self.cantidad = cantidad
+
+    def agregar(self, asistio):
+        self.total += asistio
+        self.cantidad += 1
+        return self.promedio
+
+    @property
+    def promedio(self):
+        return self.total / self.cantidad if self.cantidad else 0.0
+
+
+def promedios_acumulados(asistencias, total=0, cantidad=0):
+    """
+    Recibe pares (fecha, asistio) ordenados por fecha y el prefijo ya
+    acumulado antes de la primera de ellas. Devuelve pares (fecha, promedio).
+    """
+    acumulada = AsistenciaAcumulada(total, cantidad)
+    return [
+        (fecha, acumulada.agregar(asistio)) for fecha, asistio in asistencias
     ]
 
-    promedios = []
 
-    for index in reversed(range(len(asistencias))):
-        if asistencias[index].fecha < date_recalculate:
-            break
-        promedio = mean([a.asistio for a in asistencias[: index + 1]])
-        promedios.append(promedio)
+class CalculadorAsistencia(CalculadorObjetivo):
+    """
+    Porcentaje de asistencia acumulado en el año lectivo, con una consulta
+    para los prefijos y otra para las asistencias de todos los alumnos.
+    """
 
-    objetivos_to_save = []
+    clave = "asistencia"
+    evento = EventoRecalculo.ASISTENCIA
 
-    for fecha, promedio in zip(fechas, promedios[::-1]):
-        for objetivo in objetivos:
-            objetivos_to_save.append(
-                AlumnoObjetivo(
-                    fecha_calculo=create_datetime,
-                    fecha_relacionada=fecha,
-                    objetivo=objetivo,
-                    alumno_curso=alumno_curso,
-                    valor=promedio,
-                    alcanzada=False,
-                )
+    def calcular(
+        self, seguimiento, objetivos, alumnos_curso, desde, fecha_calculo
+    ):
+        por_alumno = {
+            alumno_curso.alumno_id: alumno_curso
+            for alumno_curso in alumnos_curso
+        }
+        anio_lectivo = seguimiento.anio_lectivo
+        asistencias = Asistencia.objects.filter(
+            fecha__gte=anio_lectivo.fecha_desde,
+            fecha__lte=anio_lectivo.fecha_hasta,
+            alumno_curso__alumno__id__in=por_alumno,
+        )
+
+        # Se retoma desde el prefijo anterior a la fecha a recalcular,
+        # sumado en la base de datos, en lugar de releer todo el año
+        prefijos = {
+            prefijo["alumno_curso__alumno_id"]: prefijo
+            for prefijo in asistencias.filter(fecha__lt=desde)
+            .values("alumno_curso__alumno_id")
+            .annotate(total=Sum("asistio"), cantidad=Count("id"))
+            .order_by()
+        }
+
+        serie = []
+        for alumno, asistencias_alumno in groupby(
+            asistencias.filter(fecha__gte=desde)
+            .order_by("alumno_curso__alumno_id", "fecha")
+            .values_list("alumno_curso__alumno_id", "fecha", "asistio"),
+            key=itemgetter(0),
+        ):
+            prefijo = prefijos.get(alumno, {"total": 0, "cantidad": 0})
+            promedios = promedios_acumulados(
+                [a[1:] for a in asistencias_alumno],
+                prefijo["total"] or 0,
+                prefijo["cantidad"],
             )
-
-    AlumnoObjetivo.objects.bulk_create(objetivos_to_save)
+            for fecha, promedio in promedios:
+                for objetivo in objetivos:
+                    serie.append(
+                        AlumnoObjetivo(
+                            fecha_calculo=fecha_calculo,
+                            fecha_relacionada=fecha,
+                            objetivo=objetivo,
+                            alumno_curso=por_alumno[alumno],
+                            valor=promedio,
+                            alcanzada=False,
+                        )
+                    )
+        return serie
+
+
+def alumno_asistencia_redesign(alumno, date_recalculate):
+    return CalculadorAsistencia().recalcular_alumno(alumno, date_recalculate)
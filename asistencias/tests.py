@@ -4,21 +4,46 @@ from rest_framework.test import APITestCase
 from rest_framework.test import APIClient
 from users.models import User, Group
 from instituciones.models import Institucion
-from curricula.models import Carrera, AnioLectivo, Curso, Anio
+from curricula.models import (
+    Carrera,
+    AnioLectivo,
+    Curso,
+    Anio,
+    DiaCalendario,
+)
 from alumnos.models import Alumno, AlumnoCurso
-from asistencias.models import Asistencia
+from asistencias.models import (
+    Asistencia,
+    AcumuladoAsistencia,
+    ResumenMensualAsistencia,
+    RachaAsistencia,
+)
+from django.core.management import call_command
+from django.core.cache import cache
+from io import BytesIO, StringIO
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from ontrack.tests_utils import CACHE_LOCAL
 from rest_framework import status
 from rest_framework.utils.serializer_helpers import ReturnList
 from unittest.mock import patch
 from unittest import TestCase
 from seguimientos.models import Seguimiento
 from curricula.models import Materia
-from objetivos.models import Objetivo, TipoObjetivo, AlumnoObjetivo
+from objetivos.models import (
+    Objetivo,
+    TipoObjetivo,
+    AlumnoObjetivo,
+    EventoRecalculo,
+    guardar_serie,
+)
+import csv
 import datetime
-from django.utils import timezone
 from asistencias.rq_funcions import alumno_asistencia_redesign
+from objetivos import recalculo
 
 
+@override_settings(CACHES=CACHE_LOCAL)
 class QueueAsistenciaTests(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -189,6 +214,7 @@ class QueueAsistenciaTests(APITestCase):
             nombre="Promedio notas",
             cuantitativo=True,
             multiple=False,
+            calculador="promedio",
             valor_minimo=0,
             valor_maximo=100,
         )
@@ -196,6 +222,7 @@ class QueueAsistenciaTests(APITestCase):
             nombre="Porcentaje asistencias",
             cuantitativo=True,
             multiple=False,
+            calculador="asistencia",
             valor_minimo=0,
             valor_maximo=100,
         )
@@ -221,14 +248,145 @@ class QueueAsistenciaTests(APITestCase):
         Test de creacion correcta de AlumnoObjetivos
         """
         alumno_asistencia_redesign(
-            self.alumno_1.id, timezone.now(), self.asistencia_1.fecha
+            self.alumno_1.id, self.asistencia_1.fecha
         )
         alumnos_objetivos = AlumnoObjetivo.objects.all()
         assert alumnos_objetivos[0].valor == 1
         assert alumnos_objetivos[1].valor == 0.5
 
+    def test_objetivos_queue_retoma_prefijo(self):
+        """
+        Test de recalculo desde una fecha intermedia, retomando el acumulado previo
+        """
+        alumno_asistencia_redesign(
+            self.alumno_1.id, self.asistencia_1.fecha
+        )
+        Asistencia.objects.create(
+            fecha=datetime.date(2019, 11, 25),
+            asistio=0.5,
+            alumno_curso=self.alumno_curso_1,
+        )
+        alumno_asistencia_redesign(
+            self.alumno_1.id, datetime.date(2019, 11, 25)
+        )
+        alumnos_objetivos = AlumnoObjetivo.objects.all()
+        assert len(alumnos_objetivos) == 3
+        assert alumnos_objetivos[0].valor == 1
+        assert alumnos_objetivos[1].valor == 0.5
+        assert alumnos_objetivos[2].valor == 0.5
+
+    def test_objetivos_queue_escribe_solo_cambios(self):
+        """
+        Test de que el recalculo solo escribe los puntos que cambiaron
+        """
+        alumno_asistencia_redesign(
+            self.alumno_1.id, self.asistencia_1.fecha
+        )
+        ids = list(
+            AlumnoObjetivo.objects.order_by("id").values_list("id", flat=True)
+        )
+        filas = alumno_asistencia_redesign(
+            self.alumno_1.id, self.asistencia_1.fecha
+        )
+        assert filas == {
+            "insertados": 0,
+            "actualizados": 0,
+            "eliminados": 0,
+            "sin_cambios": 2,
+        }
+        Asistencia.objects.filter(fecha=datetime.date(2019, 11, 22)).update(
+            asistio=1
+        )
+        filas = alumno_asistencia_redesign(
+            self.alumno_1.id, datetime.date(2019, 11, 22)
+        )
+        assert filas == {
+            "insertados": 0,
+            "actualizados": 1,
+            "eliminados": 0,
+            "sin_cambios": 0,
+        }
+        alumnos_objetivos = AlumnoObjetivo.objects.order_by("id")
+        assert [a.id for a in alumnos_objetivos] == ids
+        assert [a.valor for a in alumnos_objetivos] == [1, 1]
 
-@patch("asistencias.api.views.django_rq")
+    def test_objetivos_queue_reinicia_alcanzada(self):
+        """
+        Test de que los puntos que cambian de valor se vuelven a marcar como
+        no alcanzados hasta que se evalúen de nuevo
+        """
+        alumno_asistencia_redesign(
+            self.alumno_1.id, self.asistencia_1.fecha
+        )
+        AlumnoObjetivo.objects.update(alcanzada=True)
+        serie = list(AlumnoObjetivo.objects.order_by("id"))
+        valor_previo = serie[1].valor
+        serie[0].valor = 0.25
+        filas = guardar_serie(
+            [serie[0].objetivo_id],
+            [self.alumno_1.id],
+            self.asistencia_1.fecha,
+            serie,
+        )
+        assert filas["actualizados"] == 1
+        alumnos_objetivos = AlumnoObjetivo.objects.order_by("id")
+        assert [a.valor for a in alumnos_objetivos] == [0.25, valor_previo]
+        assert [a.alcanzada for a in alumnos_objetivos] == [False, True]
+
+    @patch("objetivos.recalculo.django_rq")
+    def test_recalculo_seguimiento_por_lotes(self, mock):
+        """
+        Test de que el job del seguimiento calcula a todos sus alumnos con
+        las mismas consultas, usando el calculador del tipo de objetivo
+        """
+        TipoObjetivo.objects.filter(pk=self.tipo_objetivo_3.pk).update(
+            nombre="Presentismo", calculador="asistencia"
+        )
+        with CaptureQueriesContext(connection) as un_alumno:
+            recalculo.ejecutar_recalculo_seguimiento(
+                self.seguimiento_1.id, [self.objetivo_3.id]
+            )
+        Asistencia.objects.create(
+            fecha=datetime.date(2019, 11, 15),
+            asistio=0,
+            alumno_curso=self.alumno_curso_3,
+        )
+        with CaptureQueriesContext(connection) as dos_alumnos:
+            recalculo.ejecutar_recalculo_seguimiento(
+                self.seguimiento_1.id, [self.objetivo_3.id]
+            )
+
+        self.assertEqual(len(un_alumno), len(dos_alumnos))
+        alumnos_objetivos = AlumnoObjetivo.objects.filter(
+            objetivo=self.objetivo_3
+        ).order_by("alumno_curso_id", "fecha_relacionada")
+        assert [(a.alumno_curso_id, a.valor) for a in alumnos_objetivos] == [
+            (self.alumno_curso_1.id, 1),
+            (self.alumno_curso_1.id, 0.5),
+            (self.alumno_curso_3.id, 0),
+        ]
+
+    def test_objetivos_queue_evalua_alcanzada(self):
+        """
+        Test de que el recalculo marca alcanzado solo el ultimo valor del alumno
+        """
+        Objetivo.objects.filter(pk=self.objetivo_3.pk).update(
+            valor_objetivo_cuantitativo=0.5
+        )
+        alumno_asistencia_redesign(
+            self.alumno_1.id, self.asistencia_1.fecha
+        )
+        alumnos_objetivos = AlumnoObjetivo.objects.filter(
+            objetivo=self.objetivo_3
+        )
+        assert [(a.valor, a.alcanzada) for a in alumnos_objetivos] == [
+            (1, False),
+            (0.5, True),
+        ]
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+@patch("objetivos.recalculo.django_rq")
 class AsistenciaTests(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -263,6 +421,34 @@ class AsistenciaTests(APITestCase):
                 name="Puede obtener el porcentaje de asistencias"
             )
         )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(
+                name="Puede obtener el porcentaje de asistencias de un curso"
+            )
+        )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(
+                name="Puede obtener el mapa mensual de asistencias de un curso"
+            )
+        )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(
+                name="Puede cargar asistencias de varios días"
+            )
+        )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(name="Puede exportar asistencias")
+        )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(
+                name="Puede listar los cursos sin asistencias cargadas"
+            )
+        )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(
+                name="Puede listar los alumnos con ausencias consecutivas"
+            )
+        )
         cls.group_admin.save()
 
         cls.group_docente = Group.objects.create(name="Docente")
@@ -478,6 +664,119 @@ class AsistenciaTests(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    @patch("asistencias.models.transaction.on_commit", lambda f: f())
+    def test_create_multiple_asistencias_sin_cache(self, mock):
+        """
+        Test de que la carga del dia recalcula los acumulados de una vez y
+        se guarda aunque el cache no responda al invalidar
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = [
+            {
+                "fecha": "01/11/2019",
+                "asistio": asistio,
+                "alumno_curso": alumno_curso.id,
+            }
+            for alumno_curso, asistio in (
+                (self.alumno_curso_1, 1),
+                (self.alumno_curso_3, 0.5),
+            )
+        ]
+        with patch("ontrack.versiones.cache") as cache_caido:
+            cache_caido.add.side_effect = ConnectionError
+            with self.assertLogs("ontrack.versiones", level="ERROR"):
+                with CaptureQueriesContext(connection) as consultas:
+                    response = self.client.post(
+                        "/api/asistencias/multiple/", data, format="json"
+                    )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sum(
+                "INSERT INTO \"asistencias_asistencia\"" in q["sql"]
+                for q in consultas.captured_queries
+            ),
+            1,
+        )
+        self.assertEqual(
+            AcumuladoAsistencia.objects.filter(
+                fecha=datetime.date(2019, 11, 1)
+            ).count(),
+            2,
+        )
+        self.assertEqual(
+            ResumenMensualAsistencia.objects.get(
+                alumno_curso=self.alumno_curso_3,
+                mes=datetime.date(2019, 11, 1),
+            ).cantidad,
+            Asistencia.objects.filter(
+                alumno_curso=self.alumno_curso_3,
+                fecha__month=11,
+            ).count(),
+        )
+
+    def test_create_multiple_actualizar(self, mock):
+        """
+        Test de sobrescritura de un dia completo, recalculando solo los
+        alumnos cuyo valor cambio
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = [
+            {
+                "fecha": "22/11/2019",
+                "asistio": 1,
+                "alumno_curso": self.alumno_curso_1.id,
+            },
+            {
+                "fecha": "22/11/2019",
+                "asistio": 1,
+                "alumno_curso": self.alumno_curso_3.id,
+            },
+        ]
+        response = self.client.post(
+            "/api/asistencias/multiple/?actualizar=true", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Asistencia.objects.filter(fecha=datetime.date(2019, 11, 22))
+            .values_list("asistio", flat=True)
+            .distinct()
+            .get(),
+            1,
+        )
+        self.assertEqual(
+            list(EventoRecalculo.objects.values_list("alumno_id", flat=True)),
+            [self.alumno_1.id],
+        )
+        response = self.client.get(
+            f"/api/asistencias/stats/porcentaje/?alumno_curso={self.alumno_curso_1.id}"
+        )
+        self.assertEqual(response.data["porcentaje"], 1)
+
+    def test_create_multiple_existente_sin_actualizar(self, mock):
+        """
+        Test de que sin actualizar=true la restriccion unica rechaza la carga
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = [
+            {
+                "fecha": "22/11/2019",
+                "asistio": 1,
+                "alumno_curso": self.alumno_curso_1.id,
+            },
+        ]
+        response = self.client.post(
+            "/api/asistencias/multiple/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            Asistencia.objects.get(
+                alumno_curso=self.alumno_curso_1,
+                fecha=datetime.date(2019, 11, 22),
+            ).asistio,
+            0,
+        )
+        self.assertFalse(EventoRecalculo.objects.exists())
+
     def test_create_multiple_asistencias_docente(self, mock):
         """
         Test de creacion de Asistencias por docente
@@ -776,6 +1075,24 @@ class AsistenciaTests(APITestCase):
         response = self.client.post("/api/asistencias/", data, format="json")
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_create_asistencia_registra_evento(self, mock):
+        """
+        Test de que la creacion deja el recalculo en el outbox sin usar Redis
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "fecha": "01/11/2019",
+            "asistio": 1,
+            "alumno_curso": self.alumno_curso_1.id,
+        }
+        response = self.client.post("/api/asistencias/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        evento = EventoRecalculo.objects.get()
+        self.assertEqual(evento.tipo, EventoRecalculo.ASISTENCIA)
+        self.assertEqual(evento.alumno, self.alumno_curso_1.alumno)
+        self.assertEqual(evento.fecha, datetime.date(2019, 11, 1))
+        mock.get_connection.assert_not_called()
+
     def test_create_asistencia_docente(self, mock):
         """
         Test de creacion de Asistencia por docente
@@ -887,6 +1204,46 @@ class AsistenciaTests(APITestCase):
             "No se pueden cargar asistencias para fines de semana",
         )
 
+    def test_create_asistencia_feriado(self, m):
+        """
+        Test de creacion de Asistencia en un feriado del calendario
+        """
+        DiaCalendario.objects.create(
+            tipo=DiaCalendario.FERIADO,
+            fecha_desde=datetime.date(2019, 11, 18),
+            institucion=self.institucion_1,
+        )
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "fecha": "18/11/2019",
+            "asistio": 0,
+            "alumno_curso": self.alumno_curso_1.id,
+        }
+        response = self.client.post("/api/asistencias/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data.get("detail"),
+            "No se pueden cargar asistencias para días no lectivos",
+        )
+
+    def test_create_asistencia_dia_especial(self, m):
+        """
+        Test de creacion de Asistencia en un sabado lectivo del calendario
+        """
+        DiaCalendario.objects.create(
+            tipo=DiaCalendario.ESPECIAL,
+            fecha_desde=datetime.date(2019, 11, 2),
+            institucion=self.institucion_1,
+        )
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "fecha": "02/11/2019",
+            "asistio": 0,
+            "alumno_curso": self.alumno_curso_1.id,
+        }
+        response = self.client.post("/api/asistencias/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     def test_create_asistencia_ya_existente(self, m):
         """
         Test de creacion de Asistencia con asistencia ya existente
@@ -1434,6 +1791,55 @@ class AsistenciaTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["porcentaje"], 1)
 
+    def test_stats_asistencias_acumulados_actualizados(self, mock):
+        """
+        Test de que el porcentaje sigue a altas, modificaciones y bajas
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        url = f"/api/asistencias/stats/porcentaje/?alumno_curso={self.alumno_curso_1.id}&fecha_desde=16-11-2019&fecha_hasta=30-11-2019"
+
+        nueva = Asistencia.objects.create(
+            fecha="2019-11-20", asistio=1, alumno_curso=self.alumno_curso_1,
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.data["porcentaje"], 0.5)
+
+        asistencia = Asistencia.objects.get(pk=self.asistencia_2.pk)
+        asistencia.asistio = 0.5
+        asistencia.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data["porcentaje"], 0.75)
+
+        nueva.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.data["porcentaje"], 0.5)
+        self.assertFalse(
+            AcumuladoAsistencia.objects.filter(
+                alumno_curso=self.alumno_curso_1,
+                fecha=datetime.date(2019, 11, 20),
+            ).exists()
+        )
+
+    def test_reconstruir_acumulados(self, mock):
+        """
+        Test de que la reconstruccion coincide con el mantenimiento incremental
+        """
+        acumulados = list(
+            AcumuladoAsistencia.objects.order_by(
+                "alumno_curso_id", "fecha"
+            ).values_list("alumno_curso_id", "fecha", "total", "cantidad")
+        )
+        AcumuladoAsistencia.objects.all().delete()
+        call_command("reconstruir_acumulados_asistencias", stdout=StringIO())
+        self.assertEqual(
+            list(
+                AcumuladoAsistencia.objects.order_by(
+                    "alumno_curso_id", "fecha"
+                ).values_list("alumno_curso_id", "fecha", "total", "cantidad")
+            ),
+            acumulados,
+        )
+
     def test_stats_asistencias_sin_rango(self, mock):
         """
         Test de stats de Asistencia sin rango
@@ -1445,6 +1851,512 @@ class AsistenciaTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["porcentaje"], 0.5)
 
+    def test_stats_curso(self, mock):
+        """
+        Test de porcentajes de asistencia de todo un curso en una consulta
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(
+                f"/api/asistencias/stats/porcentaje/curso/?curso={self.curso_1.id}&anio_lectivo={self.anio_lectivo_1.id}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        alumnos = {a["alumno_curso"]: a for a in response.data["alumnos"]}
+        self.assertEqual(len(alumnos), 2)
+        self.assertEqual(alumnos[self.alumno_curso_1.id]["porcentaje"], 0.5)
+        self.assertEqual(alumnos[self.alumno_curso_1.id]["presentes"], 1)
+        self.assertEqual(alumnos[self.alumno_curso_1.id]["ausentes"], 1)
+        self.assertEqual(
+            alumnos[self.alumno_curso_1.id]["ultima_ausencia"], "22/11/2019"
+        )
+        self.assertEqual(alumnos[self.alumno_curso_3.id]["porcentaje"], 1)
+        self.assertIsNone(alumnos[self.alumno_curso_3.id]["ultima_ausencia"])
+        consultas_alumnos = [
+            q for q in consultas if "alumnos_alumnocurso" in q["sql"]
+        ]
+        self.assertEqual(len(consultas_alumnos), 1)
+
+    def test_stats_curso_rango(self, mock):
+        """
+        Test de porcentajes de asistencia de un curso con rango
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/porcentaje/curso/?curso={self.curso_1.id}&anio_lectivo={self.anio_lectivo_1.id}&fecha_desde=15-11-2019&fecha_hasta=21-11-2019"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        alumnos = {a["alumno_curso"]: a for a in response.data["alumnos"]}
+        self.assertEqual(alumnos[self.alumno_curso_1.id]["porcentaje"], 1)
+        self.assertEqual(alumnos[self.alumno_curso_1.id]["ausentes"], 0)
+        self.assertEqual(alumnos[self.alumno_curso_3.id]["porcentaje"], 0)
+        self.assertEqual(alumnos[self.alumno_curso_3.id]["presentes"], 0)
+
+    def test_stats_curso_otra_institucion(self, mock):
+        """
+        Test de porcentajes de asistencia de un curso de otra institucion
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/porcentaje/curso/?curso={self.curso_3.id}&anio_lectivo={self.anio_lectivo_3.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stats_curso_docente(self, mock):
+        """
+        Test de porcentajes de asistencia de un curso sin permiso
+        """
+        self.client.force_authenticate(user=self.user_docente)
+        response = self.client.get(
+            f"/api/asistencias/stats/porcentaje/curso/?curso={self.curso_1.id}&anio_lectivo={self.anio_lectivo_1.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_matriz_asistencias(self, mock):
+        """
+        Test de carga de asistencias de varios dias para un curso
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "curso": self.curso_1.id,
+            "fechas": ["18/11/2019", "19/11/2019", "20/11/2019"],
+            "alumnos_curso": [self.alumno_curso_1.id, self.alumno_curso_3.id],
+            "valores": [[1, 0, None], [None, 1, 0.5]],
+        }
+        response = self.client.post(
+            "/api/asistencias/matriz/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Asistencia.objects.filter(
+                fecha__range=["2019-11-18", "2019-11-20"]
+            ).count(),
+            4,
+        )
+        self.assertEqual(
+            sorted(EventoRecalculo.objects.values_list("alumno_id", "fecha")),
+            sorted(
+                [
+                    (self.alumno_1.id, datetime.date(2019, 11, 18)),
+                    (self.alumno_2.id, datetime.date(2019, 11, 19)),
+                ]
+            ),
+        )
+        response = self.client.get(
+            f"/api/asistencias/stats/porcentaje/?alumno_curso={self.alumno_curso_3.id}"
+        )
+        self.assertEqual(response.data["porcentaje"], 2.5 / 3)
+
+    def test_matriz_asistencias_csv(self, mock):
+        """
+        Test de carga de asistencias de varios dias desde un CSV
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        archivo = StringIO(
+            "alumno_curso,18/11/2019,19/11/2019\n"
+            f"{self.alumno_curso_1.id},1,\n"
+            f"{self.alumno_curso_3.id},0,0.5\n"
+        )
+        archivo.name = "asistencias.csv"
+        response = self.client.post(
+            f"/api/asistencias/matriz/?curso={self.curso_1.id}",
+            {"file": archivo},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Asistencia.objects.get(
+                alumno_curso=self.alumno_curso_3,
+                fecha=datetime.date(2019, 11, 19),
+            ).asistio,
+            0.5,
+        )
+        self.assertFalse(
+            Asistencia.objects.filter(
+                alumno_curso=self.alumno_curso_1,
+                fecha=datetime.date(2019, 11, 19),
+            ).exists()
+        )
+
+    def test_matriz_asistencias_csv_codificacion(self, mock):
+        """
+        Test de carga de un CSV que no está codificado en UTF-8
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        archivo = BytesIO(
+            "alumno_curso,18/11/2019\n"
+            f"{self.alumno_curso_1.id},1 año\n".encode("latin-1")
+        )
+        archivo.name = "asistencias.csv"
+        response = self.client.post(
+            f"/api/asistencias/matriz/?curso={self.curso_1.id}",
+            {"file": archivo},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["detail"],
+            "El archivo debe estar codificado en UTF-8",
+        )
+        self.assertFalse(
+            Asistencia.objects.filter(
+                fecha=datetime.date(2019, 11, 18)
+            ).exists()
+        )
+
+    def test_matriz_asistencias_fin_de_semana(self, mock):
+        """
+        Test de carga de asistencias de varios dias con un sabado
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "curso": self.curso_1.id,
+            "fechas": ["21/11/2019", "23/11/2019"],
+            "alumnos_curso": [self.alumno_curso_3.id],
+            "valores": [[1, 1]],
+        }
+        response = self.client.post(
+            "/api/asistencias/matriz/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["detail"],
+            "No se pueden cargar asistencias para fines de semana",
+        )
+        self.assertFalse(
+            Asistencia.objects.filter(
+                fecha=datetime.date(2019, 11, 21)
+            ).exists()
+        )
+
+    def test_matriz_asistencias_existente(self, mock):
+        """
+        Test de carga de varios dias con una asistencia ya cargada
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "curso": self.curso_1.id,
+            "fechas": ["21/11/2019", "22/11/2019"],
+            "alumnos_curso": [self.alumno_curso_1.id],
+            "valores": [[1, 1]],
+        }
+        response = self.client.post(
+            "/api/asistencias/matriz/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(EventoRecalculo.objects.exists())
+        response = self.client.post(
+            "/api/asistencias/matriz/?actualizar=true", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(EventoRecalculo.objects.values_list("alumno_id", "fecha")),
+            [(self.alumno_1.id, datetime.date(2019, 11, 21))],
+        )
+
+    def test_matriz_asistencias_otro_curso(self, mock):
+        """
+        Test de carga de varios dias con un alumno de otro curso
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "curso": self.curso_1.id,
+            "fechas": ["21/11/2019"],
+            "alumnos_curso": [self.alumno_curso_1.id, self.alumno_curso_5.id],
+            "valores": [[1], [1]],
+        }
+        response = self.client.post(
+            "/api/asistencias/matriz/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_exportar_asistencias_csv(self, mock):
+        """
+        Test de exportacion de asistencias de un curso en CSV
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/exportar/?curso={self.curso_1.id}&fecha_desde=01-11-2019&fecha_hasta=30-11-2019"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        filas = list(
+            csv.reader(
+                b"".join(response.streaming_content).decode().splitlines()
+            )
+        )
+        self.assertEqual(
+            filas[0],
+            ["alumno_curso", "apellido", "nombre", "15/11/2019", "22/11/2019"],
+        )
+        self.assertEqual(len(filas), 3)
+        fila_1 = next(f for f in filas if f[0] == str(self.alumno_curso_1.id))
+        self.assertEqual(fila_1[3:], ["1.0", "0.0"])
+        fila_3 = next(f for f in filas if f[0] == str(self.alumno_curso_3.id))
+        self.assertEqual(fila_3[3:], ["", "1.0"])
+
+    def test_exportar_asistencias_sin_fecha(self, mock):
+        """
+        Test de exportacion de asistencias sin fecha_desde
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/exportar/?curso={self.curso_1.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["detail"],
+            "Es necesario ingresar al menos la fecha_desde",
+        )
+
+    def test_exportar_asistencias_otra_institucion(self, mock):
+        """
+        Test de exportacion de asistencias de un curso de otra institucion
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/exportar/?curso={self.curso_3.id}&fecha_desde=05-01-2021"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_faltantes_asistencias(self, mock):
+        """
+        Test de cursos sin asistencia completa en un rango de fechas
+        """
+        cache.clear()
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            "/api/asistencias/faltantes/?fecha_desde=21-11-2019&fecha_hasta=23-11-2019"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (f["curso"], f["fecha"], f["alumnos"], f["faltantes"])
+                for f in response.data
+            ],
+            [
+                (self.curso_1.id, "21/11/2019", 2, 2),
+                (self.curso_2.id, "21/11/2019", 1, 1),
+                (self.curso_2.id, "22/11/2019", 1, 1),
+            ],
+        )
+
+    # Los tests no confirman la transacción: el cache se invalida al guardar
+    @patch("asistencias.models.transaction.on_commit", lambda f: f())
+    def test_faltantes_asistencias_invalida_cache(self, mock):
+        """
+        Test de que cargar una asistencia invalida los cursos sin asistencia
+        """
+        cache.clear()
+        self.client.force_authenticate(user=self.user_admin)
+        url = "/api/asistencias/faltantes/?fecha_desde=21-11-2019"
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]["faltantes"], 2)
+
+        data = {
+            "fecha": "21/11/2019",
+            "asistio": 1,
+            "alumno_curso": self.alumno_curso_1.id,
+        }
+        response = self.client.post("/api/asistencias/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]["faltantes"], 1)
+
+        response = self.client.delete(
+            f"/api/asistencias/multiple/?curso={self.curso_1.id}&fecha_desde=21-11-2019"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]["faltantes"], 2)
+
+    def test_faltantes_asistencias_fechas_invalidas(self, mock):
+        """
+        Test de cursos sin asistencia con un rango invertido
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            "/api/asistencias/faltantes/?fecha_desde=22-11-2019&fecha_hasta=21-11-2019"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_comando_cursos_sin_asistencia(self, mock):
+        """
+        Test del comando que revisa los cursos sin asistencia de un dia
+        """
+        cache.clear()
+        out = StringIO()
+        call_command(
+            "cursos_sin_asistencia",
+            "--fecha",
+            "22/11/2019",
+            "--institucion",
+            str(self.institucion_1.id),
+            stdout=out,
+        )
+        self.assertIn("1 cursos sin asistencia completa", out.getvalue())
+        self.assertIn("CURSO2", out.getvalue())
+
+    def test_racha_asistencias(self, mock):
+        """
+        Test de que la racha de ausencias sigue las cargas de asistencias
+        """
+        racha = RachaAsistencia.objects.get(alumno_curso=self.alumno_curso_1)
+        self.assertEqual(racha.racha_actual, 1)
+        self.assertEqual(racha.ultima_presencia, datetime.date(2019, 11, 15))
+
+        for dia in (25, 26):
+            Asistencia.objects.create(
+                fecha=datetime.date(2019, 11, dia),
+                asistio=0,
+                alumno_curso=self.alumno_curso_1,
+            )
+        racha = RachaAsistencia.objects.get(alumno_curso=self.alumno_curso_1)
+        self.assertEqual((racha.racha_actual, racha.racha_maxima), (3, 3))
+        self.assertEqual(racha.ultima_fecha, datetime.date(2019, 11, 26))
+
+        presente = Asistencia.objects.create(
+            fecha=datetime.date(2019, 11, 27),
+            asistio=0.5,
+            alumno_curso=self.alumno_curso_1,
+        )
+        racha = RachaAsistencia.objects.get(alumno_curso=self.alumno_curso_1)
+        self.assertEqual((racha.racha_actual, racha.racha_maxima), (0, 3))
+        self.assertEqual(racha.ultima_presencia, datetime.date(2019, 11, 27))
+
+        # Los cambios que no son una asistencia nueva al final reconstruyen
+        presente.delete()
+        Asistencia.objects.create(
+            fecha=datetime.date(2019, 11, 21),
+            asistio=0,
+            alumno_curso=self.alumno_curso_1,
+        )
+        racha = RachaAsistencia.objects.get(alumno_curso=self.alumno_curso_1)
+        self.assertEqual((racha.racha_actual, racha.racha_maxima), (4, 4))
+        self.assertEqual(racha.ultima_presencia, datetime.date(2019, 11, 15))
+
+    def test_riesgo_asistencias(self, mock):
+        """
+        Test de alumnos con ausencias consecutivas de un curso
+        """
+        for dia in (25, 26):
+            Asistencia.objects.create(
+                fecha=datetime.date(2019, 11, dia),
+                asistio=0,
+                alumno_curso=self.alumno_curso_3,
+            )
+        Asistencia.objects.create(
+            fecha=datetime.date(2019, 11, 25),
+            asistio=0,
+            alumno_curso=self.alumno_curso_1,
+        )
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/riesgo/?curso={self.curso_1.id}&minimo=2"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (alumno["alumno_curso"], alumno["racha_actual"])
+                for alumno in response.data
+            ],
+            [(self.alumno_curso_1.id, 2), (self.alumno_curso_3.id, 2)],
+        )
+        self.assertEqual(response.data[0]["ultima_presencia"], "15/11/2019")
+
+        response = self.client.get("/api/asistencias/stats/riesgo/")
+        self.assertEqual(response.data, [])
+
+    def test_riesgo_asistencias_otra_institucion(self, mock):
+        """
+        Test de alumnos con ausencias consecutivas de un curso de otra institucion
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/riesgo/?curso={self.curso_3.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_heatmap_curso(self, mock):
+        """
+        Test del mapa mensual de asistencias de un curso
+        """
+        Asistencia.objects.create(
+            fecha="2019-03-04", asistio=0.5, alumno_curso=self.alumno_curso_3,
+        )
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/heatmap/?curso={self.curso_1.id}&anio_lectivo={self.anio_lectivo_1.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["meses"]), 12)
+        self.assertEqual(response.data["meses"][2], "03/2019")
+        self.assertEqual(
+            response.data["alumnos_curso"],
+            [self.alumno_curso_1.id, self.alumno_curso_3.id],
+        )
+        fila_1, fila_3 = response.data["valores"]
+        self.assertEqual(fila_1[10], 0.5)
+        self.assertIsNone(fila_1[2])
+        self.assertEqual(fila_3[2], 0.5)
+        self.assertEqual(fila_3[10], 1)
+
+    def test_heatmap_sigue_bajas(self, mock):
+        """
+        Test de que el resumen mensual se actualiza al borrar asistencias
+        """
+        Asistencia.objects.get(pk=self.asistencia_2.pk).delete()
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/heatmap/?curso={self.curso_1.id}&anio_lectivo={self.anio_lectivo_1.id}"
+        )
+        self.assertEqual(response.data["valores"][0][10], 1)
+        Asistencia.objects.get(pk=self.asistencia_1.pk).delete()
+        self.assertFalse(
+            ResumenMensualAsistencia.objects.filter(
+                alumno_curso=self.alumno_curso_1
+            ).exists()
+        )
+
+    def test_heatmap_otra_institucion(self, mock):
+        """
+        Test del mapa mensual de un curso de otra institucion
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/heatmap/?curso={self.curso_3.id}&anio_lectivo={self.anio_lectivo_3.id}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stats_asistencias_dias_lectivos(self, mock):
+        """
+        Test de porcentaje de Asistencia sobre los dias lectivos
+        """
+        DiaCalendario.objects.create(
+            tipo=DiaCalendario.FERIADO,
+            fecha_desde=datetime.date(2019, 11, 11),
+            institucion=self.institucion_1,
+        )
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/asistencias/stats/porcentaje/?alumno_curso={self.alumno_curso_1.id}&fecha_desde=11-11-2019&fecha_hasta=22-11-2019"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["porcentaje"], 0.5)
+        self.assertEqual(response.data["dias_lectivos"], 9)
+        self.assertEqual(response.data["porcentaje_dias_lectivos"], 1 / 9)
+
+        response = self.client.get(
+            f"/api/asistencias/stats/porcentaje/curso/?curso={self.curso_1.id}&anio_lectivo={self.anio_lectivo_1.id}&fecha_desde=11-11-2019&fecha_hasta=22-11-2019"
+        )
+        self.assertEqual(response.data["dias_lectivos"], 9)
+        self.assertEqual(
+            [
+                alumno["porcentaje_dias_lectivos"]
+                for alumno in response.data["alumnos"]
+            ],
+            [1 / 9, 1 / 9],
+        )
+
     def test_stats_asistencias_sin_alumno_curso(self, mock):
         """
         Test de stats de Asistencia sin alumno_curso
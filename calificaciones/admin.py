@@ -1,6 +1,7 @@
 from django.contrib import admin
-from calificaciones.models import Calificacion
+from calificaciones.models import Calificacion, RankingCalificacion
 from ontrack import settings
 
 if settings.DEVELOPER_ADMIN:
     admin.site.register(Calificacion)
+    admin.site.register(RankingCalificacion)
@@ -6,8 +6,7 @@ from alumnos.models import Alumno, AlumnoCurso
 from ontrack import settings
 from django.shortcuts import get_object_or_404
 from alumnos.api.serializers import ViewAlumnoSerializer
-import django_rq
-from calificaciones.rq_funcions import alumno_calificacion_redesign
+from objetivos.recalculo import recalcular_calificaciones
 
 
 class ViewCalficacionSerializer(serializers.ModelSerializer):
@@ -45,15 +44,14 @@ class CreateCalificacionSerializer(serializers.ModelSerializer):
 class CalificacionSerializer(serializers.Serializer):
 
     puntaje = serializers.FloatField(required=True, min_value=0, max_value=10)
-    alumno = serializers.PrimaryKeyRelatedField(
-        queryset=Alumno.objects.all(), required=True
-    )
+    # Los alumnos se validan todos juntos en CreateCalificacionListSerializer
+    alumno = serializers.IntegerField(required=True)
 
 
 class CreateCalificacionListSerializer(serializers.ModelSerializer):
     fecha = serializers.DateField(required=True)
     evaluacion = serializers.PrimaryKeyRelatedField(
-        queryset=Evaluacion.objects.all(), required=True
+        queryset=Evaluacion.objects.select_related("materia"), required=True
     )
     calificaciones = CalificacionSerializer(many=True, required=True)
 
@@ -63,23 +61,17 @@ class CreateCalificacionListSerializer(serializers.ModelSerializer):
         extra_kwargs = {"fecha": {"input_formats": settings.DATE_INPUT_FORMAT}}
 
     def create(self, validated_data):
-        c = [item for item in validated_data["calificaciones"]]
-        for item in c:
-            calif, created = models.Calificacion.objects.update_or_create(
-                evaluacion=validated_data["evaluacion"],
-                # Verificar la queue ahora que puedo editar fecha
-                alumno=item["alumno"],
-                defaults={
-                    "fecha": validated_data["fecha"],
-                    "puntaje": item["puntaje"],
-                },
-            )
-            django_rq.enqueue(
-                alumno_calificacion_redesign,
-                item["alumno"].id,
-                validated_data["evaluacion"].materia.id,
-                validated_data["fecha"] if created else calif.fecha,
-            )
+        evaluacion = validated_data["evaluacion"]
+        alumnos = [item["alumno"] for item in validated_data["calificaciones"]]
+        fecha = models.guardar_calificaciones(
+            evaluacion.pk,
+            validated_data["fecha"],
+            [
+                (item["alumno"], item["puntaje"])
+                for item in validated_data["calificaciones"]
+            ],
+        )
+        recalcular_calificaciones(alumnos, evaluacion.materia_id, fecha)
 
     def validate(self, data):
         """
@@ -91,39 +83,43 @@ class CreateCalificacionListSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Debe enviar al menos una calficación."
             )
-        alumnos = [a["alumno"].pk for a in data["calificaciones"]]
+        alumnos = [a["alumno"] for a in data["calificaciones"]]
         if len(set(alumnos)) != len(alumnos):
             raise serializers.ValidationError("Existen alumnos repetidos")
         institucion = self.context["request"].user.institucion_id
-        alumnos_institucion = [
-            a["alumno"].institucion_id for a in data["calificaciones"]
-        ]
-        if not all(map(lambda a: a == institucion, alumnos_institucion)):
-            raise serializers.ValidationError("Algunos alumnos no existen")
-
-        anio_lectivo = data["evaluacion"].anio_lectivo
-        alumnos = Alumno.objects.filter(id__in=alumnos)
-        cursos = []
-        for alumno in alumnos:
-            res = AlumnoCurso.objects.get(
-                anio_lectivo_id=anio_lectivo.pk, alumno_id=alumno.pk
-            )
+
+        # Una sola consulta trae el curso (y su año) de todos los alumnos
+        # en el año lectivo de la evaluacion
+        cursos = {
+            alumno_id: (curso_id, anio_id)
+            for alumno_id, curso_id, anio_id in AlumnoCurso.objects.filter(
+                alumno_id__in=alumnos,
+                alumno__institucion_id=institucion,
+                anio_lectivo_id=data["evaluacion"].anio_lectivo_id,
+            ).values_list("alumno_id", "curso_id", "curso__anio_id")
+        }
+        if len(cursos) != len(alumnos):
+            faltantes = set(alumnos) - set(cursos)
+            if Alumno.objects.filter(
+                id__in=faltantes, institucion_id=institucion
+            ).count() != len(faltantes):
+                raise serializers.ValidationError("Algunos alumnos no existen")
             # Tiene que tener que cursar en algun lado para ese año lectivo
-            if not res:
-                raise serializers.ValidationError(
-                    "El alumno no tiene un curso en ese año lectivo"
-                )
-            # Checkeo que el año de la evaluacion sea el año del curso
-            if res.curso.anio.pk != data["evaluacion"].materia.anio.pk:
-                raise serializers.ValidationError(
-                    "La evaluacion es de una \
-                        materia que el alumno no ha cursado!"
-                )
-            cursos.append(res.curso_id)
+            raise serializers.ValidationError(
+                "El alumno no tiene un curso en ese año lectivo"
+            )
+        # Checkeo que el año de la evaluacion sea el año del curso
+        if any(
+            anio_id != data["evaluacion"].materia.anio_id
+            for _, anio_id in cursos.values()
+        ):
+            raise serializers.ValidationError(
+                "La evaluacion es de una \
+                    materia que el alumno no ha cursado!"
+            )
         # Chequeo que todos los cursos sean iguales, sino
         # Puede pasar que este asignando a los de A y del B a la vez
-
-        if len(set(cursos)) != 1:
+        if len({curso_id for curso_id, _ in cursos.values()}) != 1:
             raise serializers.ValidationError(
                 "Los alumnos no pertencen al mismo curso!"
             )
@@ -194,3 +190,67 @@ class NotaFinalCalificacionSerializer(serializers.Serializer):
         required=False, min_value=0, max_value=10
     )
     alumno = serializers.IntegerField(required=True)
+
+
+class MateriaBoletinSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=True)
+    nombre = serializers.CharField(required=True)
+
+
+class AlumnoBoletinSerializer(serializers.Serializer):
+    alumno = serializers.IntegerField(required=True)
+    nombre = serializers.CharField(required=True)
+    apellido = serializers.CharField(required=True)
+    promedios = serializers.ListField(
+        child=serializers.FloatField(allow_null=True)
+    )
+    notas_finales = serializers.ListField(
+        child=serializers.FloatField(allow_null=True)
+    )
+    promedio_general = serializers.FloatField(allow_null=True)
+
+
+class BoletinCalificacionSerializer(serializers.Serializer):
+    curso = serializers.IntegerField(required=True)
+    anio_lectivo = serializers.IntegerField(required=True)
+    materias = MateriaBoletinSerializer(many=True, required=True)
+    alumnos = AlumnoBoletinSerializer(many=True, required=True)
+
+
+class EstadisticasPuntajeSerializer(serializers.Serializer):
+    cantidad = serializers.IntegerField(required=True)
+    promedio = serializers.FloatField(allow_null=True)
+    mediana = serializers.FloatField(allow_null=True)
+    desviacion = serializers.FloatField(allow_null=True)
+    minimo = serializers.FloatField(allow_null=True)
+    maximo = serializers.FloatField(allow_null=True)
+    percentiles = serializers.DictField(
+        child=serializers.FloatField(allow_null=True)
+    )
+    histograma = serializers.ListField(child=serializers.IntegerField())
+
+
+class DistribucionCursoSerializer(EstadisticasPuntajeSerializer):
+    curso = serializers.IntegerField(required=True)
+    nombre = serializers.CharField(required=True)
+
+
+class DistribucionCalificacionSerializer(serializers.Serializer):
+    evaluacion = serializers.IntegerField(required=True)
+    general = EstadisticasPuntajeSerializer(required=True)
+    cursos = DistribucionCursoSerializer(many=True, required=True)
+
+
+class PuestoAlumnoSerializer(serializers.Serializer):
+    alumno = serializers.IntegerField(required=True)
+    nombre = serializers.CharField(required=True)
+    apellido = serializers.CharField(required=True)
+    promedio = serializers.FloatField(required=True)
+    puesto = serializers.IntegerField(required=True)
+    percentil = serializers.FloatField(required=True)
+
+
+class RankingCalificacionSerializer(serializers.Serializer):
+    anio_lectivo = serializers.IntegerField(required=True)
+    curso = serializers.IntegerField(required=True)
+    alumnos = PuestoAlumnoSerializer(many=True, required=True)
@@ -24,4 +24,19 @@ urlpatterns = [
         views.notafinal_calificaciones,
         name="calificaciones-notafinal",
     ),
+    path(
+        "stats/boletin/",
+        views.boletin_calificaciones,
+        name="calificaciones-boletin",
+    ),
+    path(
+        "stats/distribucion/",
+        views.distribucion_calificaciones,
+        name="calificaciones-distribucion",
+    ),
+    path(
+        "stats/ranking/",
+        views.ranking_calificaciones_curso,
+        name="calificaciones-ranking",
+    ),
 ]
@@ -1,9 +1,16 @@
 from rest_framework.viewsets import ModelViewSet
 from calificaciones.api import serializers
 from curricula.models import Carrera, Curso, Evaluacion, AnioLectivo, Materia
-from calificaciones.models import Calificacion
+from calificaciones.models import (
+    Calificacion,
+    RankingCalificacion,
+    boletin_curso,
+    distribucion_evaluacion,
+    ranking_calificaciones,
+    invalidar_calificaciones,
+)
 from instituciones.models import Institucion
-from alumnos.models import Alumno
+from alumnos.models import Alumno, AlumnoCurso
 from users.permissions import permission_required
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
@@ -12,9 +19,35 @@ from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from ontrack import responses
-from functools import reduce
-import django_rq
-from calificaciones.rq_funcions import alumno_calificacion_redesign
+from django.db import transaction
+from django.db.models import Avg, F, FloatField, Sum
+from objetivos.recalculo import (
+    recalcular_calificacion,
+    recalcular_calificaciones,
+)
+import datetime
+import re
+
+DATE_REGEX = r"(?:(?:31(\/|-|\.)(?:0?[13578]|1[02]))\1|(?:(?:29|30)(\/|-|\.)(?:0?[13-9]|1[0-2])\2))(?:(?:1[6-9]|[2-9]\d)?\d{2})$|^(?:29(\/|-|\.)0?2\3(?:(?:(?:1[6-9]|[2-9]\d)?(?:0[48]|[2468][048]|[13579][26])|(?:(?:16|[2468][048]|[3579][26])00))))$|^(?:0?[1-9]|1\d|2[0-8])(\/|-|\.)(?:(?:0?[1-9])|(?:1[0-2]))\4(?:(?:1[6-9]|[2-9]\d)?\d{2})"
+
+
+def notas_por_materia(calificaciones):
+    """
+    Promedio y nota final (suma de puntaje por ponderación) de cada materia,
+    en una sola consulta agrupada por materia con su nombre.
+    """
+    return list(
+        calificaciones.values("evaluacion__materia_id")
+        .annotate(
+            nombre_materia=F("evaluacion__materia__nombre"),
+            promedio=Avg("puntaje"),
+            nota_final=Sum(
+                F("puntaje") * F("evaluacion__ponderacion"),
+                output_field=FloatField(),
+            ),
+        )
+        .order_by("nombre_materia")
+    )
 
 
 class CalificacionViewSet(ModelViewSet):
@@ -27,6 +60,9 @@ class CalificacionViewSet(ModelViewSet):
     OK_VIEW = {200: serializers.ViewCalficacionSerializer()}
     OK_PROMEDIO = {200: serializers.PromedioCalificacionSerializer}
     OK_NOTA_FINAL = {200: serializers.NotaFinalCalificacionSerializer}
+    OK_BOLETIN = {200: serializers.BoletinCalificacionSerializer}
+    OK_DISTRIBUCION = {200: serializers.DistribucionCalificacionSerializer}
+    OK_RANKING = {200: serializers.RankingCalificacionSerializer}
 
     anio_lectivo_param = openapi.Parameter(
         "anio_lectivo",
@@ -58,6 +94,12 @@ class CalificacionViewSet(ModelViewSet):
         description="Evaluacion para la que queremos listar sus calificaciones",
         type=openapi.TYPE_INTEGER,
     )
+    corte_param = openapi.Parameter(
+        "corte",
+        openapi.IN_QUERY,
+        description="Fecha (DD-MM-YYYY) de un ranking guardado al cierre de un período",
+        type=openapi.TYPE_STRING,
+    )
 
     @swagger_auto_schema(
         request_body=serializers.CreateCalificacionSerializer,
@@ -84,13 +126,16 @@ class CalificacionViewSet(ModelViewSet):
                 alumno_id=alumno_id, evaluacion_id=evaluacion_id
             ).count()
             if count == 0:
-                calificacion = serializer.create()
-                django_rq.enqueue(
-                    alumno_calificacion_redesign,
-                    calificacion.alumno.id,
-                    calificacion.evaluacion.materia.id,
-                    serializer.validated_data["fecha"],
-                )
+                with transaction.atomic():
+                    calificacion = serializer.create()
+                    recalcular_calificacion(
+                        calificacion.alumno.id,
+                        calificacion.evaluacion.materia.id,
+                        serializer.validated_data["fecha"],
+                    )
+                    invalidar_calificaciones(
+                        [calificacion.alumno_id], calificacion.evaluacion
+                    )
                 serializer = serializers.ViewCalficacionSerializer(
                     instance=calificacion
                 )
@@ -118,7 +163,15 @@ class CalificacionViewSet(ModelViewSet):
         data = {}
 
         if serializer.is_valid(raise_exception=True):
-            serializer.create(serializer.validated_data)
+            with transaction.atomic():
+                serializer.create(serializer.validated_data)
+                invalidar_calificaciones(
+                    [
+                        item["alumno"]
+                        for item in serializer.validated_data["calificaciones"]
+                    ],
+                    serializer.validated_data["evaluacion"],
+                )
 
         else:
             data = serializer.errors
@@ -145,13 +198,16 @@ class CalificacionViewSet(ModelViewSet):
         )
         data = {}
         if serializer.is_valid(raise_exception=True):
-            serializer.update(calificacion, serializer.validated_data)
-            django_rq.enqueue(
-                alumno_calificacion_redesign,
-                calificacion.alumno.id,
-                calificacion.evaluacion.materia.id,
-                calificacion.fecha,
-            )
+            with transaction.atomic():
+                serializer.update(calificacion, serializer.validated_data)
+                recalcular_calificacion(
+                    calificacion.alumno.id,
+                    calificacion.evaluacion.materia.id,
+                    calificacion.fecha,
+                )
+                invalidar_calificaciones(
+                    [calificacion.alumno_id], calificacion.evaluacion
+                )
         else:
             data = serializer.errors
             return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
@@ -172,14 +228,12 @@ class CalificacionViewSet(ModelViewSet):
         )
         alumno_id = calificacion.alumno.id
         materia_id = calificacion.evaluacion.materia.id
+        evaluacion = calificacion.evaluacion
         fecha_calificacion = calificacion.fecha
-        calificacion.delete()
-        django_rq.enqueue(
-            alumno_calificacion_redesign,
-            alumno_id,
-            materia_id,
-            fecha_calificacion,
-        )
+        with transaction.atomic():
+            calificacion.delete()
+            recalcular_calificacion(alumno_id, materia_id, fecha_calificacion)
+            invalidar_calificaciones([alumno_id], evaluacion)
         return Response(status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
@@ -208,15 +262,13 @@ class CalificacionViewSet(ModelViewSet):
                 min_fecha = sorted([cal.fecha for cal in calificaciones])[0]
             alumnos_id = set(c.alumno.id for c in calificaciones)
             materia_id = serializer.validated_data["evaluacion"].materia.id
-            calificaciones.delete()
-            if calificaciones:
-                for alumno in alumnos_id:
-                    django_rq.enqueue(
-                        alumno_calificacion_redesign,
-                        alumno,
-                        materia_id,
-                        min_fecha,
-                    )
+            with transaction.atomic():
+                calificaciones.delete()
+                if alumnos_id:
+                    recalcular_calificaciones(alumnos_id, materia_id, min_fecha)
+                invalidar_calificaciones(
+                    alumnos_id, serializer.validated_data["evaluacion"]
+                )
         else:
             data = serializer.errors
             return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
@@ -430,17 +482,13 @@ class CalificacionViewSet(ModelViewSet):
                     evaluacion__materia_id=materia.pk,
                 )
 
-                calificaciones = queryset
-                total = reduce(
-                    lambda x, y: x + y, [c.puntaje for c in calificaciones]
-                )
-                data["promedios"].append(
+                data["promedios"] = [
                     {
-                        "nombre_materia": materia.nombre,
-                        "promedio": total / len(calificaciones),
+                        "nombre_materia": nota["nombre_materia"],
+                        "promedio": nota["promedio"],
                     }
-                )
-
+                    for nota in notas_por_materia(queryset)
+                ]
                 data["alumno"] = alumno.pk
 
             else:
@@ -459,33 +507,19 @@ class CalificacionViewSet(ModelViewSet):
                     evaluacion__anio_lectivo_id=anio_lectivo.pk,
                 )
 
-                calificaciones = queryset
-                materias = [
-                    (c.evaluacion.materia_id, c.evaluacion.materia.nombre)
-                    for c in calificaciones
+                # El promedio general sale de los mismos resultados
+                data["promedios"] = [
+                    {
+                        "nombre_materia": nota["nombre_materia"],
+                        "promedio": nota["promedio"],
+                    }
+                    for nota in notas_por_materia(queryset)
                 ]
-                materias = set(materias)
-                overall = 0
-                for m_id, m_nombre in materias:
-
-                    c_iter = [
-                        c
-                        for c in calificaciones
-                        if (m_id == c.evaluacion.materia_id)
-                    ]
-
-                    total = reduce(
-                        lambda x, y: x + y, [c.puntaje for c in c_iter]
-                    )
-                    data["promedios"].append(
-                        {
-                            "nombre_materia": m_nombre,
-                            "promedio": total / len(c_iter),
-                        }
-                    )
-                    overall += total / len(c_iter)
                 data["alumno"] = alumno.pk
-                data["promedio_general"] = overall / len(materias)
+                if data["promedios"]:
+                    data["promedio_general"] = sum(
+                        p["promedio"] for p in data["promedios"]
+                    ) / len(data["promedios"])
 
         else:
             if alumno:  # Falta anio_lectivo
@@ -578,19 +612,13 @@ class CalificacionViewSet(ModelViewSet):
                     evaluacion__materia_id=materia.pk,
                 )
 
-                calificaciones = queryset
-                # calcular nota final para la materia
-                total = map(
-                    lambda x: x.puntaje * x.evaluacion.ponderacion,
-                    [c for c in calificaciones],
-                )
-                data["notas_finales"].append(
+                data["notas_finales"] = [
                     {
-                        "nombre_materia": materia.nombre,
-                        "nota_final": sum(total),
+                        "nombre_materia": nota["nombre_materia"],
+                        "nota_final": nota["nota_final"],
                     }
-                )
-
+                    for nota in notas_por_materia(queryset)
+                ]
                 data["alumno"] = alumno.pk
 
             else:
@@ -609,31 +637,19 @@ class CalificacionViewSet(ModelViewSet):
                     evaluacion__anio_lectivo_id=anio_lectivo.pk,
                 )
 
-                calificaciones = queryset
-                materias = [
-                    (c.evaluacion.materia_id, c.evaluacion.materia.nombre)
-                    for c in calificaciones
+                # El promedio general sale de los mismos resultados
+                data["notas_finales"] = [
+                    {
+                        "nombre_materia": nota["nombre_materia"],
+                        "nota_final": nota["nota_final"],
+                    }
+                    for nota in notas_por_materia(queryset)
                 ]
-                materias = set(materias)
-                overall = 0
-                for m_id, m_nombre in materias:
-                    # calcular nota final para la materia
-                    c_iter = [
-                        c
-                        for c in calificaciones
-                        if (m_id == c.evaluacion.materia_id)
-                    ]
-
-                    total = map(
-                        lambda x: x.puntaje * x.evaluacion.ponderacion, c_iter
-                    )
-                    nota_final = sum(total)
-                    data["notas_finales"].append(
-                        {"nombre_materia": m_nombre, "nota_final": nota_final}
-                    )
-                    overall += nota_final
                 data["alumno"] = alumno.pk
-                data["promedio_general"] = overall / len(materias)
+                if data["notas_finales"]:
+                    data["promedio_general"] = sum(
+                        n["nota_final"] for n in data["notas_finales"]
+                    ) / len(data["notas_finales"])
 
         else:
             if alumno:  # Falta anio_lectivo
@@ -660,6 +676,270 @@ class CalificacionViewSet(ModelViewSet):
             return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
         return Response(data=data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(
+        manual_parameters=[curso_param, anio_lectivo_param],
+        responses={**OK_BOLETIN, **responses.STANDARD_ERRORS},
+    )
+    def boletin(self, request):
+        """
+        Consultar el boletín de un curso en un año lectivo
+
+        * Si paso curso y anio_lectivo
+            Recibo:
+                materias : [ // las materias del año del curso
+                    "id": Integer,
+                    "nombre": String
+                    ]
+                alumnos : [ // uno por cada alumno del curso
+                    "alumno": Integer,
+                    "nombre": String,
+                    "apellido": String,
+                    "promedios": [Float], // en el orden de materias
+                    "notas_finales": [Float], // en el orden de materias
+                    "promedio_general": Float
+                    ]
+                curso : Integer
+                anio_lectivo : Integer
+
+        * Las materias sin calificaciones del alumno vienen en null
+        * El promedio y la nota final se calculan igual que en \
+            promedio y nota-final
+        """
+        curso = request.query_params.get("curso", None)
+        anio_lectivo = request.query_params.get("anio_lectivo", None)
+
+        if curso is None:
+            return Response(
+                data={"detail": "Es necesario especificar el id del curso"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if anio_lectivo is None:
+            return Response(
+                data={
+                    "detail": "Es necesario especificar el id del anio_lectivo"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        institucion_id = request.user.institucion_id
+        curso = get_object_or_404(
+            Curso.objects.filter(anio__carrera__institucion_id=institucion_id),
+            pk=curso,
+        )
+        anio_lectivo = get_object_or_404(
+            AnioLectivo.objects.filter(institucion_id=institucion_id),
+            pk=anio_lectivo,
+        )
+
+        serializer = serializers.BoletinCalificacionSerializer(
+            instance=boletin_curso(curso, anio_lectivo)
+        )
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        manual_parameters=[evaluacion_param],
+        responses={**OK_DISTRIBUCION, **responses.STANDARD_ERRORS},
+    )
+    def distribucion(self, request):
+        """
+        Consultar la distribución de los puntajes de una evaluación
+
+        * Si paso evaluacion
+            Recibo:
+                general : estadisticas de todos los alumnos
+                cursos : [ // uno por cada curso con calificaciones
+                    "curso": Integer,
+                    "nombre": String,
+                    ...estadisticas del curso
+                    ]
+                evaluacion : Integer
+
+        * Las estadisticas son cantidad, promedio, mediana, desviacion \
+            (poblacional), minimo, maximo, percentiles (10, 25, 50, 75 y 90) \
+            e histograma (cantidad de puntajes en cada punto de 0 a 10, \
+            el último incluye al 10)
+        """
+        evaluacion = request.query_params.get("evaluacion", None)
+        if evaluacion is None:
+            return Response(
+                data={
+                    "detail": "Es necesario especificar el id de la evaluacion"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        evaluacion = get_object_or_404(
+            Evaluacion.objects.filter(
+                anio_lectivo__institucion_id=request.user.institucion_id
+            ),
+            pk=evaluacion,
+        )
+
+        serializer = serializers.DistribucionCalificacionSerializer(
+            instance=distribucion_evaluacion(evaluacion)
+        )
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            anio_lectivo_param,
+            curso_param,
+            alumno_param,
+            materia_param,
+            corte_param,
+        ],
+        responses={**OK_RANKING, **responses.STANDARD_ERRORS},
+    )
+    def ranking(self, request):
+        """
+        Consultar el puesto y el percentil de los alumnos dentro de su curso
+        - Si se agrega el parámetro materia, se ordena por el promedio de esa materia
+        - Si se agrega el parámetro corte, se responde con el ranking guardado \
+            al cierre del período en esa fecha
+
+        * Si paso curso y anio_lectivo
+            Recibo:
+                alumnos : [ // uno por cada alumno con calificaciones
+                    "alumno": Integer,
+                    "nombre": String,
+                    "apellido": String,
+                    "promedio": Float,
+                    "puesto": Integer,
+                    "percentil": Float
+                    ]
+                curso : Integer
+                anio_lectivo : Integer
+        * Si paso alumno y anio_lectivo
+            Recibo lo mismo, con el alumno solo, dentro del curso que cursa
+
+        * Como se calcula?
+            El promedio de cada materia es la suma de puntaje por ponderación \
+            dividida por la suma de las ponderaciones de las evaluaciones \
+            calificadas; no es el mismo valor que el de los objetivos de \
+            promedio, donde lo que falta evaluar cuenta con el valor máximo. \
+            Un alumno con dos cursos en el año se ubica en el último. \
+            Los alumnos empatados comparten el puesto. \
+            El percentil va de 0 (promedio más bajo) a 1 (más alto)
+        """
+        curso = request.query_params.get("curso", None)
+        alumno = request.query_params.get("alumno", None)
+        anio_lectivo = request.query_params.get("anio_lectivo", None)
+        materia = request.query_params.get("materia", None)
+        corte = request.query_params.get("corte", None)
+
+        if anio_lectivo is None:
+            return Response(
+                data={
+                    "detail": "Es necesario especificar el id del anio_lectivo"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if curso is None and alumno is None:
+            return Response(
+                data={
+                    "detail": "Es necesario especificar el id del curso o del alumno"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if corte:
+            if not re.compile(DATE_REGEX).match(corte):
+                return Response(
+                    data={
+                        "detail": "La fecha ingresada no está correctamente expresada"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            temp = corte.split("-")
+            corte = datetime.date(int(temp[2]), int(temp[1]), int(temp[0]))
+
+        institucion_id = request.user.institucion_id
+        anio_lectivo = get_object_or_404(
+            AnioLectivo.objects.filter(institucion_id=institucion_id),
+            pk=anio_lectivo,
+        )
+        if alumno:
+            alumno_curso = (
+                AlumnoCurso.objects.filter(
+                    alumno__institucion_id=institucion_id,
+                    anio_lectivo_id=anio_lectivo.pk,
+                    alumno_id=alumno,
+                )
+                .order_by("-id")
+                .first()
+            )
+            if alumno_curso is None:
+                return Response(
+                    data={"detail": "No encontrado."},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            curso = alumno_curso.curso_id
+            alumno = alumno_curso.alumno_id
+        else:
+            curso = get_object_or_404(
+                Curso.objects.filter(
+                    anio__carrera__institucion_id=institucion_id
+                ),
+                pk=curso,
+            ).pk
+        if materia:
+            materia = get_object_or_404(
+                Materia.objects.filter(
+                    anio__carrera__institucion_id=institucion_id
+                ),
+                pk=materia,
+            ).pk
+
+        if corte:
+            filas = list(
+                RankingCalificacion.objects.filter(
+                    alumno_curso__anio_lectivo_id=anio_lectivo.pk,
+                    alumno_curso__curso_id=curso,
+                    materia_id=materia,
+                    fecha=corte,
+                )
+                .order_by(
+                    "puesto",
+                    "alumno_curso__alumno__apellido",
+                    "alumno_curso__alumno__nombre",
+                )
+                .values(
+                    "promedio",
+                    "puesto",
+                    "percentil",
+                    alumno_id=F("alumno_curso__alumno_id"),
+                    nombre=F("alumno_curso__alumno__nombre"),
+                    apellido=F("alumno_curso__alumno__apellido"),
+                )
+            )
+            if not filas:
+                return Response(
+                    data={
+                        "detail": "No hay un ranking guardado para esa fecha"
+                    },
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+        else:
+            filas = ranking_calificaciones(
+                anio_lectivo.pk, curso=curso, materia=materia
+            )
+
+        data = {
+            "anio_lectivo": anio_lectivo.pk,
+            "curso": curso,
+            "alumnos": [
+                {
+                    "alumno": fila["alumno_id"],
+                    "nombre": fila["nombre"],
+                    "apellido": fila["apellido"],
+                    "promedio": fila["promedio"],
+                    "puesto": fila["puesto"],
+                    "percentil": fila["percentil"],
+                }
+                for fila in filas
+                if alumno is None or fila["alumno_id"] == alumno
+            ],
+        }
+        serializer = serializers.RankingCalificacionSerializer(instance=data)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
 
 create_calificaciones = CalificacionViewSet.as_view({"post": "create"})
 create_calificaciones_multiple = CalificacionViewSet.as_view(
@@ -672,3 +952,8 @@ list_calificaciones = CalificacionViewSet.as_view({"get": "list"})
 
 promedio_calificaciones = CalificacionViewSet.as_view({"get": "promedio"})
 notafinal_calificaciones = CalificacionViewSet.as_view({"get": "notafinal"})
+boletin_calificaciones = CalificacionViewSet.as_view({"get": "boletin"})
+distribucion_calificaciones = CalificacionViewSet.as_view(
+    {"get": "distribucion"}
+)
+ranking_calificaciones_curso = CalificacionViewSet.as_view({"get": "ranking"})
@@ -0,0 +1,79 @@
+"""
+Estadísticas de una lista de puntajes: promedio, mediana, desviación
+estándar, percentiles e histograma de 0 a 10. La desviación es poblacional
+y los percentiles se calculan con interpolación lineal.
+"""
+import math
+import statistics
+
+PERCENTILES = (10, 25, 50, 75, 90)
+PUNTAJE_MAXIMO = 10
+# Un intervalo por punto, el último incluye al 10
+INTERVALOS = 10
+
+
+def _vacio():
+    return {
+        "cantidad": 0,
+        "promedio": None,
+        "mediana": None,
+        "desviacion": None,
+        "minimo": None,
+        "maximo": None,
+        "percentiles": {str(p): None for p in PERCENTILES},
+        "histograma": [0] * INTERVALOS,
+    }
+
+
+def _percentil(ordenados, percentil):
+    posicion = (len(ordenados) - 1) * percentil / 100
+    abajo = math.floor(posicion)
+    arriba = min(abajo + 1, len(ordenados) - 1)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (
+        posicion - abajo
+    )
+
+
+def _resumen(puntajes):
+    ordenados = sorted(float(p) for p in puntajes)
+    histograma = [0] * INTERVALOS
+    ancho = PUNTAJE_MAXIMO / INTERVALOS
+    for puntaje in ordenados:
+        if 0 <= puntaje <= PUNTAJE_MAXIMO:
+            histograma[min(int(puntaje / ancho), INTERVALOS - 1)] += 1
+    return {
+        "cantidad": len(ordenados),
+        "promedio": statistics.mean(ordenados),
+        "mediana": statistics.median(ordenados),
+        "desviacion": statistics.pstdev(ordenados),
+        "minimo": ordenados[0],
+        "maximo": ordenados[-1],
+        "percentiles": {
+            str(p): _percentil(ordenados, p) for p in PERCENTILES
+        },
+        "histograma": histograma,
+    }
+
+
+def resumen_puntajes(puntajes):
+    """
+    Devuelve las estadísticas de los puntajes. Con la lista vacía la
+    cantidad es 0 y el resto de los valores None.
+    """
+    if len(puntajes) == 0:
+        return _vacio()
+    return _resumen(puntajes)
+
+
+def resumen_por_grupo(grupos, puntajes):
+    """
+    Recibe dos listas paralelas, el grupo de cada puntaje y el puntaje, y
+    devuelve las estadísticas de cada grupo en un diccionario.
+    """
+    por_grupo = {}
+    for grupo, puntaje in zip(grupos, puntajes):
+        por_grupo.setdefault(grupo, []).append(puntaje)
+    return {
+        grupo: resumen_puntajes(valores)
+        for grupo, valores in por_grupo.items()
+    }
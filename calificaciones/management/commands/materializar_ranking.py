@@ -0,0 +1,44 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from curricula.models import AnioLectivo
+from calificaciones.models import materializar_ranking
+
+
+class Command(BaseCommand):
+    help = "Guarda el ranking de los cursos con las calificaciones hasta el cierre de un período"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fecha",
+            help="Fecha de cierre del período (DD/MM/YYYY). Por defecto, hoy",
+        )
+        parser.add_argument(
+            "--anio-lectivo",
+            type=int,
+            nargs="*",
+            dest="anio_lectivo",
+            help="Guardar sólo estos años lectivos",
+        )
+
+    def handle(self, *args, **options):
+        fecha = datetime.date.today()
+        if options["fecha"]:
+            try:
+                fecha = datetime.datetime.strptime(
+                    options["fecha"], "%d/%m/%Y"
+                ).date()
+            except ValueError:
+                raise CommandError("La fecha debe tener el formato DD/MM/YYYY")
+
+        anios_lectivos = options["anio_lectivo"] or (
+            AnioLectivo.objects.filter(
+                fecha_desde__lte=fecha, fecha_hasta__gte=fecha
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        for anio_lectivo in anios_lectivos:
+            cantidad = materializar_ranking(anio_lectivo, fecha)
+            self.stdout.write(
+                f"Año lectivo {anio_lectivo}: {cantidad} puestos guardados al {fecha:%d/%m/%Y}"
+            )
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.8 on 2026-10-18 12:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calificaciones', '0008_permiso_boletin'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='calificacion',
+            options={'permissions': [('list_calificacion', 'Puede listar calificaciones'), ('create_multiple_calificacion', 'Puede listar calificaciones'), ('destroy_multiple_calificacion', 'Puede eliminar muchas calificaciones'), ('promedio_calificacion', 'Puede solicitar promedio de calificaciones'), ('notafinal_calificacion', 'Puede solicitar notas finales'), ('boletin_calificacion', 'Puede solicitar el boletín de calificaciones de un curso'), ('distribucion_calificacion', 'Puede solicitar la distribución de calificaciones de una evaluación')]},
+        ),
+    ]
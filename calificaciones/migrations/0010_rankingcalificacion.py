@@ -0,0 +1,37 @@
+# Generated by Django 3.0.8 on 2026-10-18 12:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0005_auto_20201023_2011'),
+        ('curricula', '0011_calendario'),
+        ('calificaciones', '0009_permiso_distribucion'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='calificacion',
+            options={'permissions': [('list_calificacion', 'Puede listar calificaciones'), ('create_multiple_calificacion', 'Puede listar calificaciones'), ('destroy_multiple_calificacion', 'Puede eliminar muchas calificaciones'), ('promedio_calificacion', 'Puede solicitar promedio de calificaciones'), ('notafinal_calificacion', 'Puede solicitar notas finales'), ('boletin_calificacion', 'Puede solicitar el boletín de calificaciones de un curso'), ('distribucion_calificacion', 'Puede solicitar la distribución de calificaciones de una evaluación'), ('ranking_calificacion', 'Puede solicitar el ranking de los alumnos de un curso')]},
+        ),
+        migrations.CreateModel(
+            name='RankingCalificacion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('promedio', models.FloatField()),
+                ('puesto', models.IntegerField()),
+                ('percentil', models.FloatField()),
+                ('fecha_calculo', models.DateTimeField(auto_now_add=True)),
+                ('alumno_curso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='alumnos.AlumnoCurso')),
+                ('materia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='curricula.Materia')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='rankingcalificacion',
+            index=models.Index(fields=['fecha', 'materia', 'alumno_curso'], name='calificacio_fecha_db4e34_idx'),
+        ),
+    ]
@@ -1,6 +1,18 @@
-from django.db import models
-from curricula.models import Evaluacion, Materia, AnioLectivo
-from alumnos.models import Alumno
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from ontrack.versiones import incrementar_versiones, version
+from django.db.models import Avg, F, FloatField, OuterRef, Subquery, Sum
+from curricula.models import Curso, Evaluacion, Materia, AnioLectivo
+from alumnos.models import Alumno, AlumnoCurso, invalidar_historiales
+from calificaciones.estadisticas import resumen_por_grupo, resumen_puntajes
+
+BOLETIN_CACHE_SEGUNDOS = getattr(
+    settings, "CALIFICACIONES_BOLETIN_CACHE_SEGUNDOS", 3600
+)
+DISTRIBUCION_CACHE_SEGUNDOS = getattr(
+    settings, "CALIFICACIONES_DISTRIBUCION_CACHE_SEGUNDOS", 3600
+)
 
 
 class Calificacion(models.Model):
@@ -28,4 +40,411 @@ class Calificacion(models.Model):
                 "Puede solicitar promedio de calificaciones",
             ),
             ("notafinal_calificacion", "Puede solicitar notas finales",),
+            (
+                "boletin_calificacion",
+                "Puede solicitar el boletín de calificaciones de un curso",
+            ),
+            (
+                "distribucion_calificacion",
+                "Puede solicitar la distribución de calificaciones de una evaluación",
+            ),
+            (
+                "ranking_calificacion",
+                "Puede solicitar el ranking de los alumnos de un curso",
+            ),
+        ]
+
+
+class RankingCalificacion(models.Model):
+    """
+    Ranking guardado de un alumno en su curso al cierre de un período
+    (fecha), para la materia o para el promedio general si materia es None.
+    """
+
+    alumno_curso = models.ForeignKey(
+        to=AlumnoCurso, related_name="rankings", on_delete=models.CASCADE
+    )
+    materia = models.ForeignKey(
+        to=Materia, null=True, blank=True, on_delete=models.CASCADE
+    )
+    fecha = models.DateField()
+    promedio = models.FloatField()
+    puesto = models.IntegerField()
+    percentil = models.FloatField()
+    fecha_calculo = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return "{} - {}: {}".format(
+            self.alumno_curso_id, self.fecha, self.puesto
+        )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["fecha", "materia", "alumno_curso"]),
+        ]
+
+
+def guardar_calificaciones(evaluacion, fecha, calificaciones):
+    """
+    Inserta o sobrescribe en una sola sentencia las calificaciones de una
+    evaluación recibidas como (alumno, puntaje), con la misma fecha para
+    todas. Devuelve la fecha más temprana entre la nueva y las que tenían
+    las calificaciones sobrescritas, desde donde hay que recalcular.
+    Debe llamarse dentro de una transacción.
+    """
+    if not calificaciones:
+        return fecha
+    valores = ", ".join(["(%s, %s::float8)"] * len(calificaciones))
+    with connection.cursor() as cursor:
+        # No hay una restricción única por alumno y evaluación, así que dos
+        # planillas de la misma evaluación se serializan con la evaluación
+        cursor.execute(
+            "SELECT id FROM curricula_evaluacion WHERE id = %s FOR UPDATE",
+            [evaluacion],
+        )
+        cursor.execute(
+            f"""
+            WITH nuevas (alumno_id, puntaje) AS (
+                VALUES {valores}
+            ),
+            anteriores AS (
+                SELECT c.alumno_id, c.fecha
+                FROM calificaciones_calificacion c
+                JOIN nuevas n USING (alumno_id)
+                WHERE c.evaluacion_id = %s
+            ),
+            actualizadas AS (
+                UPDATE calificaciones_calificacion c
+                SET puntaje = n.puntaje, fecha = %s
+                FROM nuevas n
+                WHERE c.evaluacion_id = %s AND c.alumno_id = n.alumno_id
+            ),
+            insertadas AS (
+                INSERT INTO calificaciones_calificacion
+                    (fecha, puntaje, fecha_creacion, alumno_id, evaluacion_id)
+                SELECT %s, n.puntaje, now(), n.alumno_id, %s
+                FROM nuevas n
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM anteriores a WHERE a.alumno_id = n.alumno_id
+                )
+            )
+            SELECT MIN(fecha) FROM anteriores
+            """,
+            [valor for calificacion in calificaciones for valor in calificacion]
+            + [evaluacion, fecha, evaluacion, fecha, evaluacion],
+        )
+        anterior = cursor.fetchone()[0]
+    return min(fecha, anterior) if anterior else fecha
+
+
+def _clave_version(recurso, id):
+    return f"calificaciones:{recurso}:{id}:version"
+
+
+def invalidar_boletines(cursos):
+    """
+    Invalida los boletines cacheados de los cursos, cambiando la versión que
+    forma parte de sus claves.
+    """
+    incrementar_versiones(
+        _clave_version("boletin", curso) for curso in set(cursos)
+    )
+
+
+def invalidar_distribuciones(evaluaciones):
+    """
+    Invalida las distribuciones de puntajes cacheadas de las evaluaciones.
+    """
+    incrementar_versiones(
+        _clave_version("distribucion", evaluacion)
+        for evaluacion in set(evaluaciones)
+    )
+
+
+def invalidar_calificaciones(alumnos, evaluacion):
+    """
+    Invalida lo cacheado a partir de las calificaciones de los alumnos en la
+    evaluación, después de cargarlas, editarlas o borrarlas: los boletines de
+    sus cursos en el año lectivo, la distribución de la evaluación y sus
+    historiales.
+    """
+    alumnos = list(alumnos)
+    invalidar_boletines(
+        AlumnoCurso.objects.filter(
+            alumno_id__in=alumnos, anio_lectivo_id=evaluacion.anio_lectivo_id
+        ).values_list("curso_id", flat=True)
+    )
+    invalidar_distribuciones([evaluacion.pk])
+    invalidar_historiales(alumnos)
+
+
+def invalidar_evaluaciones(materia, anio_lectivo):
+    """
+    Invalida los boletines de los cursos del año de la materia y los
+    historiales de sus alumnos, después de cambiar las evaluaciones de la
+    materia en el año lectivo.
+    """
+    inscripciones = list(
+        AlumnoCurso.objects.filter(
+            curso__anio__materia=materia, anio_lectivo_id=anio_lectivo
+        ).values_list("curso_id", "alumno_id")
+    )
+    invalidar_boletines(curso for curso, _ in inscripciones)
+    invalidar_historiales(alumno for _, alumno in inscripciones)
+
+
+def boletin_curso(curso, anio_lectivo):
+    """
+    Arma el boletín de un curso en un año lectivo: para cada alumno el
+    promedio y la nota final de cada materia del año, en el mismo orden que
+    la lista de materias (None si no tiene calificaciones). Las notas salen
+    de una sola consulta agrupada por alumno y materia, y el resultado queda
+    cacheado hasta que cambie una calificación o evaluación del curso.
+    """
+    clave = "calificaciones:boletin:{}:{}:{}".format(
+        curso.pk, version(_clave_version("boletin", curso.pk)), anio_lectivo.pk
+    )
+    boletin = cache.get(clave)
+    if boletin is not None:
+        return boletin
+
+    materias = list(
+        Materia.objects.filter(anio_id=curso.anio_id)
+        .order_by("nombre", "id")
+        .values("id", "nombre")
+    )
+    alumnos = list(
+        Alumno.objects.filter(
+            alumnocurso__curso_id=curso.pk,
+            alumnocurso__anio_lectivo_id=anio_lectivo.pk,
+        )
+        .order_by("apellido", "nombre", "id")
+        .values("id", "nombre", "apellido")
+        .distinct()
+    )
+    notas = {
+        (nota["alumno_id"], nota["evaluacion__materia_id"]): nota
+        for nota in Calificacion.objects.filter(
+            alumno_id__in=[alumno["id"] for alumno in alumnos],
+            evaluacion__anio_lectivo_id=anio_lectivo.pk,
+            evaluacion__materia__anio_id=curso.anio_id,
+        )
+        .values("alumno_id", "evaluacion__materia_id")
+        .annotate(
+            promedio=Avg("puntaje"),
+            nota_final=Sum(
+                F("puntaje") * F("evaluacion__ponderacion"),
+                output_field=FloatField(),
+            ),
+        )
+        .order_by()
+    }
+
+    filas = []
+    for alumno in alumnos:
+        celdas = [notas.get((alumno["id"], m["id"]), {}) for m in materias]
+        promedios = [celda.get("promedio") for celda in celdas]
+        cursadas = [p for p in promedios if p is not None]
+        filas.append(
+            {
+                "alumno": alumno["id"],
+                "nombre": alumno["nombre"],
+                "apellido": alumno["apellido"],
+                "promedios": promedios,
+                "notas_finales": [celda.get("nota_final") for celda in celdas],
+                "promedio_general": sum(cursadas) / len(cursadas)
+                if cursadas
+                else None,
+            }
+        )
+    boletin = {
+        "curso": curso.pk,
+        "anio_lectivo": anio_lectivo.pk,
+        "materias": materias,
+        "alumnos": filas,
+    }
+    cache.set(clave, boletin, BOLETIN_CACHE_SEGUNDOS)
+    return boletin
+
+
+def distribucion_evaluacion(evaluacion):
+    """
+    Estadísticas de los puntajes de una evaluación, en general y por cada
+    curso del año que tenga calificaciones, para poder compararlos. Los
+    puntajes se traen como dos columnas planas (curso y puntaje) sin armar
+    instancias, y el resultado queda cacheado hasta que cambie una
+    calificación de la evaluación. Cada alumno cuenta una sola vez, en su
+    último curso del año, como en el ranking; los alumnos sin curso en el
+    año sólo cuentan en la distribución general.
+    """
+    clave = "calificaciones:distribucion:{}:{}".format(
+        evaluacion.pk, version(_clave_version("distribucion", evaluacion.pk))
+    )
+    distribucion = cache.get(clave)
+    if distribucion is not None:
+        return distribucion
+
+    ultimo_curso = (
+        AlumnoCurso.objects.filter(
+            alumno_id=OuterRef("alumno_id"),
+            anio_lectivo_id=evaluacion.anio_lectivo_id,
+        )
+        .order_by("-id")
+        .values("curso_id")[:1]
+    )
+    filas = list(
+        Calificacion.objects.filter(evaluacion_id=evaluacion.pk)
+        .annotate(curso_id=Subquery(ultimo_curso))
+        .values_list("curso_id", "puntaje")
+    )
+    puntajes = [puntaje for _, puntaje in filas]
+    con_curso = [(curso, puntaje) for curso, puntaje in filas if curso]
+    por_curso = resumen_por_grupo(
+        [curso for curso, _ in con_curso],
+        [puntaje for _, puntaje in con_curso],
+    )
+    nombres = dict(
+        Curso.objects.filter(id__in=por_curso).values_list("id", "nombre")
+    )
+    distribucion = {
+        "evaluacion": evaluacion.pk,
+        "general": resumen_puntajes(puntajes),
+        "cursos": [
+            {"curso": curso, "nombre": nombres[curso], **por_curso[curso]}
+            for curso in sorted(por_curso, key=lambda c: (nombres[c], c))
+        ],
+    }
+    cache.set(clave, distribucion, DISTRIBUCION_CACHE_SEGUNDOS)
+    return distribucion
+
+
+# Promedio ponderado de cada alumno en cada materia: suma de puntaje por
+# ponderación sobre la suma de ponderaciones de las evaluaciones calificadas.
+# A diferencia del promedio de los objetivos (PromedioPonderado), las
+# evaluaciones que todavía no se calificaron no cuentan con el valor máximo
+PROMEDIOS_POR_MATERIA = """
+    WITH por_materia AS (
+        SELECT ac.id AS alumno_curso_id, ac.alumno_id, ac.curso_id,
+               e.materia_id,
+               SUM(c.puntaje * e.ponderacion)
+                   / NULLIF(SUM(e.ponderacion), 0) AS promedio
+        FROM alumnos_alumnocurso ac
+        JOIN calificaciones_calificacion c ON c.alumno_id = ac.alumno_id
+        JOIN curricula_evaluacion e
+            ON e.id = c.evaluacion_id
+            AND e.anio_lectivo_id = ac.anio_lectivo_id
+        WHERE ac.anio_lectivo_id = %(anio_lectivo)s
+            AND (%(curso)s::integer IS NULL OR ac.curso_id = %(curso)s)
+            AND (%(materia)s::integer IS NULL OR e.materia_id = %(materia)s)
+            AND (%(fecha)s::date IS NULL OR c.fecha <= %(fecha)s)
+        GROUP BY ac.id, ac.alumno_id, ac.curso_id, e.materia_id
+        HAVING SUM(e.ponderacion) > 0
+    )
+"""
+
+RANKING_GENERAL = (
+    PROMEDIOS_POR_MATERIA
+    + """
+    SELECT p.alumno_curso_id, p.alumno_id, a.nombre, a.apellido, p.curso_id,
+           p.promedio,
+           RANK() OVER (
+               PARTITION BY p.curso_id ORDER BY p.promedio DESC
+           ) AS puesto,
+           PERCENT_RANK() OVER (
+               PARTITION BY p.curso_id ORDER BY p.promedio
+           ) AS percentil
+    FROM (
+        SELECT alumno_curso_id, alumno_id, curso_id, AVG(promedio) AS promedio
+        FROM por_materia
+        GROUP BY alumno_curso_id, alumno_id, curso_id
+    ) p
+    JOIN alumnos_alumno a ON a.id = p.alumno_id
+    ORDER BY p.curso_id, puesto, a.apellido, a.nombre, p.alumno_id
+"""
+)
+
+RANKING_POR_MATERIA = (
+    PROMEDIOS_POR_MATERIA
+    + """
+    SELECT alumno_curso_id, materia_id, promedio,
+           RANK() OVER (
+               PARTITION BY curso_id, materia_id ORDER BY promedio DESC
+           ) AS puesto,
+           PERCENT_RANK() OVER (
+               PARTITION BY curso_id, materia_id ORDER BY promedio
+           ) AS percentil
+    FROM por_materia
+"""
+)
+
+
+def ranking_calificaciones(
+    anio_lectivo, curso=None, materia=None, fecha_hasta=None
+):
+    """
+    Puesto (RANK) y percentil (PERCENT_RANK, de 0 para el promedio más bajo
+    a 1 para el más alto) de cada alumno dentro de su curso, calculados en
+    una sola consulta con funciones de ventana. Sin materia se ordena por el
+    promedio general, que es el promedio de los promedios de cada materia.
+    Con fecha_hasta sólo cuentan las calificaciones hasta esa fecha.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            RANKING_GENERAL,
+            {
+                "anio_lectivo": anio_lectivo,
+                "curso": curso,
+                "materia": materia,
+                "fecha": fecha_hasta,
+            },
+        )
+        columnas = [columna[0] for columna in cursor.description]
+        return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+def materializar_ranking(anio_lectivo, fecha):
+    """
+    Guarda el ranking de todos los cursos del año lectivo con las
+    calificaciones hasta la fecha, general y por materia, reemplazando el
+    que se hubiera guardado antes para esa misma fecha. Devuelve la cantidad
+    de filas guardadas.
+    """
+    with transaction.atomic():
+        RankingCalificacion.objects.filter(
+            alumno_curso__anio_lectivo_id=anio_lectivo, fecha=fecha
+        ).delete()
+        rankings = [
+            RankingCalificacion(
+                alumno_curso_id=fila["alumno_curso_id"],
+                fecha=fecha,
+                promedio=fila["promedio"],
+                puesto=fila["puesto"],
+                percentil=fila["percentil"],
+            )
+            for fila in ranking_calificaciones(anio_lectivo, fecha_hasta=fecha)
         ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                RANKING_POR_MATERIA,
+                {
+                    "anio_lectivo": anio_lectivo,
+                    "curso": None,
+                    "materia": None,
+                    "fecha": fecha,
+                },
+            )
+            rankings.extend(
+                RankingCalificacion(
+                    alumno_curso_id=alumno_curso,
+                    materia_id=materia,
+                    fecha=fecha,
+                    promedio=promedio,
+                    puesto=puesto,
+                    percentil=percentil,
+                )
+                for alumno_curso, materia, promedio, puesto, percentil in (
+                    cursor.fetchall()
+                )
+            )
+        RankingCalificacion.objects.bulk_create(rankings)
+    return len(rankings)
@@ -1,126 +1,124 @@
 from calificaciones.models import Calificacion
-from seguimientos.models import Seguimiento
-from objetivos.models import Objetivo, AlumnoObjetivo
+from objetivos.calculadores import CalculadorObjetivo
+from objetivos.models import AlumnoObjetivo, EventoRecalculo
 from statistics import mean
+from itertools import groupby
+from operator import itemgetter
+
+
+class CalculadorPromedio(CalculadorObjetivo):
+    """
+    Promedio ponderado de las materias del seguimiento, con una sola
+    consulta de calificaciones para todos los alumnos del lote.
+    """
+
+    clave = "promedio"
+    evento = EventoRecalculo.CALIFICACION
+
+    def calcular(
+        self, seguimiento, objetivos, alumnos_curso, desde, fecha_calculo
+    ):
+        por_alumno = {
+            alumno_curso.alumno_id: alumno_curso
+            for alumno_curso in alumnos_curso
+        }
+        materias = [m.id for m in seguimiento.materias.all()]
+        # Una sola consulta trae la ponderacion y materia de cada evaluacion
+        calificaciones = (
+            Calificacion.objects.filter(
+                alumno_id__in=por_alumno,
+                evaluacion__anio_lectivo=seguimiento.anio_lectivo,
+                evaluacion__materia__id__in=materias,
+            )
+            .order_by("alumno_id", "fecha")
+            .values_list(
+                "alumno_id",
+                "fecha",
+                "puntaje",
+                "evaluacion__ponderacion",
+                "evaluacion__materia_id",
+            )
+        )
 
+        serie = []
+        for alumno, calificaciones_alumno in groupby(
+            calificaciones, key=itemgetter(0)
+        ):
+            calificaciones_alumno = [c[1:] for c in calificaciones_alumno]
+            for objetivo in objetivos:
+                serie.extend(
+                    calculate_promedio_for_objetivo(
+                        objetivo,
+                        por_alumno[alumno],
+                        desde,
+                        calificaciones_alumno,
+                        fecha_calculo,
+                    )
+                )
+        return serie
 
-def alumno_calificacion_redesign(alumno, materia, date_recalculate):
 
-    objetivos = Objetivo.objects.filter(
-        seguimiento__alumnos__alumno__id=alumno,
-        seguimiento__en_progreso=True,
-        seguimiento__anio_lectivo__fecha_desde__lte=date_recalculate,
-        seguimiento__anio_lectivo__fecha_hasta__gte=date_recalculate,
-        tipo_objetivo__nombre__icontains="Promedio",
-        tipo_objetivo__cuantitativo=True,
-        tipo_objetivo__multiple=False,
-        seguimiento__materias__id=materia,
-    )
-    if objetivos:
-        calculate_calificacion_redesign(objetivos, alumno, date_recalculate)
-
-
-def calculate_calificacion_redesign(objetivos, alumno, date_recalculate):
-    objetivos_ids = [o.id for o in objetivos]
-    AlumnoObjetivo.objects.filter(
-        objetivo__id__in=objetivos_ids,
-        fecha_relacionada__gte=date_recalculate,
-        alumno_curso__alumno__id=alumno,
-    ).delete()
-
-    materias = set(
-        [
-            m.id
-            for objetivo in objetivos
-            for m in objetivo.seguimiento.materias.all()
-        ]
+def alumno_calificacion_redesign(alumno, materia, date_recalculate):
+    return CalculadorPromedio().recalcular_alumno(
+        alumno, date_recalculate, materia
     )
-    anio_lectivo = objetivos[0].seguimiento.anio_lectivo
-    alumno_curso = [
-        alumno_curso
-        for alumno_curso in objetivos[0].seguimiento.alumnos.all()
-        if alumno_curso.alumno.id == alumno
-    ][0]
-
-    calificaciones = Calificacion.objects.filter(
-        alumno__exact=alumno_curso.alumno,
-        evaluacion__anio_lectivo=anio_lectivo,
-        evaluacion__materia__id__in=materias,
-    ).order_by("fecha")
-
-    for objetivo in objetivos:
-        calculate_promedio_for_objetivo(
-            objetivo, alumno_curso, date_recalculate, calificaciones
-        )
 
 
-def calculate_promedio_for_objetivo(
-    objetivo, alumno_curso, date_recalculate, calificaciones
-):
-    materias = set([m.id for m in objetivo.seguimiento.materias.all()])
+class PromedioPonderado:
+    """
+    Sumas acumuladas por materia de puntaje*ponderacion y de ponderacion.
+    Las ponderaciones que todavía no se evaluaron cuentan con el valor máximo.
+    """
 
-    fechas = sorted(
-        list(
-            {
-                calificacion.fecha
-                for calificacion in calificaciones
-                if calificacion.fecha >= date_recalculate
-                and calificacion.evaluacion.materia.id in materias
-            }
-        )
-    )
-    promedios = []
+    def __init__(self, materias, valor_maximo):
+        self.valor_maximo = valor_maximo
+        self.sumas = {materia: [0, 0] for materia in materias}
+
+    def agregar(self, materia, puntaje, ponderacion):
+        suma = self.sumas[materia]
+        suma[0] += ponderacion * puntaje
+        suma[1] += ponderacion
 
-    for index in range(len(fechas)):
-        calificaciones_fecha = [
-            c for c in calificaciones if c.fecha <= fechas[index]
+    @property
+    def valor(self):
+        promedios = [
+            nota + (1 - ponderacion) * self.valor_maximo
+            for nota, ponderacion in self.sumas.values()
         ]
-        calculate_for_date(
-            calificaciones_fecha,
-            materias,
-            date_recalculate,
-            fechas[index],
-            objetivo,
-            alumno_curso,
-        )
+        return round(mean(promedios if promedios else [-1]), 2)
 
 
-def calculate_for_date(
-    calificaciones_fecha,
-    materias,
-    date_recalculate,
-    fechas,
-    objetivo,
-    alumno_curso,
+def calculate_promedio_for_objetivo(
+    objetivo, alumno_curso, date_recalculate, calificaciones, create_datetime
 ):
-    promedios = []
-    calificaciones_materia = []
-    for mat in materias:
-        calificaciones_materia.append(
-            [
-                cal
-                for cal in calificaciones_fecha
-                if cal.evaluacion.materia.id == mat
-            ]
-        )
-
-    promedios_ponderaciones = map(
-        calculate_promedio_one_subject, calificaciones_materia
+    """
+    Recorre una sola vez las calificaciones ordenadas por fecha y genera un
+    AlumnoObjetivo por cada fecha desde date_recalculate.
+    """
+    materias = set([m.id for m in objetivo.seguimiento.materias.all()])
+    promedio = PromedioPonderado(
+        materias, objetivo.tipo_objetivo.valor_maximo
     )
 
-    for nota, ponderacion in promedios_ponderaciones:
-        promedios.append(
-            nota + (1 - ponderacion) * objetivo.tipo_objetivo.valor_maximo
-        )
-
-    alumno_objetivo = AlumnoObjetivo(
-        objetivo=objetivo,
-        alumno_curso=alumno_curso,
-        alcanzada=False,
-        fecha_relacionada=fechas,
-        valor=round(mean(promedios if promedios else [-1]), 2),
-    )
-    alumno_objetivo.save()
+    alumno_objetivos = []
+    calificaciones_objetivo = (c for c in calificaciones if c[3] in materias)
+    for fecha, calificaciones_fecha in groupby(
+        calificaciones_objetivo, key=lambda c: c[0]
+    ):
+        for _, puntaje, ponderacion, materia in calificaciones_fecha:
+            promedio.agregar(materia, puntaje, ponderacion)
+        if fecha >= date_recalculate:
+            alumno_objetivos.append(
+                AlumnoObjetivo(
+                    objetivo=objetivo,
+                    alumno_curso=alumno_curso,
+                    alcanzada=False,
+                    fecha_calculo=create_datetime,
+                    fecha_relacionada=fecha,
+                    valor=promedio.valor,
+                )
+            )
+    return alumno_objetivos
 
 
 def calculate_promedio_one_subject(calificaciones_subject):
@@ -1,7 +1,7 @@
 from rest_framework.test import APITestCase
 from rest_framework.test import APIClient
 from users.models import User, Group
-from calificaciones.models import Calificacion
+from calificaciones.models import Calificacion, RankingCalificacion
 from instituciones.models import Institucion
 from curricula.models import (
     Carrera,
@@ -17,11 +17,28 @@ from rest_framework import status
 from unittest.mock import patch
 from seguimientos.models import Seguimiento
 from curricula.models import Materia
-from objetivos.models import Objetivo, TipoObjetivo, AlumnoObjetivo
+from objetivos.models import (
+    Objetivo,
+    TipoObjetivo,
+    AlumnoObjetivo,
+    EventoRecalculo,
+)
 import datetime
-from calificaciones.rq_funcions import alumno_calificacion_redesign
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from ontrack.tests_utils import CACHE_LOCAL
+from django.test.utils import CaptureQueriesContext
+from calificaciones.rq_funcions import (
+    CalculadorPromedio,
+    alumno_calificacion_redesign,
+)
+from objetivos import recalculo
 
 
+@override_settings(CACHES=CACHE_LOCAL)
 class QueueCalificacionesTests(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -217,6 +234,7 @@ class QueueCalificacionesTests(APITestCase):
             nombre="Promedio calificaciones",
             cuantitativo=True,
             multiple=False,
+            calculador="promedio",
             valor_minimo=0,
             valor_maximo=100,
         )
@@ -224,6 +242,7 @@ class QueueCalificacionesTests(APITestCase):
             nombre="Porcentaje asistencias",
             cuantitativo=True,
             multiple=False,
+            calculador="asistencia",
             valor_minimo=0,
             valor_maximo=100,
         )
@@ -293,8 +312,80 @@ class QueueCalificacionesTests(APITestCase):
         # alumnos_objetivos = AlumnoObjetivo.objects.all()
         # assert alumnos_objetivos[0].valor == -1
 
+    def test_objetivos_queue_consultas_constantes(self):
+        """
+        Test de que la cantidad de consultas no depende de las calificaciones
+        """
+        with CaptureQueriesContext(connection) as pocas_calificaciones:
+            alumno_calificacion_redesign(
+                self.alumno_1.id, self.materia_1.id, datetime.date(2019, 3, 4)
+            )
+
+        for dia in range(7, 27):
+            Calificacion.objects.create(
+                fecha=datetime.date(2019, 3, dia),
+                puntaje=60,
+                alumno=self.alumno_1,
+                evaluacion=self.evaluacion_2,
+            )
+
+        with CaptureQueriesContext(connection) as muchas_calificaciones:
+            alumno_calificacion_redesign(
+                self.alumno_1.id, self.materia_1.id, datetime.date(2019, 3, 4)
+            )
+
+        self.assertEqual(
+            len(pocas_calificaciones), len(muchas_calificaciones)
+        )
+        self.assertEqual(
+            AlumnoObjetivo.objects.filter(objetivo=self.objetivo_2).count(),
+            22,
+        )
+
+    @patch("objetivos.recalculo.django_rq")
+    def test_recalculo_materia_un_lote_por_seguimiento(self, mock_rq):
+        """
+        Test de que el cambio de ponderación recalcula a todos los alumnos
+        calificados del seguimiento en un solo lote
+        """
+        Calificacion.objects.create(
+            fecha=datetime.date(2019, 3, 4),
+            puntaje=60,
+            alumno=self.alumno_2,
+            evaluacion=self.evaluacion_1,
+        )
+        with patch.object(
+            CalculadorPromedio,
+            "recalcular",
+            autospec=True,
+            side_effect=CalculadorPromedio.recalcular,
+        ) as recalcular:
+            recalculo.ejecutar_recalculo_materia(
+                self.materia_1.id, [self.evaluacion_1.id]
+            )
+
+        self.assertEqual(recalcular.call_count, 1)
+        args = recalcular.call_args[0]
+        _, seguimiento, objetivos, alumnos_curso, desde = args
+        self.assertEqual(seguimiento, self.seguimiento_1)
+        self.assertEqual(objetivos, [self.objetivo_2])
+        self.assertEqual(
+            sorted(alumno_curso.id for alumno_curso in alumnos_curso),
+            [self.alumno_curso_1.id, self.alumno_curso_3.id],
+        )
+        self.assertEqual(desde, datetime.date(2019, 3, 4))
+        self.assertEqual(
+            set(
+                AlumnoObjetivo.objects.filter(
+                    objetivo=self.objetivo_2
+                ).values_list("alumno_curso_id", flat=True)
+            ),
+            {self.alumno_curso_1.id, self.alumno_curso_3.id},
+        )
 
-@patch("calificaciones.api.views.django_rq")
+
+@override_settings(CACHES=CACHE_LOCAL)
+@patch("objetivos.recalculo.django_rq")
 class MateriaEvaluacionTest(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -472,6 +563,47 @@ class MateriaEvaluacionTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Calificacion.objects.count(), 3)
 
+    def test_create_multiples_calificaciones_upsert(self, mock):
+        """
+        Test de que cargar la planilla de nuevo sobrescribe las calificaciones
+        existentes y que la cantidad de consultas no depende de los alumnos
+        """
+        url = "/api/calificaciones/multiple/"
+        data = {
+            "evaluacion": self.evaluacion1.pk,
+            "fecha": "2020-12-14",
+            "calificaciones": [{"alumno": self.alumno1.pk, "puntaje": 4}],
+        }
+        with CaptureQueriesContext(connection) as un_alumno:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        data = {
+            "evaluacion": self.evaluacion1.pk,
+            "fecha": "2020-12-12",
+            "calificaciones": [
+                {"alumno": self.alumno1.pk, "puntaje": 10},
+                {"alumno": self.alumno2.pk, "puntaje": 7},
+                {"alumno": self.alumno3.pk, "puntaje": 9},
+            ],
+        }
+        with CaptureQueriesContext(connection) as tres_alumnos:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(un_alumno), len(tres_alumnos))
+
+        self.assertEqual(Calificacion.objects.count(), 3)
+        calificacion = Calificacion.objects.get(alumno_id=self.alumno1.pk)
+        self.assertEqual(calificacion.puntaje, 10)
+        self.assertEqual(calificacion.fecha, datetime.date(2020, 12, 12))
+        self.assertIsNotNone(calificacion.fecha_creacion)
+
+        # Un solo evento de recálculo por alumno y planilla
+        self.assertEqual(
+            EventoRecalculo.objects.filter(alumno_id=self.alumno1.pk).count(),
+            2,
+        )
+
     def test_create_invalid_multiples_calificaciones(self, mock):
         """
         Test de creacion de calificaciones para un curso y una evaluacion
@@ -516,6 +648,25 @@ class MateriaEvaluacionTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Calificacion.objects.count(), 1)
 
+    def test_create_single_calificaciones_cache_caido(self, mock):
+        """
+        Test de que la calificacion se guarda aunque el cache no responda
+        """
+        url = "/api/calificaciones/"
+        data = {
+            "evaluacion": self.evaluacion1.pk,
+            "fecha": "2020-12-12",
+            "alumno": self.alumno1.pk,
+            "puntaje": 10,
+        }
+
+        with patch("ontrack.versiones.cache") as cache_caido:
+            cache_caido.add.side_effect = ConnectionError
+            with self.assertLogs("ontrack.versiones", level="ERROR"):
+                response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Calificacion.objects.count(), 1)
+
     def test_create_invalid_single_calificaciones(self, mock):
         """
         Test de creacion de calificaciones para un curso y una evaluacion
@@ -1184,6 +1335,48 @@ class MateriaEvaluacionTest(APITestCase):
         self.assertEqual(response.data["alumno"], self.alumno1.pk)
         self.assertEqual(response.data["promedio_general"], 9)
 
+    def test_promedio_notafinal_consultas_constantes(self, mock):
+        """
+        Test de que el promedio y la nota final usan la misma cantidad de
+        consultas sin importar la cantidad de materias y calificaciones
+        """
+        Calificacion.objects.create(
+            alumno_id=self.alumno1.pk,
+            evaluacion_id=self.evaluacion1.pk,
+            fecha="2020-12-12",
+            puntaje=9,
+        )
+        urls = [
+            "/api/calificaciones/stats/{}/?alumno={}&anio_lectivo={}".format(
+                endpoint, self.alumno1.pk, self.anio_lectivo.pk
+            )
+            for endpoint in ("promedio", "nota-final")
+        ]
+        consultas = []
+        for url in urls:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            consultas.append(len(context.captured_queries))
+
+        for evaluacion, puntaje in (
+            (self.evaluacion2, 7),
+            (self.evaluacion11, 10),
+            (self.evaluacion3, 8),
+        ):
+            Calificacion.objects.create(
+                alumno_id=self.alumno1.pk,
+                evaluacion_id=evaluacion.pk,
+                fecha="2020-12-12",
+                puntaje=puntaje,
+            )
+        for url, cantidad in zip(urls, consultas):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(context.captured_queries), cantidad)
+        self.assertEqual(len(response.data["notas_finales"]), 2)
+
     def test_promedio_alumno_materia_aniolectivo_calificaciones(self, mock):
         """
         Test para obtener el promedio de calificaciones segun alumno, materia y año_lectivo
@@ -1497,3 +1690,403 @@ class MateriaEvaluacionTest(APITestCase):
             response.data["detail"],
             "Es necesario especificar el id del anio_lectivo",
         )
+
+    def test_boletin_curso_calificaciones(self, mock):
+        """
+        Test del boletín de un curso: una fila por alumno con el promedio
+        y la nota final de cada materia del año
+        """
+        cache.clear()
+        for alumno, evaluacion, puntaje in (
+            (self.alumno1, self.evaluacion1, 9),
+            (self.alumno1, self.evaluacion2, 7),
+            (self.alumno1, self.evaluacion11, 10),
+            (self.alumno2, self.evaluacion1, 6),
+            (self.alumno4, self.evaluacion_alt, 9),
+        ):
+            Calificacion.objects.create(
+                alumno_id=alumno.pk,
+                evaluacion_id=evaluacion.pk,
+                fecha="2020-12-12",
+                puntaje=puntaje,
+            )
+        url = "/api/calificaciones/stats/boletin/?curso={}&anio_lectivo={}".format(
+            self.curso.pk, self.anio_lectivo.pk
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [m["id"] for m in response.data["materias"]],
+            [self.materia.pk, self.materia1.pk],
+        )
+        filas = {f["alumno"]: f for f in response.data["alumnos"]}
+        self.assertEqual(
+            set(filas), {self.alumno1.pk, self.alumno2.pk, self.alumno3.pk}
+        )
+        self.assertEqual(filas[self.alumno1.pk]["promedios"], [8, 10])
+        self.assertAlmostEqual(
+            filas[self.alumno1.pk]["notas_finales"][0], 9 * 0.5 + 7 * 0.3
+        )
+        self.assertEqual(filas[self.alumno1.pk]["promedio_general"], 9)
+        self.assertEqual(filas[self.alumno2.pk]["promedios"], [6, None])
+        self.assertEqual(filas[self.alumno3.pk]["promedios"], [None, None])
+        self.assertIsNone(filas[self.alumno3.pk]["promedio_general"])
+
+    def test_boletin_cacheado_e_invalidado(self, mock):
+        """
+        Test de que el boletín se sirve del cache sin consultar calificaciones
+        y que editar una calificación del curso lo invalida
+        """
+        cache.clear()
+        calificacion = Calificacion.objects.create(
+            alumno_id=self.alumno1.pk,
+            evaluacion_id=self.evaluacion11.pk,
+            fecha="2020-12-12",
+            puntaje=4,
+        )
+        url = "/api/calificaciones/stats/boletin/?curso={}&anio_lectivo={}".format(
+            self.curso.pk, self.anio_lectivo.pk
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            any(
+                "calificaciones_calificacion" in q["sql"]
+                for q in context.captured_queries
+            )
+        )
+
+        response = self.client.patch(
+            "/api/calificaciones/{}/".format(calificacion.pk),
+            {"puntaje": 8},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, format="json")
+        fila = next(
+            f
+            for f in response.data["alumnos"]
+            if f["alumno"] == self.alumno1.pk
+        )
+        self.assertEqual(fila["promedios"], [None, 8])
+
+    def test_boletin_missing_params_calificaciones(self, mock):
+        """
+        Test del boletín sin curso o sin año lectivo, o de otra institución
+        """
+        response = self.client.get(
+            "/api/calificaciones/stats/boletin/?anio_lectivo={}".format(
+                self.anio_lectivo.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            "/api/calificaciones/stats/boletin/?curso={}".format(
+                self.curso.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            "/api/calificaciones/stats/boletin/?curso={}&anio_lectivo={}".format(
+                self.curso2.pk, self.anio_lectivo.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_distribucion_evaluacion_calificaciones(self, mock):
+        """
+        Test de la distribución de puntajes de una evaluación, en general y
+        por curso
+        """
+        cache.clear()
+        curso_b = Curso.objects.get(nombre="2A", anio=self.anio)
+        alumno5 = Alumno.objects.create(
+            dni=5,
+            nombre="Alumno",
+            apellido="Alumb",
+            institucion=self.institucion,
+        )
+        AlumnoCurso.objects.create(
+            alumno=alumno5, curso=curso_b, anio_lectivo=self.anio_lectivo
+        )
+        for alumno, puntaje in (
+            (self.alumno1, 10),
+            (self.alumno2, 7),
+            (self.alumno3, 9),
+            (alumno5, 4),
+        ):
+            Calificacion.objects.create(
+                alumno_id=alumno.pk,
+                evaluacion_id=self.evaluacion1.pk,
+                fecha="2020-12-12",
+                puntaje=puntaje,
+            )
+        url = "/api/calificaciones/stats/distribucion/?evaluacion={}".format(
+            self.evaluacion1.pk
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        general = response.data["general"]
+        self.assertEqual(general["cantidad"], 4)
+        self.assertEqual(general["promedio"], 7.5)
+        self.assertEqual(general["mediana"], 8)
+        self.assertEqual(general["minimo"], 4)
+        self.assertEqual(general["maximo"], 10)
+        self.assertEqual(general["percentiles"]["50"], 8)
+        self.assertEqual(general["percentiles"]["25"], 6.25)
+        self.assertEqual(general["histograma"], [0, 0, 0, 0, 1, 0, 0, 1, 0, 2])
+
+        self.assertEqual(
+            [c["curso"] for c in response.data["cursos"]],
+            [self.curso.pk, curso_b.pk],
+        )
+        self.assertEqual(response.data["cursos"][0]["cantidad"], 3)
+        self.assertAlmostEqual(
+            response.data["cursos"][0]["desviacion"], 1.2472191, places=6
+        )
+        self.assertEqual(response.data["cursos"][1]["promedio"], 4)
+
+    def test_distribucion_alumno_dos_cursos(self, mock):
+        """
+        Test de que un alumno con dos cursos en el año cuenta una sola vez,
+        en su último curso, y que un alumno sin curso cuenta en la
+        distribución general
+        """
+        cache.clear()
+        curso_b = Curso.objects.get(nombre="2A", anio=self.anio)
+        AlumnoCurso.objects.create(
+            alumno=self.alumno1, curso=curso_b, anio_lectivo=self.anio_lectivo
+        )
+        for alumno, puntaje in (
+            (self.alumno1, 10),
+            (self.alumno2, 7),
+            (self.alumno4, 4),
+        ):
+            Calificacion.objects.create(
+                alumno_id=alumno.pk,
+                evaluacion_id=self.evaluacion1.pk,
+                fecha="2020-12-12",
+                puntaje=puntaje,
+            )
+        response = self.client.get(
+            "/api/calificaciones/stats/distribucion/?evaluacion={}".format(
+                self.evaluacion1.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["general"]["cantidad"], 3)
+        self.assertEqual(response.data["general"]["promedio"], 7)
+        self.assertEqual(
+            [
+                (c["curso"], c["cantidad"], c["promedio"])
+                for c in response.data["cursos"]
+            ],
+            [(self.curso.pk, 1, 7), (curso_b.pk, 1, 10)],
+        )
+
+    def test_distribucion_cacheada_e_invalidada(self, mock):
+        """
+        Test de que la distribución se sirve del cache y que borrar una
+        calificación de la evaluación la invalida
+        """
+        cache.clear()
+        calificaciones = [
+            Calificacion.objects.create(
+                alumno_id=alumno.pk,
+                evaluacion_id=self.evaluacion1.pk,
+                fecha="2020-12-12",
+                puntaje=puntaje,
+            )
+            for alumno, puntaje in ((self.alumno1, 10), (self.alumno2, 6))
+        ]
+        url = "/api/calificaciones/stats/distribucion/?evaluacion={}".format(
+            self.evaluacion1.pk
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.data["general"]["promedio"], 8)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, format="json")
+        self.assertFalse(
+            any(
+                "calificaciones_calificacion" in q["sql"]
+                for q in context.captured_queries
+            )
+        )
+
+        response = self.client.delete(
+            "/api/calificaciones/{}/".format(calificaciones[1].pk),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.data["general"]["cantidad"], 1)
+        self.assertEqual(response.data["general"]["promedio"], 10)
+
+    def test_distribucion_invalida_calificaciones(self, mock):
+        """
+        Test de la distribución sin evaluación o de otra institución
+        """
+        response = self.client.get(
+            "/api/calificaciones/stats/distribucion/", format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            "/api/calificaciones/stats/distribucion/?evaluacion={}".format(
+                self.evaluacion_alt.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def cargar_calificaciones_ranking(self):
+        for alumno, evaluacion, puntaje in (
+            (self.alumno1, self.evaluacion1, 9),
+            (self.alumno1, self.evaluacion2, 7),
+            (self.alumno1, self.evaluacion11, 10),
+            (self.alumno2, self.evaluacion1, 6),
+            (self.alumno3, self.evaluacion1, 9),
+            (self.alumno3, self.evaluacion2, 7),
+            (self.alumno3, self.evaluacion11, 10),
+        ):
+            Calificacion.objects.create(
+                alumno_id=alumno.pk,
+                evaluacion_id=evaluacion.pk,
+                fecha="2020-12-12",
+                puntaje=puntaje,
+            )
+
+    def test_ranking_curso_calificaciones(self, mock):
+        """
+        Test del puesto y percentil de los alumnos de un curso, con el
+        promedio general y con el de una materia
+        """
+        url = "/api/calificaciones/stats/ranking/?curso={}&anio_lectivo={}".format(
+            self.curso.pk, self.anio_lectivo.pk
+        )
+        with CaptureQueriesContext(connection) as sin_calificaciones:
+            response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["alumnos"], [])
+
+        self.cargar_calificaciones_ranking()
+        with CaptureQueriesContext(connection) as con_calificaciones:
+            response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(sin_calificaciones), len(con_calificaciones))
+
+        filas = {f["alumno"]: f for f in response.data["alumnos"]}
+        # (9 * 0.5 + 7 * 0.3) / 0.8 = 8.25 en una materia y 10 en la otra
+        self.assertAlmostEqual(filas[self.alumno1.pk]["promedio"], 9.125)
+        self.assertEqual(filas[self.alumno1.pk]["puesto"], 1)
+        self.assertEqual(filas[self.alumno3.pk]["puesto"], 1)
+        self.assertEqual(filas[self.alumno3.pk]["percentil"], 0.5)
+        self.assertEqual(filas[self.alumno2.pk]["puesto"], 3)
+        self.assertEqual(filas[self.alumno2.pk]["percentil"], 0)
+        self.assertEqual(response.data["alumnos"][-1]["alumno"], self.alumno2.pk)
+
+        response = self.client.get(
+            url + "&materia={}".format(self.materia1.pk), format="json"
+        )
+        self.assertEqual(
+            {f["alumno"] for f in response.data["alumnos"]},
+            {self.alumno1.pk, self.alumno3.pk},
+        )
+        self.assertTrue(all(f["puesto"] == 1 for f in response.data["alumnos"]))
+
+    def test_ranking_alumno_calificaciones(self, mock):
+        """
+        Test del ranking de un solo alumno dentro de su curso
+        """
+        self.cargar_calificaciones_ranking()
+        response = self.client.get(
+            "/api/calificaciones/stats/ranking/?alumno={}&anio_lectivo={}".format(
+                self.alumno2.pk, self.anio_lectivo.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["curso"], self.curso.pk)
+        self.assertEqual(len(response.data["alumnos"]), 1)
+        self.assertEqual(response.data["alumnos"][0]["puesto"], 3)
+
+        response = self.client.get(
+            "/api/calificaciones/stats/ranking/?anio_lectivo={}".format(
+                self.anio_lectivo.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            "/api/calificaciones/stats/ranking/?alumno={}&anio_lectivo={}".format(
+                self.alumno4.pk, self.anio_lectivo.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ranking_alumno_dos_cursos_calificaciones(self, mock):
+        """
+        Test del ranking de un alumno con dos cursos en el mismo año
+        lectivo: se lo ubica en el último curso asignado
+        """
+        self.cargar_calificaciones_ranking()
+        AlumnoCurso.objects.create(
+            alumno=self.alumno2,
+            curso=self.curso2,
+            anio_lectivo=self.anio_lectivo,
+        )
+        response = self.client.get(
+            "/api/calificaciones/stats/ranking/?alumno={}&anio_lectivo={}".format(
+                self.alumno2.pk, self.anio_lectivo.pk
+            ),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["curso"], self.curso2.pk)
+
+    def test_ranking_materializado_calificaciones(self, mock):
+        """
+        Test del ranking guardado al cierre de un período: no cambia con las
+        calificaciones posteriores
+        """
+        self.cargar_calificaciones_ranking()
+        call_command(
+            "materializar_ranking",
+            fecha="13/12/2020",
+            anio_lectivo=[self.anio_lectivo.pk],
+            stdout=StringIO(),
+        )
+        # General y por materia: 3 alumnos en una, 2 en la otra
+        self.assertEqual(RankingCalificacion.objects.count(), 3 + 3 + 2)
+        Calificacion.objects.create(
+            alumno_id=self.alumno2.pk,
+            evaluacion_id=self.evaluacion11.pk,
+            fecha="2020-12-20",
+            puntaje=10,
+        )
+
+        url = "/api/calificaciones/stats/ranking/?curso={}&anio_lectivo={}".format(
+            self.curso.pk, self.anio_lectivo.pk
+        )
+        response = self.client.get(url + "&corte=13-12-2020", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        filas = {f["alumno"]: f for f in response.data["alumnos"]}
+        self.assertEqual(filas[self.alumno2.pk]["promedio"], 6)
+        self.assertEqual(filas[self.alumno2.pk]["puesto"], 3)
+
+        response = self.client.get(url, format="json")
+        filas = {f["alumno"]: f for f in response.data["alumnos"]}
+        self.assertEqual(filas[self.alumno2.pk]["promedio"], 8)
+
+        response = self.client.get(url + "&corte=14-12-2020", format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,5 +1,12 @@
 from django.contrib import admin
-from curricula.models import Carrera, Anio, Curso, Materia, AnioLectivo
+from curricula.models import (
+    Carrera,
+    Anio,
+    Curso,
+    Materia,
+    AnioLectivo,
+    DiaCalendario,
+)
 from ontrack import settings
 
 if settings.DEVELOPER_ADMIN:
@@ -8,3 +15,4 @@ if settings.DEVELOPER_ADMIN:
     admin.site.register(Anio)
     admin.site.register(Materia)
     admin.site.register(AnioLectivo)
+    admin.site.register(DiaCalendario)
@@ -0,0 +1,39 @@
+from rest_framework import serializers
+from curricula import models
+from ontrack import settings
+
+
+class DiaCalendarioSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.DiaCalendario
+        fields = ["tipo", "descripcion", "fecha_desde", "fecha_hasta"]
+        extra_kwargs = {
+            "tipo": {"required": True},
+            "fecha_desde": {
+                "required": True,
+                "input_formats": settings.DATE_INPUT_FORMAT,
+            },
+            "fecha_hasta": {
+                "required": False,
+                "input_formats": settings.DATE_INPUT_FORMAT,
+            },
+        }
+        read_only_fields = ["id", "fecha_creacion"]
+
+    def validate(self, data):
+        if data.get("fecha_hasta", data["fecha_desde"]) < data["fecha_desde"]:
+            raise serializers.ValidationError(
+                "La fecha_desde debe ser menor o igual a la fecha_hasta"
+            )
+        return data
+
+    def create(self, institucion):
+        dia_calendario = models.DiaCalendario(**self.validated_data)
+        dia_calendario.institucion = institucion
+        dia_calendario.save()
+
+
+class ViewDiaCalendarioSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.DiaCalendario
+        fields = ["id", "tipo", "descripcion", "fecha_desde", "fecha_hasta"]
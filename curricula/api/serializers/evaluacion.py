@@ -4,8 +4,7 @@ from calificaciones.models import Calificacion
 from functools import reduce
 from rest_framework.exceptions import ValidationError
 from ontrack import settings
-import django_rq
-from calificaciones.rq_funcions import alumno_calificacion_redesign
+from objetivos.recalculo import recalcular_evaluaciones
 
 
 class ViewEvaluacionSerializer(serializers.ModelSerializer):
@@ -56,35 +55,27 @@ class CreateEvaluacionListSerializer(serializers.ListSerializer):
             else:
                 data_mapping[0].append(item)
         # Checkeo de nested instances
-        for eval_id, evaluacion in eval_mapping.items():
-            if eval_id not in data_mapping:
-                if (
-                    Calificacion.objects.filter(evaluacion_id=eval_id).count()
-                    != 0
-                ):
-                    raise ValidationError(
-                        detail="No se puede eliminar una evaluación que ya contenga calificaciones!"
-                    )
+        eliminadas = [
+            eval_id for eval_id in eval_mapping if eval_id not in data_mapping
+        ]
+        if Calificacion.objects.filter(evaluacion_id__in=eliminadas).exists():
+            raise ValidationError(
+                detail="No se puede eliminar una evaluación que ya contenga calificaciones!"
+            )
         # Crear y actualizar las evaluaciones existentes.
         ret = []
+        ponderadas = []
         for eval_id, data in data_mapping.items():
             e = eval_mapping.get(eval_id, None)
             if e is not None:
+                ponderacion = e.ponderacion
                 ret.append(self.child.update(e, data))
-                calificaciones = Calificacion.objects.filter(
-                    evaluacion_id=e.id
-                )
-                materia = e.materia.id
-                if calificaciones:
-                    alumnos = {c.alumno.id for c in calificaciones}
-                    min_fecha = min({c.fecha for c in calificaciones})
-                    for alumno in alumnos:
-                        django_rq.enqueue(
-                            alumno_calificacion_redesign,
-                            alumno,
-                            materia,
-                            min_fecha,
-                        )
+                if e.ponderacion != ponderacion:
+                    ponderadas.append(e.id)
+        # Las evaluaciones con ponderación nueva se recalculan con un solo
+        # job por materia
+        if ponderadas:
+            recalcular_evaluaciones(ponderadas)
         for data in data_mapping[0]:
             ret.append(self.child.create(data))
 
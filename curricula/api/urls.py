@@ -5,6 +5,7 @@ from curricula.api.views import (
     anio,
     materia,
     evaluacion,
+    calendario,
 )
 
 urlpatterns = [
@@ -76,4 +77,20 @@ urlpatterns = [
         anio_lectivo.update_anio_lectivo,
         name="anio-lectivo-update",
     ),
+    # Calendario
+    path(
+        "calendario/",
+        calendario.create_dia_calendario,
+        name="calendario-create",
+    ),
+    path(
+        "calendario/list/",
+        calendario.list_dia_calendario,
+        name="calendario-list",
+    ),
+    path(
+        "calendario/<int:pk>/",
+        calendario.view_delete_dia_calendario,
+        name="calendario-view-delete",
+    ),
 ]
@@ -0,0 +1,120 @@
+from rest_framework.viewsets import ModelViewSet
+from curricula.api.serializers import calendario as serializers
+from curricula.models import AnioLectivo, DiaCalendario
+from users.permissions import permission_required
+from rest_framework.permissions import IsAuthenticated
+from rest_framework import status
+from rest_framework.response import Response
+from django.shortcuts import get_object_or_404
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from ontrack import responses
+
+
+class DiaCalendarioViewSet(ModelViewSet):
+    permission_classes = [
+        IsAuthenticated,
+        permission_required("diacalendario"),
+    ]
+    OK_EMPTY = {200: ""}
+    OK_VIEW = {200: serializers.ViewDiaCalendarioSerializer()}
+    OK_LIST = {200: serializers.ViewDiaCalendarioSerializer(many=True)}
+    OK_CREATED = {201: ""}
+
+    anio_lectivo_parameter = openapi.Parameter(
+        "anio_lectivo",
+        openapi.IN_QUERY,
+        description="Id del Año Lectivo del cual queremos los días del calendario",
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    )
+
+    @swagger_auto_schema(
+        operation_id="get_dia_calendario",
+        operation_description="""
+        Obtener un día del calendario utilizando su id.
+
+        Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
+        """,
+        responses={**OK_VIEW, **responses.STANDARD_ERRORS},
+    )
+    def get(self, request, pk=None):
+        dia_calendario = get_object_or_404(
+            DiaCalendario, pk=pk, institucion=request.user.institucion
+        )
+        serializer = serializers.ViewDiaCalendarioSerializer(dia_calendario)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_id="list_dia_calendario",
+        operation_description="""
+        Listar los feriados, recesos y días lectivos especiales de la institución.
+        Se puede pasar un anio_lectivo para listar sólo los días dentro de su rango.
+
+        Se deben ignorar los parámetros limit y offset, ya que no aplican a este endpoint.
+        """,
+        manual_parameters=[anio_lectivo_parameter],
+        responses={**OK_LIST, **responses.STANDARD_ERRORS},
+    )
+    def list(self, request):
+        queryset = DiaCalendario.objects.filter(
+            institucion=request.user.institucion
+        ).order_by("fecha_desde")
+        anio_lectivo = request.query_params.get("anio_lectivo", None)
+        if anio_lectivo:
+            if not anio_lectivo.isnumeric():
+                return Response(
+                    data={"detail": "El valor de anio_lectivo no es numérico"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            anio_lectivo = get_object_or_404(
+                AnioLectivo,
+                pk=int(anio_lectivo),
+                institucion=request.user.institucion,
+            )
+            queryset = queryset.filter(
+                fecha_desde__lte=anio_lectivo.fecha_hasta,
+                fecha_hasta__gte=anio_lectivo.fecha_desde,
+            )
+        serializer = serializers.ViewDiaCalendarioSerializer(
+            queryset, many=True
+        )
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_id="create_dia_calendario",
+        operation_description="""
+        Cargar un feriado (FERIADO), receso (RECESO) o día lectivo especial (ESPECIAL) en el calendario de la institución.
+        Para un día suelto basta con la fecha_desde; para un rango se pasa también la fecha_hasta.
+        Los días lectivos de los Años Lectivos afectados se recalculan al guardar.
+        """,
+        request_body=serializers.DiaCalendarioSerializer,
+        responses={**OK_CREATED, **responses.STANDARD_ERRORS},
+    )
+    def create(self, request):
+        serializer = serializers.DiaCalendarioSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.create(request.user.institucion)
+            return Response(status=status.HTTP_201_CREATED)
+        return Response(
+            data=serializer.errors, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @swagger_auto_schema(
+        operation_id="delete_dia_calendario",
+        operation_description="Borrar un día del calendario utilizando su id.",
+        responses={**OK_EMPTY, **responses.STANDARD_ERRORS},
+    )
+    def destroy(self, request, pk=None):
+        dia_calendario = get_object_or_404(
+            DiaCalendario, pk=pk, institucion=request.user.institucion
+        )
+        dia_calendario.delete()
+        return Response(status=status.HTTP_200_OK)
+
+
+create_dia_calendario = DiaCalendarioViewSet.as_view({"post": "create"})
+list_dia_calendario = DiaCalendarioViewSet.as_view({"get": "list"})
+view_delete_dia_calendario = DiaCalendarioViewSet.as_view(
+    {"get": "get", "delete": "destroy"}
+)
@@ -1,7 +1,7 @@
 from rest_framework.viewsets import ModelViewSet
 from curricula.api.serializers import evaluacion as serializers
 from curricula.models import Evaluacion, Materia, AnioLectivo
-from calificaciones.models import Calificacion
+from calificaciones.models import Calificacion, invalidar_evaluaciones
 from users.permissions import permission_required
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
@@ -11,6 +11,7 @@ from drf_yasg.utils import swagger_auto_schema
 from ontrack import responses
 from drf_yasg import openapi
 from django.core.exceptions import ValidationError
+from django.db import transaction
 
 
 class EvaluacionViewSet(ModelViewSet):
@@ -151,7 +152,13 @@ class EvaluacionViewSet(ModelViewSet):
             )
             try:
                 # Actualiza pasando instancias actuales y datos recibidos
-                serializer.update(instance, serializer.validated_data)
+                with transaction.atomic():
+                    serializer.update(instance, serializer.validated_data)
+                    # Las ponderaciones cambian las notas finales cacheadas
+                    invalidar_evaluaciones(
+                        serializer.validated_data[0]["materia"].pk,
+                        serializer.validated_data[0]["anio_lectivo"].pk,
+                    )
             except ValidationError as e:
                 # Si hubieron errores entonces 400
                 return Response(
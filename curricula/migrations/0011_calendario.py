@@ -0,0 +1,54 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:53
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def compilar_anios_lectivos(apps, schema_editor):
+    """
+    Compila el mapa de bits de días lectivos de cada año lectivo: el bit i
+    indica si fecha_desde + i días es lectivo. Todavía no hay días de
+    calendario cargados, así que sólo son lectivos los días de semana.
+    """
+    AnioLectivo = apps.get_model("curricula", "AnioLectivo")
+    for anio_lectivo in AnioLectivo.objects.all():
+        desde, hasta = anio_lectivo.fecha_desde, anio_lectivo.fecha_hasta
+        cantidad = (hasta - desde).days + 1
+        bitmap = bytearray((cantidad + 7) // 8)
+        for i in range(cantidad):
+            if (desde + datetime.timedelta(days=i)).weekday() < 5:
+                bitmap[i >> 3] |= 1 << (i & 7)
+        anio_lectivo.dias_lectivos = bytes(bitmap)
+        anio_lectivo.save(update_fields=["dias_lectivos"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instituciones', '0008_auto_20200916_2249'),
+        ('curricula', '0010_evaluacion_fecha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aniolectivo',
+            name='dias_lectivos',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DiaCalendario',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('FERIADO', 'Feriado'), ('RECESO', 'Receso'), ('ESPECIAL', 'Día lectivo especial')], max_length=10)),
+                ('descripcion', models.CharField(blank=True, max_length=150, null=True)),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('institucion', models.ForeignKey(blank=True, on_delete=django.db.models.deletion.CASCADE, to='instituciones.Institucion')),
+            ],
+        ),
+        migrations.RunPython(
+            compilar_anios_lectivos, migrations.RunPython.noop
+        ),
+    ]
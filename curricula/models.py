@@ -1,6 +1,36 @@
-from django.db import models
+from django.db import models, transaction
 from instituciones.models import Institucion
 from django.core.exceptions import ValidationError
+import datetime
+
+
+def compilar_dias_lectivos(fecha_desde, fecha_hasta, dias_calendario=()):
+    """
+    Arma el mapa de bits de días lectivos entre dos fechas (inclusive): el
+    bit i indica si fecha_desde + i días es lectivo. Por defecto lo son los
+    días de semana; dias_calendario son tuplas (tipo, desde, hasta) de
+    DiaCalendario que quitan (feriados, recesos) o agregan (días especiales)
+    días lectivos.
+    """
+    cantidad = (fecha_hasta - fecha_desde).days + 1
+    dias = [
+        (fecha_desde + datetime.timedelta(days=i)).weekday() < 5
+        for i in range(cantidad)
+    ]
+    # Los días especiales se aplican al final para que prevalezcan
+    for tipo, desde, hasta in sorted(
+        dias_calendario, key=lambda dia: dia[0] == DiaCalendario.ESPECIAL
+    ):
+        inicio = max((desde - fecha_desde).days, 0)
+        fin = min((hasta - fecha_desde).days, cantidad - 1)
+        for i in range(inicio, fin + 1):
+            dias[i] = tipo == DiaCalendario.ESPECIAL
+
+    bitmap = bytearray((cantidad + 7) // 8)
+    for i, lectivo in enumerate(dias):
+        if lectivo:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return bytes(bitmap)
 
 
 class Carrera(models.Model):
@@ -173,6 +203,9 @@ class AnioLectivo(models.Model):
     institucion = models.ForeignKey(
         to=Institucion, on_delete=models.CASCADE, blank=True
     )
+    # Mapa de bits de días lectivos, compilado a partir del calendario de la
+    # institución cada vez que cambian las fechas o el calendario
+    dias_lectivos = models.BinaryField(blank=True, null=True, editable=False)
 
     def clean(self):
         if not self.nombre:
@@ -197,11 +230,61 @@ class AnioLectivo(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.dias_lectivos = self.compilar_calendario()
         return super(AnioLectivo, self).save(*args, **kwargs)
 
     def __str__(self):
         return self.nombre
 
+    def compilar_calendario(self):
+        self.fecha_desde = self._meta.get_field("fecha_desde").to_python(
+            self.fecha_desde
+        )
+        self.fecha_hasta = self._meta.get_field("fecha_hasta").to_python(
+            self.fecha_hasta
+        )
+        return compilar_dias_lectivos(
+            self.fecha_desde,
+            self.fecha_hasta,
+            DiaCalendario.objects.filter(
+                institucion_id=self.institucion_id,
+                fecha_desde__lte=self.fecha_hasta,
+                fecha_hasta__gte=self.fecha_desde,
+            ).values_list("tipo", "fecha_desde", "fecha_hasta"),
+        )
+
+    def _bitmap(self):
+        if self.dias_lectivos is None:
+            self.dias_lectivos = self.compilar_calendario()
+        # Postgres devuelve los BinaryField como memoryview
+        if not isinstance(self.dias_lectivos, bytes):
+            self.dias_lectivos = bytes(self.dias_lectivos)
+        return self.dias_lectivos
+
+    def es_dia_lectivo(self, fecha):
+        """
+        Indica si la fecha es un día lectivo del Año Lectivo: una consulta
+        al mapa de bits, sin recorrer el calendario.
+        """
+        if not self.fecha_desde <= fecha <= self.fecha_hasta:
+            return False
+        i = (fecha - self.fecha_desde).days
+        return bool(self._bitmap()[i >> 3] >> (i & 7) & 1)
+
+    def cantidad_dias_lectivos(self, fecha_desde=None, fecha_hasta=None):
+        """
+        Cantidad de días lectivos entre dos fechas (inclusive), acotadas al
+        Año Lectivo.
+        """
+        desde = max(fecha_desde or self.fecha_desde, self.fecha_desde)
+        hasta = min(fecha_hasta or self.fecha_hasta, self.fecha_hasta)
+        if hasta < desde:
+            return 0
+        inicio = (desde - self.fecha_desde).days
+        largo = (hasta - desde).days + 1
+        dias = int.from_bytes(self._bitmap(), "little") >> inicio
+        return bin(dias & ((1 << largo) - 1)).count("1")
+
     class Meta:
         permissions = [
             ("list_aniolectivo", "Puede listar años lectivos"),
@@ -261,3 +344,67 @@ class Evaluacion(models.Model):
         permissions = [
             ("list_evaluacion", "Puede listar evaluaciones"),
         ]
+
+
+class DiaCalendario(models.Model):
+    """
+    Feriado, receso o día lectivo especial del calendario de una
+    institución. Un día suelto tiene fecha_desde igual a fecha_hasta.
+    """
+
+    FERIADO = "FERIADO"
+    RECESO = "RECESO"
+    ESPECIAL = "ESPECIAL"
+    TIPOS = [
+        (FERIADO, "Feriado"),
+        (RECESO, "Receso"),
+        (ESPECIAL, "Día lectivo especial"),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    descripcion = models.CharField(max_length=150, blank=True, null=True)
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField(blank=True)
+    institucion = models.ForeignKey(
+        to=Institucion, on_delete=models.CASCADE, blank=True
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def clean(self):
+        if not self.fecha_hasta:
+            self.fecha_hasta = self.fecha_desde
+        if self.fecha_hasta < self.fecha_desde:
+            raise ValidationError(
+                "La fecha_desde debe ser menor o igual a la fecha_hasta"
+            )
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        anterior = None
+        # El día y los calendarios compilados se guardan juntos
+        with transaction.atomic():
+            if self.pk:
+                anterior = DiaCalendario.objects.filter(pk=self.pk).first()
+            super(DiaCalendario, self).save(*args, **kwargs)
+            if anterior:
+                anterior.recompilar_anios_lectivos()
+            self.recompilar_anios_lectivos()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            borrados = super(DiaCalendario, self).delete(*args, **kwargs)
+            self.recompilar_anios_lectivos()
+        return borrados
+
+    def recompilar_anios_lectivos(self):
+        for anio_lectivo in AnioLectivo.objects.filter(
+            institucion_id=self.institucion_id,
+            fecha_desde__lte=self.fecha_hasta,
+            fecha_hasta__gte=self.fecha_desde,
+        ):
+            AnioLectivo.objects.filter(pk=anio_lectivo.pk).update(
+                dias_lectivos=anio_lectivo.compilar_calendario()
+            )
+
+    def __str__(self):
+        return self.tipo + " " + str(self.fecha_desde)
@@ -10,12 +10,22 @@ from curricula.models import (
     Curso,
     Materia,
     Evaluacion,
+    DiaCalendario,
 )
+from alumnos.models import Alumno
+from calificaciones.models import Calificacion
+from objetivos.models import EventoEvaluacion, EventoRecalculo
+from objetivos import recalculo
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.utils.serializer_helpers import ReturnList
+from django.test import override_settings
+from unittest.mock import patch
+from ontrack.tests_utils import CACHE_LOCAL
+import datetime
 
 
+@override_settings(CACHES=CACHE_LOCAL)
 class MateriaEvaluacionTest(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -373,6 +383,83 @@ class MateriaEvaluacionTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(type(response.data), ReturnList)
 
+    def test_edit_ponderaciones_recalcula_una_vez_por_materia(self):
+        """
+        Test de que al cambiar ponderaciones se registran las evaluaciones
+        cambiadas y el drenado pide un solo recálculo para la materia
+        """
+        materia = Materia.objects.create(
+            **{"nombre": "Física", "anio_id": self.anio.pk}
+        )
+        evaluaciones = [
+            Evaluacion.objects.create(
+                nombre="nombre{}".format(i),
+                materia=materia,
+                anio_lectivo=self.anio_lectivo,
+                fecha=datetime.date(2021, 3, 1),
+                ponderacion=ponderacion,
+            )
+            for i, ponderacion in enumerate([0.5, 0.3, 0.2])
+        ]
+        alumno_1 = Alumno.objects.create(
+            dni=1, nombre="Alumno", apellido="1", institucion=self.institucion
+        )
+        alumno_2 = Alumno.objects.create(
+            dni=2, nombre="Alumno", apellido="2", institucion=self.institucion
+        )
+        for alumno, evaluacion, fecha in [
+            (alumno_1, evaluaciones[0], datetime.date(2021, 3, 10)),
+            (alumno_1, evaluaciones[1], datetime.date(2021, 3, 5)),
+            (alumno_2, evaluaciones[1], datetime.date(2021, 4, 1)),
+            (alumno_2, evaluaciones[2], datetime.date(2021, 4, 20)),
+        ]:
+            Calificacion.objects.create(
+                alumno=alumno, evaluacion=evaluacion, fecha=fecha, puntaje=7
+            )
+        data = [
+            {
+                "id": evaluacion.pk,
+                "nombre": evaluacion.nombre,
+                "anio_lectivo": self.anio_lectivo.pk,
+                "materia": materia.pk,
+                "fecha": "01/03/2021",
+                "ponderacion": ponderacion,
+            }
+            for evaluacion, ponderacion in zip(evaluaciones, [0.5, 0.3, 0.2])
+        ]
+
+        response = self.client.put(
+            "/api/evaluacion/", data=data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(EventoEvaluacion.objects.exists())
+
+        data[0]["ponderacion"] = 0.4
+        data[1]["ponderacion"] = 0.4
+        response = self.client.put(
+            "/api/evaluacion/", data=data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(
+                EventoEvaluacion.objects.values_list(
+                    "evaluacion_id", flat=True
+                )
+            ),
+            [evaluaciones[0].pk, evaluaciones[1].pk],
+        )
+        self.assertFalse(EventoRecalculo.objects.exists())
+
+        with patch(
+            "objetivos.recalculo.encolar_recalculo_materia"
+        ) as encolar:
+            eventos, grupos = recalculo.drenar_eventos()
+        self.assertEqual((eventos, grupos), (2, 1))
+        encolar.assert_called_once_with(
+            materia.pk, [evaluaciones[0].pk, evaluaciones[1].pk]
+        )
+        self.assertFalse(EventoEvaluacion.objects.exists())
+
     def test_create_evaluaciones_ponderacion_erronea(self):
         """
         Test de validacion sobre ponderacion en la creacion de evaluaciones
@@ -1258,3 +1345,198 @@ class AnioLectivoTests(APITestCase):
             format="json",
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DiaCalendarioTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Setup de User y permisos para poder ejecutar todas las acciones
+        """
+        cls.client = APIClient()
+        cls.group_admin = Group.objects.create(name="Admin1")
+        cls.group_admin.permissions.add(
+            Permission.objects.get(name="Can add dia calendario")
+        )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(name="Can view dia calendario")
+        )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(name="Can delete dia calendario")
+        )
+        cls.group_admin.save()
+
+        cls.institucion_1 = Institucion.objects.create(
+            nombre="Institucion_1", identificador="1234"
+        )
+        cls.institucion_2 = Institucion.objects.create(
+            nombre="Institucion_2", identificador="1dg234"
+        )
+
+        cls.user_admin_1 = User.objects.create_user(
+            "juan1@juan.com",
+            password="password",
+            groups=cls.group_admin,
+            institucion=cls.institucion_1,
+        )
+        cls.user_admin_2 = User.objects.create_user(
+            "juan3@juan.com",
+            password="password",
+            groups=cls.group_admin,
+            institucion=cls.institucion_2,
+        )
+
+        cls.anio_lectivo_1 = AnioLectivo.objects.create(
+            nombre="2020",
+            fecha_desde="2020-01-01",
+            fecha_hasta="2020-12-31",
+            institucion=cls.institucion_1,
+        )
+        cls.anio_lectivo_2 = AnioLectivo.objects.create(
+            nombre="2020",
+            fecha_desde="2020-01-01",
+            fecha_hasta="2020-12-31",
+            institucion=cls.institucion_2,
+        )
+
+    def test_dias_lectivos_sin_calendario(self):
+        """
+        Test de que sin calendario son lectivos los dias de semana
+        """
+        anio_lectivo = AnioLectivo.objects.get(pk=self.anio_lectivo_1.pk)
+        self.assertTrue(anio_lectivo.es_dia_lectivo(datetime.date(2020, 3, 2)))
+        self.assertFalse(
+            anio_lectivo.es_dia_lectivo(datetime.date(2020, 3, 7))
+        )
+        self.assertFalse(
+            anio_lectivo.es_dia_lectivo(datetime.date(2021, 3, 1))
+        )
+        self.assertEqual(anio_lectivo.cantidad_dias_lectivos(), 262)
+        self.assertEqual(
+            anio_lectivo.cantidad_dias_lectivos(
+                datetime.date(2020, 3, 2), datetime.date(2020, 3, 8)
+            ),
+            5,
+        )
+
+    def test_create_dia_calendario(self):
+        """
+        Test de carga de feriados, recesos y dias especiales
+        """
+        self.client.force_authenticate(user=self.user_admin_1)
+        for data in [
+            {"tipo": "FERIADO", "fecha_desde": "02/03/2020"},
+            {
+                "tipo": "RECESO",
+                "fecha_desde": "13/07/2020",
+                "fecha_hasta": "24/07/2020",
+                "descripcion": "Vacaciones de invierno",
+            },
+            {"tipo": "ESPECIAL", "fecha_desde": "07/03/2020"},
+        ]:
+            response = self.client.post(
+                "/api/calendario/", data=data, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        anio_lectivo = AnioLectivo.objects.get(pk=self.anio_lectivo_1.pk)
+        self.assertFalse(
+            anio_lectivo.es_dia_lectivo(datetime.date(2020, 3, 2))
+        )
+        self.assertTrue(anio_lectivo.es_dia_lectivo(datetime.date(2020, 3, 7)))
+        self.assertFalse(
+            anio_lectivo.es_dia_lectivo(datetime.date(2020, 7, 15))
+        )
+        self.assertEqual(
+            anio_lectivo.cantidad_dias_lectivos(), 262 - 1 - 10 + 1
+        )
+
+        # El calendario de otra institucion no se ve afectado
+        anio_lectivo = AnioLectivo.objects.get(pk=self.anio_lectivo_2.pk)
+        self.assertEqual(anio_lectivo.cantidad_dias_lectivos(), 262)
+
+    def test_create_dia_calendario_fechas_invalidas(self):
+        """
+        Test de carga de un receso con fecha_hasta menor a fecha_desde
+        """
+        self.client.force_authenticate(user=self.user_admin_1)
+        data = {
+            "tipo": "RECESO",
+            "fecha_desde": "24/07/2020",
+            "fecha_hasta": "13/07/2020",
+        }
+        response = self.client.post(
+            "/api/calendario/", data=data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_dia_calendario(self):
+        """
+        Test de borrado de un feriado
+        """
+        feriado = DiaCalendario.objects.create(
+            tipo=DiaCalendario.FERIADO,
+            fecha_desde=datetime.date(2020, 3, 2),
+            institucion=self.institucion_1,
+        )
+        self.assertFalse(
+            AnioLectivo.objects.get(pk=self.anio_lectivo_1.pk).es_dia_lectivo(
+                datetime.date(2020, 3, 2)
+            )
+        )
+        self.client.force_authenticate(user=self.user_admin_2)
+        response = self.client.delete(f"/api/calendario/{feriado.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.user_admin_1)
+        response = self.client.delete(f"/api/calendario/{feriado.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            AnioLectivo.objects.get(pk=self.anio_lectivo_1.pk).es_dia_lectivo(
+                datetime.date(2020, 3, 2)
+            )
+        )
+
+    def test_create_dia_calendario_error_al_compilar(self):
+        """
+        Test de que si falla la compilación del calendario no queda guardado
+        el día
+        """
+        with patch.object(
+            AnioLectivo, "compilar_calendario", side_effect=ValueError
+        ):
+            with self.assertRaises(ValueError):
+                DiaCalendario.objects.create(
+                    tipo=DiaCalendario.FERIADO,
+                    fecha_desde=datetime.date(2020, 3, 2),
+                    institucion=self.institucion_1,
+                )
+        self.assertFalse(DiaCalendario.objects.exists())
+
+    def test_list_dia_calendario(self):
+        """
+        Test de listado de los dias del calendario de un Año Lectivo
+        """
+        DiaCalendario.objects.create(
+            tipo=DiaCalendario.FERIADO,
+            fecha_desde=datetime.date(2020, 3, 2),
+            institucion=self.institucion_1,
+        )
+        DiaCalendario.objects.create(
+            tipo=DiaCalendario.FERIADO,
+            fecha_desde=datetime.date(2021, 3, 1),
+            institucion=self.institucion_1,
+        )
+        DiaCalendario.objects.create(
+            tipo=DiaCalendario.FERIADO,
+            fecha_desde=datetime.date(2020, 3, 2),
+            institucion=self.institucion_2,
+        )
+        self.client.force_authenticate(user=self.user_admin_1)
+        response = self.client.get("/api/calendario/list/")
+        self.assertEqual(len(response.data), 2)
+        response = self.client.get(
+            f"/api/calendario/list/?anio_lectivo={self.anio_lectivo_1.id}"
+        )
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["fecha_hasta"], "2020-03-02")
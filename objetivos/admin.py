@@ -1,5 +1,6 @@
 from django.contrib import admin
 from objetivos.models import Objetivo, AlumnoObjetivo, TipoObjetivo
+from objetivos.recalculo import CALCULADORES
 from ontrack import settings
 from django import forms
 from django.core.exceptions import ValidationError
@@ -16,6 +17,10 @@ class TipoObjetivoForm(forms.ModelForm):
     multiple = forms.BooleanField(required=False)
     valor_minimo = forms.FloatField(required=False)
     valor_maximo = forms.FloatField(required=False)
+    calculador = forms.ChoiceField(
+        choices=[("", "---------")] + [(c, c) for c in CALCULADORES],
+        required=False,
+    )
 
     class Meta:
         model = TipoObjetivo
@@ -26,6 +31,7 @@ class TipoObjetivoForm(forms.ModelForm):
             "multiple",
             "valor_minimo",
             "valor_maximo",
+            "calculador",
         ]
 
     def clean(self):
@@ -42,6 +48,18 @@ class TipoObjetivoForm(forms.ModelForm):
         if valor_minimo and valor_maximo and not valor_maximo > valor_minimo:
             raise ValidationError("El valor máximo debe ser mayor al mínimo")
 
+        cleaned_data["calculador"] = cleaned_data.get("calculador") or None
+        calculable = cuantitativo and not cleaned_data.get("multiple")
+        if calculable and not cleaned_data["calculador"]:
+            raise ValidationError(
+                "Es necesario indicar el calculador de un tipo cuantitativo simple"
+            )
+        if not calculable and cleaned_data["calculador"]:
+            raise ValidationError(
+                "Sólo los tipos cuantitativos simples tienen calculador"
+            )
+        return cleaned_data
+
 
 class TipoObjetivoAdmin(admin.ModelAdmin):
     form = TipoObjetivoForm
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from objetivos.models import Objetivo, TipoObjetivo, AlumnoObjetivo
+from objetivos.recalculo import CALCULADORES
 from seguimientos.models import Seguimiento
 from alumnos.models import Alumno, AlumnoCurso
 
@@ -14,6 +15,9 @@ class CreateTipoObjetivoSerializer(serializers.ModelSerializer):
     multiple = serializers.BooleanField(required=True)
     valor_minimo = serializers.FloatField(required=False)
     valor_maximo = serializers.FloatField(required=False)
+    calculador = serializers.ChoiceField(
+        choices=list(CALCULADORES), required=False, allow_null=True
+    )
 
     class Meta:
         model = TipoObjetivo
@@ -24,8 +28,25 @@ class CreateTipoObjetivoSerializer(serializers.ModelSerializer):
             "multiple",
             "valor_minimo",
             "valor_maximo",
+            "calculador",
         ]
 
+    def validate(self, data):
+        """
+        Sólo los tipos cuantitativos simples se calculan, y todos necesitan
+        su calculador
+        """
+        calculable = data["cuantitativo"] and not data["multiple"]
+        if calculable and not data.get("calculador"):
+            raise serializers.ValidationError(
+                "Es necesario indicar el calculador de un tipo cuantitativo simple"
+            )
+        if not calculable and data.get("calculador"):
+            raise serializers.ValidationError(
+                "Sólo los tipos cuantitativos simples tienen calculador"
+            )
+        return data
+
 
 class UpdateTipoObjetivoSerializer(serializers.ModelSerializer):
     nombre = serializers.CharField(required=False, max_length=150)
@@ -34,6 +55,9 @@ class UpdateTipoObjetivoSerializer(serializers.ModelSerializer):
     multiple = serializers.BooleanField(required=False)
     valor_minimo = serializers.FloatField(required=False)
     valor_maximo = serializers.FloatField(required=False)
+    calculador = serializers.ChoiceField(
+        choices=list(CALCULADORES), required=False, allow_null=True
+    )
 
     class Meta:
         model = TipoObjetivo
@@ -44,6 +68,7 @@ class UpdateTipoObjetivoSerializer(serializers.ModelSerializer):
             "multiple",
             "valor_minimo",
             "valor_maximo",
+            "calculador",
         ]
 
 
@@ -58,6 +83,7 @@ class GetTipoObjetivoSerializer(serializers.ModelSerializer):
             "multiple",
             "valor_minimo",
             "valor_maximo",
+            "calculador",
         ]
 
 
@@ -160,6 +186,42 @@ class GetAlumnoObjetivoSerializer(serializers.ModelSerializer):
         ]
 
 
+class ObjetivoTableroSerializer(serializers.ModelSerializer):
+    tipo_objetivo = GetTipoObjetivoSerializer(many=False)
+
+    class Meta:
+        model = Objetivo
+        fields = [
+            "id",
+            "descripcion",
+            "valor_objetivo_cuantitativo",
+            "tipo_objetivo",
+        ]
+
+
+class CeldaTableroSerializer(serializers.Serializer):
+    objetivo = serializers.IntegerField()
+    valor = serializers.FloatField(allow_null=True)
+    alcanzada = serializers.BooleanField()
+    fecha_relacionada = serializers.DateField(
+        format="%d-%m-%Y", allow_null=True
+    )
+
+
+class AlumnoTableroSerializer(serializers.Serializer):
+    alumno_curso = serializers.IntegerField()
+    alumno = serializers.IntegerField()
+    nombre = serializers.CharField()
+    apellido = serializers.CharField()
+    objetivos = CeldaTableroSerializer(many=True)
+
+
+class TableroSeguimientoSerializer(serializers.Serializer):
+    seguimiento = serializers.IntegerField()
+    objetivos = ObjetivoTableroSerializer(many=True)
+    alumnos = AlumnoTableroSerializer(many=True)
+
+
 class UpdateAlumnoObjetivoSerializer(serializers.Serializer):
     alumno_curso = serializers.PrimaryKeyRelatedField(
         queryset=AlumnoCurso.objects.all(), many=False, required=False
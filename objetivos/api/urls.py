@@ -34,4 +34,9 @@ urlpatterns = [
         views.update_alumno_objetivo,
         name="alumno-objetivo-update",
     ),
+    path(
+        "seguimiento/<int:pk>/tablero/",
+        views.tablero_alumno_objetivo,
+        name="alumno-objetivo-tablero",
+    ),
 ]
@@ -10,14 +10,19 @@ from drf_yasg import openapi
 from ontrack import responses
 from alumnos.models import Alumno, AlumnoCurso
 from objetivos.api import serializers
-from objetivos.models import Objetivo, TipoObjetivo, AlumnoObjetivo
+from objetivos.models import (
+    Objetivo,
+    TipoObjetivo,
+    AlumnoObjetivo,
+    crear_alumno_objetivos_cualitativos,
+    evaluar_alcanzadas,
+)
+from objetivos.tablero import tablero_seguimiento
 from seguimientos.models import Seguimiento, IntegranteSeguimiento
 import re
 import datetime
-import django_rq
-from asistencias.rq_funcions import alumno_asistencia_redesign
-from calificaciones.rq_funcions import alumno_calificacion_redesign
-from django.utils import timezone
+from django.db import transaction
+from objetivos.recalculo import recalcular_objetivos
 
 DATE_REGEX = r"(?:(?:31(\/|-|\.)(?:0?[13578]|1[02]))\1|(?:(?:29|30)(\/|-|\.)(?:0?[13-9]|1[0-2])\2))(?:(?:1[6-9]|[2-9]\d)?\d{2})$|^(?:29(\/|-|\.)0?2\3(?:(?:(?:1[6-9]|[2-9]\d)?(?:0[48]|[2468][048]|[13579][26])|(?:(?:16|[2468][048]|[3579][26])00))))$|^(?:0?[1-9]|1\d|2[0-8])(\/|-|\.)(?:(?:0?[1-9])|(?:1[0-2]))\4(?:(?:1[6-9]|[2-9]\d)?\d{2})"
 
@@ -168,22 +173,8 @@ class ObjetivoViewSet(ModelViewSet):
 
             serializer.save()
 
-            if valor:
-                objetivos_actualizar = (
-                    AlumnoObjetivo.objects.filter(
-                        objetivo__id__exact=objetivo_retrieved.id,
-                        objetivo__tipo_objetivo__cuantitativo=True,
-                    )
-                    .order_by("alumno_curso", "-fecha_creacion")
-                    .distinct("alumno_curso")
-                )
-                for objetivo_alumno in objetivos_actualizar:
-                    if (
-                        objetivo_alumno.valor >= valor
-                        and not objetivo_alumno.alcanzada
-                    ):
-                        objetivo_alumno.alcanzada = True
-                        objetivo_alumno.save()
+            if tipo_objetivo.cuantitativo:
+                evaluar_alcanzadas([objetivo_retrieved.id])
 
             return Response(status=status.HTTP_200_OK)
 
@@ -326,41 +317,13 @@ class ObjetivoViewSet(ModelViewSet):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-            new_objetivo = serializer.create(serializer.validated_data)
+            # El objetivo, sus AlumnoObjetivo cualitativos y el pedido de
+            # cálculo se guardan juntos
+            with transaction.atomic():
+                new_objetivo = serializer.create(serializer.validated_data)
+                crear_alumno_objetivos_cualitativos([new_objetivo])
+                recalcular_objetivos([new_objetivo])
             return_serializer = serializers.ReturnId({"id": new_objetivo.id})
-            if (
-                new_objetivo.tipo_objetivo.cuantitativo
-                and not new_objetivo.tipo_objetivo.multiple
-                and re.search(
-                    "Asistencia",
-                    new_objetivo.tipo_objetivo.nombre,
-                    flags=re.IGNORECASE,
-                )
-            ):
-                for alumno_curso in new_objetivo.seguimiento.alumnos.all():
-                    django_rq.enqueue(
-                        alumno_asistencia_redesign,
-                        alumno_curso.alumno.id,
-                        timezone.now(),
-                        new_objetivo.seguimiento.anio_lectivo.fecha_desde,
-                    )
-            elif (
-                new_objetivo.tipo_objetivo.cuantitativo
-                and not new_objetivo.tipo_objetivo.multiple
-                and re.search(
-                    "promedio",
-                    new_objetivo.tipo_objetivo.nombre,
-                    flags=re.IGNORECASE,
-                )
-            ):
-                for alumno_curso in new_objetivo.seguimiento.alumnos.all():
-                    materia = new_objetivo.seguimiento.materias.all()[0]
-                    django_rq.enqueue(
-                        alumno_calificacion_redesign,
-                        alumno_curso.alumno.id,
-                        materia.id,
-                        new_objetivo.seguimiento.anio_lectivo.fecha_desde,
-                    )
 
             return Response(
                 data=return_serializer.data, status=status.HTTP_201_CREATED
@@ -423,6 +386,7 @@ class ObjetivoViewSet(ModelViewSet):
                 )
 
             objetivo_list = list()
+            tipos_simples = set()
 
             for objetivo in serializer.validated_data["objetivos"]:
 
@@ -459,52 +423,27 @@ class ObjetivoViewSet(ModelViewSet):
                         seguimiento__id__exact=seguimiento.id,
                         tipo_objetivo__id=tipo_objetivo.id,
                     )
-                    if len(existing_objetivo) != 0:
+                    if (
+                        len(existing_objetivo) != 0
+                        or tipo_objetivo.id in tipos_simples
+                    ):
                         return Response(
                             data={
                                 "detail": "Ya existe un objetivo de este mismo tipo en el seguimiento. No está permitido tener dos objetivos del mismo tipo"
                             },
                             status=status.HTTP_400_BAD_REQUEST,
                         )
-                objetivo = Objetivo(**objetivo)
-                objetivo.save()
-                objetivo_list.append(objetivo)
+                    tipos_simples.add(tipo_objetivo.id)
+                objetivo_list.append(Objetivo(**objetivo))
 
             if objetivo_list:
-                for new_ob in objetivo_list:
-                    if (
-                        new_ob.tipo_objetivo.cuantitativo
-                        and not new_ob.tipo_objetivo.multiple
-                        and re.search(
-                            "Asistencia",
-                            new_ob.tipo_objetivo.nombre,
-                            flags=re.IGNORECASE,
-                        )
-                    ):
-                        for alumno_curso in new_ob.seguimiento.alumnos.all():
-                            django_rq.enqueue(
-                                alumno_asistencia_redesign,
-                                alumno_curso.alumno.id,
-                                timezone.now(),
-                                new_ob.seguimiento.anio_lectivo.fecha_desde,
-                            )
-                    elif (
-                        new_ob.tipo_objetivo.cuantitativo
-                        and not new_ob.tipo_objetivo.multiple
-                        and re.search(
-                            "promedio",
-                            new_ob.tipo_objetivo.nombre,
-                            flags=re.IGNORECASE,
-                        )
-                    ):
-                        for alumno_curso in new_ob.seguimiento.alumnos.all():
-                            materia = new_ob.seguimiento.materias.all()[0]
-                            django_rq.enqueue(
-                                alumno_calificacion_redesign,
-                                alumno_curso.alumno.id,
-                                materia.id,
-                                new_ob.seguimiento.anio_lectivo.fecha_desde,
-                            )
+                # Se guardan recién cuando todos son válidos, junto con sus
+                # AlumnoObjetivo cualitativos y el pedido de cálculo
+                with transaction.atomic():
+                    for objetivo in objetivo_list:
+                        objetivo.save()
+                    crear_alumno_objetivos_cualitativos(objetivo_list)
+                    recalcular_objetivos(objetivo_list)
 
                 return_serializer = serializers.ReturnId(
                     [{"id": obj.id} for obj in objetivo_list], many=True,
@@ -578,6 +517,7 @@ class AlumnoObjetivoViewSet(ModelViewSet):
     OK_VIEW = {200: serializers.GetAlumnoObjetivoSerializer(many=False)}
     OK_LIST = {200: serializers.GetAlumnoObjetivoSerializer(many=True)}
     OK_CREATED = {201: ""}
+    OK_TABLERO = {200: serializers.TableroSeguimientoSerializer()}
 
     seguimiento_parameter = openapi.Parameter(
         "seguimiento",
@@ -687,20 +627,18 @@ class AlumnoObjetivoViewSet(ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            if not any(
-                [
-                    a.id in map(lambda x: x.id, seguimiento.alumnos.all())
-                    for a in alumno_cursos
-                ]
-            ):
+            alumno_curso = seguimiento.alumnos.filter(
+                alumno=alumno_retrieved
+            ).first()
+            if alumno_curso is None:
                 return Response(
                     data={"detail": "Alumno no pertenece a dicho seguimiento"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
             objetivos = Objetivo.objects.filter(
                 seguimiento__exact=seguimiento,
-            )
-            queryset = (
+            ).select_related("tipo_objetivo")
+            queryset = list(
                 AlumnoObjetivo.objects.filter(
                     objetivo__in=objetivos, alumno_curso__in=alumno_cursos,
                 )
@@ -708,23 +646,18 @@ class AlumnoObjetivoViewSet(ModelViewSet):
                 .distinct("objetivo")
             )
 
-            objetivos_filtered = filter(
-                lambda x: not x.tipo_objetivo.cuantitativo, objetivos
+            # Los cualitativos se crean junto con el objetivo; si falta
+            # alguno se responde sin valor y no alcanzado, sin escribir
+            existentes = [x.objetivo_id for x in queryset]
+            queryset.extend(
+                AlumnoObjetivo(
+                    objetivo=o, alumno_curso=alumno_curso, alcanzada=False
+                )
+                for o in objetivos
+                if not o.tipo_objetivo.cuantitativo and o.id not in existentes
             )
-            queryset_filtered = [x.objetivo.id for x in queryset]
-            alumno_curso = None
-            for ac in alumno_cursos:
-                if ac.anio_lectivo.id == seguimiento.anio_lectivo.id:
-                    alumno_curso = ac
-                    break
-
-            for o in objetivos_filtered:
-                if o.id not in queryset_filtered:
-                    AlumnoObjetivo(
-                        objetivo=o, alumno_curso=ac, alcanzada=False,
-                    ).save()
-            queryset = queryset.all()
-            if not len(queryset):
+            queryset.sort(key=lambda x: x.objetivo_id)
+            if not queryset:
                 return Response(
                     data={
                         "detail": "El alumno no tiene hitos en dicho seguimiento"
@@ -760,42 +693,29 @@ class AlumnoObjetivoViewSet(ModelViewSet):
                     data={"detail": "No encontrado."},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            if not any(
-                [
-                    a.id
-                    in map(lambda x: x.id, objetivo.seguimiento.alumnos.all())
-                    for a in alumno_cursos
-                ]
-            ):
+            alumno_curso = objetivo.seguimiento.alumnos.filter(
+                alumno=alumno_retrieved
+            ).first()
+            if alumno_curso is None:
                 return Response(
                     data={"detail": "Alumno no pertenece a dicho seguimiento"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
             queryset = AlumnoObjetivo.objects.filter(
                 objetivo__exact=objetivo, alumno_curso__in=alumno_cursos,
-            ).order_by("-fecha_creacion")
-
-            queryset_filtered = [x.objetivo.id for x in queryset]
-
-            if (
-                not objetivo.tipo_objetivo.cuantitativo
-                and objetivo.id not in queryset_filtered
-            ):
+            ).order_by("-fecha_creacion")[:1]
 
-                alumno_curso = None
-                for ac in alumno_cursos:
-                    if (
-                        ac.anio_lectivo.id
-                        == objetivo.seguimiento.anio_lectivo.id
-                    ):
-                        alumno_curso = ac
-                        break
-
-                AlumnoObjetivo(
-                    objetivo=objetivo, alumno_curso=ac, alcanzada=False,
-                ).save()
-            queryset = queryset.all()
-            if not len(queryset):
+            # Los cualitativos se crean junto con el objetivo; si falta se
+            # responde sin valor y no alcanzado, sin escribir
+            if not queryset and not objetivo.tipo_objetivo.cuantitativo:
+                queryset = [
+                    AlumnoObjetivo(
+                        objetivo=objetivo,
+                        alumno_curso=alumno_curso,
+                        alcanzada=False,
+                    )
+                ]
+            if not queryset:
                 return Response(
                     data={
                         "detail": "El alumno no tiene hitos en dicho objetivo"
@@ -1090,8 +1010,46 @@ class AlumnoObjetivoViewSet(ModelViewSet):
                 data=serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
+    @swagger_auto_schema(
+        operation_id="tablero_alumno_objetivo",
+        operation_description="""
+        Obtener el tablero de un seguimiento especificado por su id (en la url).
+
+        Devuelve los objetivos del seguimiento y, por cada alumno, el último
+        valor de cada objetivo y si está alcanzado, en el orden de objetivos.
+        Los objetivos sin valores para el alumno vienen con valor null y no
+        alcanzados.
+
+        Solo puede verlo un integrante del seguimiento.
+        """,
+        responses={**OK_TABLERO, **responses.STANDARD_ERRORS},
+    )
+    def tablero(self, request, pk=None):
+        seguimiento = get_object_or_404(Seguimiento, pk=pk)
+        if seguimiento.institucion != request.user.institucion:
+            return Response(
+                data={"detail": "No encontrado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        integrante = IntegranteSeguimiento.objects.filter(
+            fecha_hasta__isnull=True,
+            seguimiento__exact=seguimiento,
+            usuario__exact=request.user,
+        )
+        if not integrante.exists():
+            return Response(
+                data={"detail": "No encontrado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        serializer = serializers.TableroSeguimientoSerializer(
+            instance=tablero_seguimiento(seguimiento)
+        )
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
 
 get_alumno_objetivo = AlumnoObjetivoViewSet.as_view({"get": "get"})
 update_alumno_objetivo = AlumnoObjetivoViewSet.as_view({"patch": "update"})
 list_alumno_objetivo = AlumnoObjetivoViewSet.as_view({"get": "list"})
+tablero_alumno_objetivo = AlumnoObjetivoViewSet.as_view({"get": "tablero"})
 
@@ -0,0 +1,126 @@
+"""
+Calculadores de los objetivos cuantitativos.
+
+Cada TipoObjetivo indica en `calculador` la clave del calculador que arma
+las series de AlumnoObjetivo de sus objetivos. Los calculadores trabajan por
+lotes: reciben un seguimiento, sus objetivos de ese tipo y los alumnos a
+recalcular, y arman las series de todos con las mismas consultas. Para un
+tipo de objetivo nuevo alcanza con escribir su calculador y registrarlo en
+objetivos.recalculo.CALCULADORES.
+"""
+from itertools import groupby
+from django.db.models import Q
+from django.utils import timezone
+from objetivos.models import Objetivo, evaluar_alcanzadas, guardar_serie
+
+
+class CalculadorObjetivo:
+    # Clave que se guarda en TipoObjetivo.calculador
+    clave = None
+    # Tipo de EventoRecalculo que pide recalcular a un alumno
+    evento = None
+
+    def filtro_tipos(self):
+        """
+        Q sobre Objetivo con los objetivos cuantitativos simples cuyo tipo
+        usa este calculador.
+        """
+        return Q(
+            tipo_objetivo__cuantitativo=True,
+            tipo_objetivo__multiple=False,
+            tipo_objetivo__calculador=self.clave,
+        )
+
+    def corresponde(self, tipo_objetivo):
+        return (
+            tipo_objetivo.cuantitativo
+            and not tipo_objetivo.multiple
+            and tipo_objetivo.calculador == self.clave
+        )
+
+    def calcular(
+        self, seguimiento, objetivos, alumnos_curso, desde, fecha_calculo
+    ):
+        """
+        Devuelve sin guardar los AlumnoObjetivo de cada alumno_curso en cada
+        objetivo desde la fecha `desde`.
+        """
+        raise NotImplementedError
+
+    def recalcular(self, seguimiento, objetivos, alumnos_curso, desde):
+        """
+        Calcula las series de los alumnos en los objetivos del seguimiento,
+        escribe sólo los puntos que cambiaron y evalúa si están alcanzados.
+        Devuelve la cantidad de filas de cada operación.
+        """
+        objetivos = list(objetivos)
+        alumnos_curso = list(alumnos_curso)
+        objetivos_ids = [o.id for o in objetivos]
+        serie = self.calcular(
+            seguimiento, objetivos, alumnos_curso, desde, timezone.now()
+        )
+        filas = guardar_serie(
+            objetivos_ids,
+            [alumno_curso.alumno_id for alumno_curso in alumnos_curso],
+            desde,
+            serie,
+        )
+        evaluar_alcanzadas(
+            objetivos_ids, [alumno_curso.id for alumno_curso in alumnos_curso]
+        )
+        return filas
+
+    def recalcular_alumno(self, alumno, desde, materia=None):
+        """
+        Recalcula al alumno desde la fecha en los objetivos de este tipo de
+        los seguimientos en progreso que la incluyen (y la materia, si se
+        pasa), con un lote por seguimiento.
+        """
+        return self.recalcular_alumnos({alumno: desde}, materia)
+
+    def recalcular_alumnos(self, desdes, materia=None):
+        """
+        Recalcula a cada alumno de `desdes` (id de alumno -> fecha) desde su
+        fecha, en los objetivos de este tipo de los seguimientos en progreso
+        cuyo año lectivo la incluye (y la materia, si se pasa). Arma un lote
+        por seguimiento y fecha, así que los alumnos con la misma fecha se
+        calculan con las mismas consultas.
+        """
+        objetivos = (
+            Objetivo.objects.filter(
+                self.filtro_tipos(),
+                seguimiento__alumnos__alumno__id__in=desdes,
+                seguimiento__en_progreso=True,
+            )
+            .select_related("tipo_objetivo", "seguimiento__anio_lectivo")
+            .prefetch_related("seguimiento__materias")
+            .order_by("seguimiento_id", "id")
+            .distinct()
+        )
+        if materia is not None:
+            objetivos = objetivos.filter(seguimiento__materias__id=materia)
+
+        filas = {}
+        for _, objetivos_seguimiento in groupby(
+            objetivos, key=lambda o: o.seguimiento_id
+        ):
+            objetivos_seguimiento = list(objetivos_seguimiento)
+            seguimiento = objetivos_seguimiento[0].seguimiento
+            anio_lectivo = seguimiento.anio_lectivo
+            por_fecha = {}
+            for alumno_curso in seguimiento.alumnos.filter(
+                alumno_id__in=desdes
+            ):
+                desde = desdes[alumno_curso.alumno_id]
+                if (
+                    anio_lectivo.fecha_desde
+                    <= desde
+                    <= anio_lectivo.fecha_hasta
+                ):
+                    por_fecha.setdefault(desde, []).append(alumno_curso)
+            for desde, alumnos_curso in sorted(por_fecha.items()):
+                for operacion, cantidad in self.recalcular(
+                    seguimiento, objetivos_seguimiento, alumnos_curso, desde
+                ).items():
+                    filas[operacion] = filas.get(operacion, 0) + cantidad
+        return filas
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from objetivos.recalculo import drenar_eventos, LOTE_EVENTOS
+
+
+class Command(BaseCommand):
+    help = "Drena por lotes el outbox de eventos de recálculo de objetivos y encola los recálculos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_EVENTOS)
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=2,
+            help="Segundos de espera cuando el outbox queda vacío",
+        )
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Drena lo pendiente y termina",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            eventos, grupos = drenar_eventos(options["lote"])
+            if eventos:
+                self.stdout.write(
+                    f"{eventos} eventos agrupados en {grupos} recálculos"
+                )
+            if eventos < options["lote"]:
+                if options["una_vez"]:
+                    return
+                time.sleep(options["intervalo"])
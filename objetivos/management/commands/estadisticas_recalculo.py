@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from objetivos.recalculo import estadisticas_recalculo
+
+
+class Command(BaseCommand):
+    help = "Muestra los recálculos de objetivos encolados, los pedidos que se unieron a uno pendiente y las filas escritas"
+
+    def handle(self, *args, **options):
+        for tipo, contadores in estadisticas_recalculo().items():
+            encolados = contadores.get("encolados", 0)
+            coalescidos = contadores.get("coalescidos", 0)
+            pedidos = encolados + coalescidos
+            self.stdout.write(
+                "{}: {} pedidos, {} jobs encolados, {} coalescidos ({:.1%})".format(
+                    tipo,
+                    pedidos,
+                    encolados,
+                    coalescidos,
+                    coalescidos / pedidos if pedidos else 0,
+                )
+            )
+            self.stdout.write(
+                "{}: filas {} insertadas, {} actualizadas, {} eliminadas, "
+                "{} sin cambios".format(
+                    tipo,
+                    contadores.get("insertados", 0),
+                    contadores.get("actualizados", 0),
+                    contadores.get("eliminados", 0),
+                    contadores.get("sin_cambios", 0),
+                )
+            )
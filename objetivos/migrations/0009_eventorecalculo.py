@@ -0,0 +1,31 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curricula', '0010_evaluacion_fecha'),
+        ('alumnos', '0005_auto_20201023_2011'),
+        ('objetivos', '0008_auto_20201019_0328'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoRecalculo',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('asistencia', 'Asistencia'), ('calificacion', 'Calificación')], max_length=20)),
+                ('fecha', models.DateField()),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('alumno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='alumnos.Alumno')),
+                ('materia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='curricula.Materia')),
+            ],
+            options={
+                'verbose_name': 'Evento de recálculo',
+                'verbose_name_plural': 'Eventos de recálculo',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.8 on 2026-10-18 12:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objetivos', '0009_eventorecalculo'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='alumnoobjetivo',
+            options={'ordering': ['fecha_relacionada'], 'permissions': [('list_alumno_objetivo', 'Puede listar alumno_objetivo'), ('tablero_alumnoobjetivo', 'Puede ver el tablero de objetivos de un seguimiento')]},
+        ),
+    ]
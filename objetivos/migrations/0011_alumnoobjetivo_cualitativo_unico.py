@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("objetivos", "0010_permiso_tablero"),
+        ("seguimientos", "0010_auto_20200917_2132"),
+    ]
+
+    operations = [
+        # Deja sólo el AlumnoObjetivo más reciente de cada objetivo
+        # cualitativo y alumno
+        migrations.RunSQL(
+            """
+            DELETE FROM objetivos_alumnoobjetivo a
+            USING objetivos_alumnoobjetivo b
+            WHERE a.objetivo_id = b.objetivo_id
+                AND a.alumno_curso_id = b.alumno_curso_id
+                AND a.valor IS NULL
+                AND b.valor IS NULL
+                AND a.id < b.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="alumnoobjetivo",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(valor__isnull=True),
+                fields=("objetivo", "alumno_curso"),
+                name="alumnoobjetivo_cualitativo_unico",
+            ),
+        ),
+        # Crea los que faltan de los objetivos cualitativos ya existentes
+        migrations.RunSQL(
+            """
+            INSERT INTO objetivos_alumnoobjetivo
+                (fecha_creacion, fecha_relacionada, objetivo_id,
+                 alumno_curso_id, alcanzada)
+            SELECT now(), CURRENT_DATE, o.id, sa.alumnocurso_id, false
+            FROM objetivos_objetivo o
+            JOIN objetivos_tipoobjetivo t ON t.id = o.tipo_objetivo_id
+            JOIN seguimientos_seguimiento_alumnos sa
+                ON sa.seguimiento_id = o.seguimiento_id
+            WHERE NOT t.cuantitativo
+            ON CONFLICT DO NOTHING
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
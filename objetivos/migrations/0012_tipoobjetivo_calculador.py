@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("objetivos", "0011_alumnoobjetivo_cualitativo_unico"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tipoobjetivo",
+            name="calculador",
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        # Asigna el calculador que antes se elegía por el nombre del tipo
+        migrations.RunSQL(
+            [
+                """
+                UPDATE objetivos_tipoobjetivo SET calculador = 'asistencia'
+                WHERE cuantitativo AND NOT multiple
+                    AND nombre ILIKE '%asistencia%'
+                """,
+                """
+                UPDATE objetivos_tipoobjetivo SET calculador = 'promedio'
+                WHERE cuantitativo AND NOT multiple
+                    AND nombre ILIKE '%promedio%'
+                    AND calculador IS NULL
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.0.8 on 2026-10-18 12:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objetivos', '0012_tipoobjetivo_calculador'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoObjetivo',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('objetivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='objetivos.Objetivo')),
+            ],
+            options={
+                'verbose_name': 'Evento de objetivo nuevo',
+                'verbose_name_plural': 'Eventos de objetivos nuevos',
+            },
+        ),
+    ]
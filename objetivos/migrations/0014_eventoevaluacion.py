@@ -0,0 +1,27 @@
+# Generated by Django 3.0.8 on 2026-10-18 12:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curricula', '0011_calendario'),
+        ('objetivos', '0013_eventoobjetivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoEvaluacion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('evaluacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='curricula.Evaluacion')),
+            ],
+            options={
+                'verbose_name': 'Evento de ponderación',
+                'verbose_name_plural': 'Eventos de ponderaciones',
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
-from alumnos.models import AlumnoCurso
+from django.db import connection, models, transaction
+from alumnos.models import Alumno, AlumnoCurso
+from curricula.models import Evaluacion, Materia
 from seguimientos.models import Seguimiento
 from datetime import datetime
 
@@ -12,6 +13,9 @@ class TipoObjetivo(models.Model):
     multiple = models.BooleanField(blank=True)
     valor_minimo = models.FloatField(blank=True, null=True)
     valor_maximo = models.FloatField(blank=True, null=True)
+    # Clave del calculador de objetivos.recalculo.CALCULADORES que arma las
+    # series de los objetivos cuantitativos de este tipo
+    calculador = models.CharField(max_length=50, blank=True, null=True)
 
     def __str__(self):
         return self.nombre
@@ -70,5 +74,228 @@ class AlumnoObjetivo(models.Model):
     class Meta:
         permissions = [
             ("list_alumno_objetivo", "Puede listar alumno_objetivo"),
+            (
+                "tablero_alumnoobjetivo",
+                "Puede ver el tablero de objetivos de un seguimiento",
+            ),
         ]
         ordering = ["fecha_relacionada"]
+        constraints = [
+            # Los objetivos cualitativos no tienen valor y llevan un único
+            # AlumnoObjetivo por alumno, creado junto con el objetivo
+            models.UniqueConstraint(
+                fields=["objetivo", "alumno_curso"],
+                condition=models.Q(valor__isnull=True),
+                name="alumnoobjetivo_cualitativo_unico",
+            ),
+        ]
+
+
+def crear_alumno_objetivos_cualitativos(objetivos, alumnos_curso=None):
+    """
+    Crea en un solo INSERT el AlumnoObjetivo no alcanzado de cada alumno del
+    seguimiento (o de alumnos_curso) en los objetivos cualitativos. Los que
+    ya existen se ignoran.
+    """
+    AlumnoObjetivo.objects.bulk_create(
+        [
+            AlumnoObjetivo(
+                objetivo=objetivo,
+                alumno_curso_id=alumno_curso,
+                alcanzada=False,
+            )
+            for objetivo in objetivos
+            if not objetivo.tipo_objetivo.cuantitativo
+            for alumno_curso in (
+                alumnos_curso
+                if alumnos_curso is not None
+                else objetivo.seguimiento.alumnos.values_list("id", flat=True)
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+# Marca como alcanzado el último valor de cada alumno en los objetivos
+# cuantitativos que llegue al valor objetivo, y como no alcanzado el que no.
+# Sólo escribe las filas cuyo estado cambia.
+EVALUAR_ALCANZADAS = """
+UPDATE objetivos_alumnoobjetivo AS alumno_objetivo
+SET alcanzada = ultimos.alcanzada
+FROM (
+    SELECT DISTINCT ON (ao.objetivo_id, ao.alumno_curso_id)
+        ao.id,
+        ao.valor >= o.valor_objetivo_cuantitativo AS alcanzada
+    FROM objetivos_alumnoobjetivo ao
+    JOIN objetivos_objetivo o ON o.id = ao.objetivo_id
+    JOIN objetivos_tipoobjetivo t ON t.id = o.tipo_objetivo_id
+    WHERE ao.objetivo_id = ANY(%(objetivos)s)
+        AND t.cuantitativo
+        AND o.valor_objetivo_cuantitativo IS NOT NULL
+        AND ao.valor IS NOT NULL
+        AND (
+            %(alumnos_curso)s::integer[] IS NULL
+            OR ao.alumno_curso_id = ANY(%(alumnos_curso)s)
+        )
+    ORDER BY
+        ao.objetivo_id,
+        ao.alumno_curso_id,
+        ao.fecha_relacionada DESC,
+        ao.fecha_creacion DESC,
+        ao.id DESC
+) AS ultimos
+WHERE alumno_objetivo.id = ultimos.id
+    AND alumno_objetivo.alcanzada IS DISTINCT FROM ultimos.alcanzada
+"""
+
+
+def evaluar_alcanzadas(objetivos, alumnos_curso=None):
+    """
+    Actualiza el alcanzada del último AlumnoObjetivo de cada alumno en los
+    objetivos, o sólo el de los alumnos_curso, en una sola sentencia.
+    Devuelve la cantidad de filas modificadas.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            EVALUAR_ALCANZADAS,
+            {
+                "objetivos": list(objetivos),
+                "alumnos_curso": None
+                if alumnos_curso is None
+                else list(alumnos_curso),
+            },
+        )
+        return cursor.rowcount
+
+
+def guardar_serie(objetivos, alumnos, date_recalculate, serie):
+    """
+    Reemplaza los AlumnoObjetivo de los alumnos en los objetivos desde
+    date_recalculate por los de `serie`, sin guardar, escribiendo sólo los
+    puntos que cambian: inserta los nuevos, actualiza el valor de los que
+    cambiaron y borra los que ya no están. Devuelve la cantidad de filas de
+    cada operación.
+    """
+    guardados = {}
+    sobrantes = []
+    for alumno_objetivo in (
+        AlumnoObjetivo.objects.filter(
+            objetivo__id__in=objetivos,
+            fecha_relacionada__gte=date_recalculate,
+            alumno_curso__alumno__id__in=alumnos,
+        )
+        .only("objetivo", "alumno_curso", "fecha_relacionada", "valor")
+        .order_by("id")
+    ):
+        clave = (
+            alumno_objetivo.objetivo_id,
+            alumno_objetivo.alumno_curso_id,
+            alumno_objetivo.fecha_relacionada,
+        )
+        if clave in guardados:
+            sobrantes.append(alumno_objetivo.id)
+        else:
+            guardados[clave] = alumno_objetivo
+
+    insertar = []
+    actualizar = []
+    sin_cambios = 0
+    for nuevo in serie:
+        clave = (
+            nuevo.objetivo_id,
+            nuevo.alumno_curso_id,
+            nuevo.fecha_relacionada,
+        )
+        guardado = guardados.pop(clave, None)
+        if guardado is None:
+            insertar.append(nuevo)
+        elif guardado.valor != nuevo.valor:
+            guardado.valor = nuevo.valor
+            guardado.fecha_calculo = nuevo.fecha_calculo
+            # Con el valor nuevo hay que volver a evaluar si se alcanzó
+            guardado.alcanzada = False
+            actualizar.append(guardado)
+        else:
+            sin_cambios += 1
+    sobrantes.extend(guardado.id for guardado in guardados.values())
+
+    with transaction.atomic():
+        if sobrantes:
+            AlumnoObjetivo.objects.filter(id__in=sobrantes).delete()
+        if actualizar:
+            AlumnoObjetivo.objects.bulk_update(
+                actualizar, ["valor", "fecha_calculo", "alcanzada"]
+            )
+        if insertar:
+            AlumnoObjetivo.objects.bulk_create(insertar)
+    return {
+        "insertados": len(insertar),
+        "actualizados": len(actualizar),
+        "eliminados": len(sobrantes),
+        "sin_cambios": sin_cambios,
+    }
+
+
+class EventoRecalculo(models.Model):
+    """
+    Outbox de cambios en asistencias, calificaciones y evaluaciones.
+    Se escribe en la misma transacción que el cambio y un worker lo drena.
+    """
+
+    ASISTENCIA = "asistencia"
+    CALIFICACION = "calificacion"
+    TIPOS = [
+        (ASISTENCIA, "Asistencia"),
+        (CALIFICACION, "Calificación"),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    alumno = models.ForeignKey(to=Alumno, on_delete=models.CASCADE)
+    materia = models.ForeignKey(
+        to=Materia, on_delete=models.CASCADE, blank=True, null=True
+    )
+    fecha = models.DateField()
+    fecha_creacion = models.DateTimeField(auto_now_add=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tipo}: {self.alumno_id} desde {self.fecha}"
+
+    class Meta:
+        verbose_name_plural = "Eventos de recálculo"
+        verbose_name = "Evento de recálculo"
+
+
+class EventoObjetivo(models.Model):
+    """
+    Outbox de objetivos cuantitativos recién creados que todavía no se
+    calcularon. Se escribe en la misma transacción que el objetivo y el
+    worker lo drena con un job por seguimiento.
+    """
+
+    objetivo = models.ForeignKey(to=Objetivo, on_delete=models.CASCADE)
+    fecha_creacion = models.DateTimeField(auto_now_add=True, blank=True)
+
+    def __str__(self):
+        return f"objetivo: {self.objetivo_id}"
+
+    class Meta:
+        verbose_name_plural = "Eventos de objetivos nuevos"
+        verbose_name = "Evento de objetivo nuevo"
+
+
+class EventoEvaluacion(models.Model):
+    """
+    Outbox de evaluaciones a las que se les cambió la ponderación. Se
+    escribe en la misma transacción que el cambio y el worker lo drena con
+    un job por materia.
+    """
+
+    evaluacion = models.ForeignKey(to=Evaluacion, on_delete=models.CASCADE)
+    fecha_creacion = models.DateTimeField(auto_now_add=True, blank=True)
+
+    def __str__(self):
+        return f"evaluacion: {self.evaluacion_id}"
+
+    class Meta:
+        verbose_name_plural = "Eventos de ponderaciones"
+        verbose_name = "Evento de ponderación"
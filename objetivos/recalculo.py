@@ -0,0 +1,391 @@
+"""
+Cola de recálculo de objetivos agrupada por alumno y tipo de objetivo.
+
+Las vistas registran cada cambio en el outbox (EventoRecalculo) dentro de la
+misma transacción que el cambio. El worker de drenar_recalculos toma los
+eventos por lotes, los agrupa por alumno y los pasa a encolar_recalculo.
+
+Cada pedido guarda en Redis la fecha más temprana a recalcular para su clave
+(alumno y tipo, más la materia en el caso de calificaciones). Sólo el primer
+pedido encola un job, demorado unos segundos; los siguientes se suman al que
+ya está pendiente y el job recalcula una sola vez desde la fecha más temprana.
+
+Los objetivos nuevos se registran en su propio outbox (EventoObjetivo) y se
+calculan con un job por seguimiento, que pasa todos sus alumnos de una vez
+al calculador del tipo de objetivo (CALCULADORES). Del mismo modo, los
+cambios de ponderación se registran por evaluación (EventoEvaluacion) y se
+recalculan con un job por materia para todos los alumnos calificados.
+"""
+import datetime
+import django_rq
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from calificaciones.models import Calificacion
+from objetivos.models import (
+    EventoEvaluacion,
+    EventoObjetivo,
+    EventoRecalculo,
+    Objetivo,
+)
+from seguimientos.models import Seguimiento
+from asistencias.rq_funcions import (
+    CalculadorAsistencia,
+    alumno_asistencia_redesign,
+)
+from calificaciones.rq_funcions import (
+    CalculadorPromedio,
+    alumno_calificacion_redesign,
+)
+
+ASISTENCIA = EventoRecalculo.ASISTENCIA
+CALIFICACION = EventoRecalculo.CALIFICACION
+
+RECALCULOS = {
+    ASISTENCIA: alumno_asistencia_redesign,
+    CALIFICACION: alumno_calificacion_redesign,
+}
+
+# Calculadores de objetivos cuantitativos por clave de TipoObjetivo.calculador
+CALCULADORES = {
+    calculador.clave: calculador
+    for calculador in (CalculadorAsistencia(), CalculadorPromedio())
+}
+
+DEBOUNCE_SEGUNDOS = getattr(settings, "RECALCULO_DEBOUNCE_SEGUNDOS", 5)
+EXPIRACION_SEGUNDOS = getattr(settings, "RECALCULO_EXPIRACION_SEGUNDOS", 3600)
+LOTE_EVENTOS = getattr(settings, "RECALCULO_LOTE_EVENTOS", 500)
+
+PREFIJO = "recalculo"
+CLAVE_ESTADISTICAS = PREFIJO + ":estadisticas"
+
+# Deja en KEYS[1] la menor fecha entre la pendiente y ARGV[1], y cuenta el
+# pedido en KEYS[2]. Devuelve 1 si no había un recálculo pendiente.
+UNIR_FECHA = """
+local actual = redis.call("GET", KEYS[1])
+if actual then
+    redis.call("HINCRBY", KEYS[2], ARGV[3] .. ":coalescidos", 1)
+    if ARGV[1] < actual then
+        redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+    end
+    return 0
+end
+redis.call("HINCRBY", KEYS[2], ARGV[3] .. ":encolados", 1)
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+return 1
+"""
+
+
+def clave_recalculo(tipo, alumno, materia=None):
+    partes = [PREFIJO, tipo, str(alumno)]
+    if materia is not None:
+        partes.append(str(materia))
+    return ":".join(partes)
+
+
+def _fecha_iso(fecha):
+    if isinstance(fecha, datetime.datetime):
+        fecha = fecha.date()
+    if isinstance(fecha, datetime.date):
+        return fecha.isoformat()
+    return datetime.date.fromisoformat(str(fecha)).isoformat()
+
+
+def encolar_recalculo(tipo, alumno, date_recalculate, materia=None):
+    """
+    Pide el recálculo de los objetivos de un alumno desde date_recalculate.
+    Devuelve True si se encoló un job nuevo y False si se unió a uno pendiente.
+    Si no se puede encolar el job borra la fecha pendiente y propaga el
+    error, para que el próximo pedido vuelva a encolarlo.
+    """
+    fecha = _fecha_iso(date_recalculate)
+    clave = clave_recalculo(tipo, alumno, materia)
+    conexion = django_rq.get_connection()
+    unir_fecha = conexion.register_script(UNIR_FECHA)
+    nuevo = unir_fecha(
+        keys=[clave, CLAVE_ESTADISTICAS],
+        args=[fecha, EXPIRACION_SEGUNDOS, tipo],
+    )
+    if not nuevo:
+        return False
+
+    queue = django_rq.get_queue()
+    try:
+        if DEBOUNCE_SEGUNDOS:
+            queue.enqueue_in(
+                datetime.timedelta(seconds=DEBOUNCE_SEGUNDOS),
+                ejecutar_recalculo,
+                tipo,
+                alumno,
+                fecha,
+                materia,
+            )
+        else:
+            queue.enqueue(ejecutar_recalculo, tipo, alumno, fecha, materia)
+    except Exception:
+        # Sin job, la fecha pendiente haría que los pedidos siguientes se
+        # unan a un recálculo que nunca se ejecuta
+        conexion.delete(clave)
+        raise
+    return True
+
+
+def registrar_eventos(tipo, alumnos, date_recalculate, materia=None):
+    """
+    Escribe en el outbox un evento por alumno. Debe llamarse dentro de la
+    transacción del cambio que lo origina.
+    """
+    EventoRecalculo.objects.bulk_create(
+        [
+            EventoRecalculo(
+                tipo=tipo,
+                alumno_id=alumno,
+                materia_id=materia,
+                fecha=date_recalculate,
+            )
+            for alumno in alumnos
+        ]
+    )
+
+
+def recalcular_asistencia(alumno, date_recalculate):
+    registrar_eventos(ASISTENCIA, [alumno], date_recalculate)
+
+
+def recalcular_asistencias(alumnos, date_recalculate):
+    registrar_eventos(ASISTENCIA, alumnos, date_recalculate)
+
+
+def recalcular_calificacion(alumno, materia, date_recalculate):
+    registrar_eventos(CALIFICACION, [alumno], date_recalculate, materia)
+
+
+def recalcular_calificaciones(alumnos, materia, date_recalculate):
+    registrar_eventos(CALIFICACION, alumnos, date_recalculate, materia)
+
+
+def recalcular_evaluaciones(evaluaciones):
+    """
+    Escribe en el outbox las evaluaciones a las que se les cambió la
+    ponderación, para que drenar_eventos encole un job por materia. Debe
+    llamarse dentro de la transacción del cambio.
+    """
+    EventoEvaluacion.objects.bulk_create(
+        [
+            EventoEvaluacion(evaluacion_id=evaluacion)
+            for evaluacion in evaluaciones
+        ]
+    )
+
+
+def drenar_eventos(limite=LOTE_EVENTOS):
+    """
+    Toma hasta `limite` eventos del outbox, los agrupa por alumno (y materia
+    para calificaciones) con la fecha más temprana y pide un recálculo por
+    grupo. Hace lo mismo con los objetivos nuevos, con un job por
+    seguimiento, y con las ponderaciones cambiadas, con un job por materia.
+    Los eventos se borran en la misma transacción, así que si
+    falla el encolado vuelven a quedar pendientes. Devuelve la cantidad de
+    eventos y de grupos procesados.
+    """
+    with transaction.atomic():
+        eventos = list(
+            EventoRecalculo.objects.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", "tipo", "alumno_id", "materia_id", "fecha")[
+                :limite
+            ]
+        )
+        pendientes = {}
+        for _, tipo, alumno, materia, fecha in eventos:
+            clave = (tipo, alumno, materia)
+            if clave not in pendientes or fecha < pendientes[clave]:
+                pendientes[clave] = fecha
+
+        for (tipo, alumno, materia), fecha in pendientes.items():
+            encolar_recalculo(tipo, alumno, fecha, materia)
+
+        EventoRecalculo.objects.filter(
+            id__in=[evento[0] for evento in eventos]
+        ).delete()
+
+        objetivos = list(
+            EventoObjetivo.objects.select_for_update(
+                skip_locked=True, of=("self",)
+            )
+            .order_by("id")
+            .values_list("id", "objetivo__seguimiento_id", "objetivo_id")[
+                :limite
+            ]
+        )
+        por_seguimiento = {}
+        for _, seguimiento, objetivo in objetivos:
+            por_seguimiento.setdefault(seguimiento, []).append(objetivo)
+
+        for seguimiento, objetivos_ids in por_seguimiento.items():
+            encolar_recalculo_seguimiento(seguimiento, objetivos_ids)
+
+        EventoObjetivo.objects.filter(
+            id__in=[evento[0] for evento in objetivos]
+        ).delete()
+
+        evaluaciones = list(
+            EventoEvaluacion.objects.select_for_update(
+                skip_locked=True, of=("self",)
+            )
+            .order_by("id")
+            .values_list("id", "evaluacion__materia_id", "evaluacion_id")[
+                :limite
+            ]
+        )
+        por_materia = {}
+        for _, materia, evaluacion in evaluaciones:
+            por_materia.setdefault(materia, set()).add(evaluacion)
+
+        for materia, evaluaciones_ids in por_materia.items():
+            encolar_recalculo_materia(materia, sorted(evaluaciones_ids))
+
+        EventoEvaluacion.objects.filter(
+            id__in=[evento[0] for evento in evaluaciones]
+        ).delete()
+    return (
+        len(eventos) + len(objetivos) + len(evaluaciones),
+        len(pendientes) + len(por_seguimiento) + len(por_materia),
+    )
+
+
+def ejecutar_recalculo(tipo, alumno, fecha, materia=None):
+    """
+    Job encolado por encolar_recalculo. Toma y borra la fecha pendiente, de
+    forma que un pedido posterior vuelva a encolar su propio job.
+    """
+    pipeline = django_rq.get_connection().pipeline()
+    pipeline.get(clave_recalculo(tipo, alumno, materia))
+    pipeline.delete(clave_recalculo(tipo, alumno, materia))
+    pendiente, _ = pipeline.execute()
+    if pendiente:
+        fecha = min(fecha, pendiente.decode())
+
+    date_recalculate = datetime.date.fromisoformat(fecha)
+    if tipo == CALIFICACION:
+        filas = RECALCULOS[tipo](alumno, materia, date_recalculate)
+    else:
+        filas = RECALCULOS[tipo](alumno, date_recalculate)
+
+    contar_filas(tipo, filas)
+
+
+def contar_filas(tipo, filas):
+    """
+    Suma a las estadísticas las filas insertadas, actualizadas, eliminadas
+    y sin cambios de las series que escribió un job.
+    """
+    if filas:
+        pipeline = django_rq.get_connection().pipeline()
+        for operacion, cantidad in filas.items():
+            pipeline.hincrby(
+                CLAVE_ESTADISTICAS, "{}:{}".format(tipo, operacion), cantidad
+            )
+        pipeline.execute()
+
+
+def calculador_de(tipo_objetivo):
+    """
+    Devuelve el calculador del tipo de objetivo, o None si sus objetivos no
+    se calculan (los cualitativos y los múltiples).
+    """
+    for calculador in CALCULADORES.values():
+        if calculador.corresponde(tipo_objetivo):
+            return calculador
+    return None
+
+
+def recalcular_objetivos(objetivos):
+    """
+    Escribe en el outbox los objetivos recién creados que se calculan, para
+    que drenar_eventos encole un job por seguimiento. Debe llamarse dentro
+    de la transacción que crea los objetivos.
+    """
+    EventoObjetivo.objects.bulk_create(
+        [
+            EventoObjetivo(objetivo=objetivo)
+            for objetivo in objetivos
+            if calculador_de(objetivo.tipo_objetivo) is not None
+        ]
+    )
+
+
+def encolar_recalculo_seguimiento(seguimiento, objetivos):
+    django_rq.get_queue().enqueue(
+        ejecutar_recalculo_seguimiento, seguimiento, objetivos
+    )
+
+
+def ejecutar_recalculo_seguimiento(seguimiento, objetivos):
+    """
+    Job encolado por drenar_eventos. Calcula desde el inicio del año
+    lectivo las series de todos los alumnos del seguimiento, con un lote
+    por calculador.
+    """
+    seguimiento = Seguimiento.objects.select_related("anio_lectivo").get(
+        pk=seguimiento
+    )
+    alumnos_curso = list(seguimiento.alumnos.all())
+    por_calculador = {}
+    for objetivo in Objetivo.objects.filter(
+        id__in=objetivos, seguimiento=seguimiento
+    ).select_related("tipo_objetivo"):
+        calculador = calculador_de(objetivo.tipo_objetivo)
+        if calculador is not None:
+            por_calculador.setdefault(calculador, []).append(objetivo)
+
+    for calculador, objetivos_calculador in por_calculador.items():
+        filas = calculador.recalcular(
+            seguimiento,
+            objetivos_calculador,
+            alumnos_curso,
+            seguimiento.anio_lectivo.fecha_desde,
+        )
+        contar_filas(calculador.evento, filas)
+
+
+def encolar_recalculo_materia(materia, evaluaciones):
+    django_rq.get_queue().enqueue(
+        ejecutar_recalculo_materia, materia, evaluaciones
+    )
+
+
+def ejecutar_recalculo_materia(materia, evaluaciones):
+    """
+    Job encolado por drenar_eventos. Recalcula el promedio de los alumnos
+    calificados en las evaluaciones, cada uno desde su calificación más
+    temprana en ellas, en un solo lote por seguimiento y fecha.
+    """
+    desdes = dict(
+        Calificacion.objects.filter(evaluacion_id__in=evaluaciones)
+        .order_by()
+        .values("alumno_id")
+        .annotate(desde=Min("fecha"))
+        .values_list("alumno_id", "desde")
+    )
+    if not desdes:
+        return
+    calculador = CALCULADORES[CalculadorPromedio.clave]
+    filas = calculador.recalcular_alumnos(desdes, materia)
+    contar_filas(calculador.evento, filas)
+
+
+def estadisticas_recalculo():
+    """
+    Devuelve, por tipo de objetivo, los jobs encolados, los pedidos que se
+    unieron a un job pendiente y las filas de AlumnoObjetivo que escribieron
+    los jobs.
+    """
+    contadores = django_rq.get_connection().hgetall(CLAVE_ESTADISTICAS)
+    estadisticas = {
+        tipo: {"encolados": 0, "coalescidos": 0} for tipo in RECALCULOS
+    }
+    for campo, valor in contadores.items():
+        tipo, contador = campo.decode().split(":")
+        estadisticas.setdefault(tipo, {})[contador] = int(valor)
+    return estadisticas
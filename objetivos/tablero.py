@@ -0,0 +1,74 @@
+"""
+Tablero de un seguimiento: el último valor y si está alcanzado cada objetivo
+para cada alumno del seguimiento.
+"""
+from objetivos.models import Objetivo, AlumnoObjetivo
+
+
+def tablero_seguimiento(seguimiento):
+    """
+    Arma la matriz alumnos x objetivos con tres consultas sin importar la
+    cantidad de alumnos: los objetivos con su tipo, los alumnos y un
+    DISTINCT ON (alumno_curso, objetivo) con el último AlumnoObjetivo de
+    cada par. Los pares sin AlumnoObjetivo vienen sin valor y no alcanzados.
+    """
+    objetivos = list(
+        Objetivo.objects.filter(seguimiento=seguimiento)
+        .select_related("tipo_objetivo")
+        .order_by("id")
+    )
+    alumnos_curso = list(
+        seguimiento.alumnos.select_related("alumno").order_by(
+            "alumno__apellido", "alumno__nombre", "id"
+        )
+    )
+    ultimos = {
+        (fila["alumno_curso_id"], fila["objetivo_id"]): fila
+        for fila in AlumnoObjetivo.objects.filter(
+            objetivo__seguimiento=seguimiento,
+            alumno_curso__in=seguimiento.alumnos.all(),
+        )
+        .order_by(
+            "alumno_curso_id",
+            "objetivo_id",
+            "-fecha_relacionada",
+            "-fecha_creacion",
+            "-id",
+        )
+        .distinct("alumno_curso_id", "objetivo_id")
+        .values(
+            "alumno_curso_id",
+            "objetivo_id",
+            "valor",
+            "alcanzada",
+            "fecha_relacionada",
+        )
+    }
+
+    alumnos = []
+    for alumno_curso in alumnos_curso:
+        celdas = []
+        for objetivo in objetivos:
+            ultimo = ultimos.get((alumno_curso.id, objetivo.id), {})
+            celdas.append(
+                {
+                    "objetivo": objetivo.id,
+                    "valor": ultimo.get("valor"),
+                    "alcanzada": ultimo.get("alcanzada", False),
+                    "fecha_relacionada": ultimo.get("fecha_relacionada"),
+                }
+            )
+        alumnos.append(
+            {
+                "alumno_curso": alumno_curso.id,
+                "alumno": alumno_curso.alumno_id,
+                "nombre": alumno_curso.alumno.nombre,
+                "apellido": alumno_curso.alumno.apellido,
+                "objetivos": celdas,
+            }
+        )
+    return {
+        "seguimiento": seguimiento.id,
+        "objetivos": objetivos,
+        "alumnos": alumnos,
+    }
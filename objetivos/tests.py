@@ -6,16 +6,27 @@ from users.models import User, Group
 from instituciones.models import Institucion
 from curricula.models import Carrera, AnioLectivo, Curso, Anio, Materia
 from alumnos.models import Alumno, AlumnoCurso
-from objetivos.models import Objetivo, AlumnoObjetivo, TipoObjetivo
+from objetivos.models import (
+    Objetivo,
+    AlumnoObjetivo,
+    TipoObjetivo,
+    EventoObjetivo,
+    EventoRecalculo,
+    crear_alumno_objetivos_cualitativos,
+)
 from seguimientos.models import (
     Seguimiento,
     IntegranteSeguimiento,
     RolSeguimiento,
 )
 from rest_framework import status
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import datetime
 from collections import OrderedDict
-from unittest.mock import patch
+from unittest.mock import patch, Mock
+from objetivos import recalculo
+from objetivos.api import serializers
 
 
 class ObjetivoTests(APITestCase):
@@ -240,6 +251,7 @@ class ObjetivoTests(APITestCase):
             nombre="Promedio notas",
             cuantitativo=True,
             multiple=False,
+            calculador="promedio",
             valor_minimo=0,
             valor_maximo=100,
         )
@@ -247,6 +259,7 @@ class ObjetivoTests(APITestCase):
             nombre="Porcentaje asistencias",
             cuantitativo=True,
             multiple=False,
+            calculador="asistencia",
             valor_minimo=0,
             valor_maximo=100,
         )
@@ -293,7 +306,7 @@ class ObjetivoTests(APITestCase):
     #############
     #   CREATE  #
     #############
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_multiple_objetivo_admin(self, mock):
         """
         Test de creacion correcta de Objetivo por admin
@@ -318,7 +331,119 @@ class ObjetivoTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(len(response.data) == 2)
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
+    def test_create_multiple_objetivo_un_job_por_seguimiento(self, mock):
+        """
+        Test de que los objetivos creados quedan en el outbox y se calculan
+        con un job por seguimiento y no uno por alumno
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "seguimiento": self.seguimiento_1.id,
+            "objetivos": [
+                {
+                    "valor_objetivo_cuantitativo": 85,
+                    "tipo_objetivo": self.tipo_objetivo_3.id,
+                },
+                {
+                    "descripcion": "Holasss",
+                    "tipo_objetivo": self.tipo_objetivo_1.id,
+                },
+            ],
+        }
+        response = self.client.post(
+            "/api/objetivos/multiple/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock.get_queue().enqueue.assert_not_called()
+        self.assertEqual(
+            list(EventoObjetivo.objects.values_list("objetivo_id", flat=True)),
+            [response.data[0]["id"]],
+        )
+
+        self.assertEqual(recalculo.drenar_eventos(), (1, 1))
+        mock.get_queue().enqueue.assert_called_once_with(
+            recalculo.ejecutar_recalculo_seguimiento,
+            self.seguimiento_1.id,
+            [response.data[0]["id"]],
+        )
+        self.assertFalse(EventoObjetivo.objects.exists())
+        self.assertFalse(EventoRecalculo.objects.exists())
+
+    @patch("objetivos.recalculo.django_rq")
+    def test_create_multiple_objetivo_tipo_repetido(self, mock):
+        """
+        Test de que si un objetivo no es válido no se guarda ninguno de los
+        objetivos del pedido
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        cantidad = Objetivo.objects.count()
+        data = {
+            "seguimiento": self.seguimiento_1.id,
+            "objetivos": [
+                {
+                    "valor_objetivo_cuantitativo": 85,
+                    "tipo_objetivo": self.tipo_objetivo_3.id,
+                },
+                {
+                    "valor_objetivo_cuantitativo": 90,
+                    "tipo_objetivo": self.tipo_objetivo_3.id,
+                },
+            ],
+        }
+        response = self.client.post(
+            "/api/objetivos/multiple/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Objetivo.objects.count(), cantidad)
+        self.assertFalse(EventoObjetivo.objects.exists())
+
+    @patch("objetivos.recalculo.django_rq")
+    def test_create_objetivo_cualitativo_crea_alumno_objetivos(self, mock):
+        """
+        Test de que al crear un Objetivo cualitativo se crea un
+        AlumnoObjetivo no alcanzado por alumno del seguimiento
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        data = {
+            "seguimiento": self.seguimiento_1.id,
+            "objetivos": [
+                {
+                    "valor_objetivo_cuantitativo": 85,
+                    "tipo_objetivo": self.tipo_objetivo_3.id,
+                },
+                {
+                    "descripcion": "Holasss",
+                    "tipo_objetivo": self.tipo_objetivo_1.id,
+                },
+            ],
+        }
+        response = self.client.post(
+            "/api/objetivos/multiple/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        cuantitativo, cualitativo = [o["id"] for o in response.data]
+        self.assertFalse(
+            AlumnoObjetivo.objects.filter(objetivo_id=cuantitativo).exists()
+        )
+        alumno_objetivos = AlumnoObjetivo.objects.filter(
+            objetivo_id=cualitativo
+        )
+        self.assertEqual(
+            sorted(a.alumno_curso_id for a in alumno_objetivos),
+            sorted([self.alumno_curso_1.id, self.alumno_curso_2.id]),
+        )
+        self.assertFalse(any(a.alcanzada for a in alumno_objetivos))
+
+        # Volver a crearlos no los duplica
+        crear_alumno_objetivos_cualitativos(
+            Objetivo.objects.filter(pk=cualitativo)
+        )
+        self.assertEqual(
+            AlumnoObjetivo.objects.filter(objetivo_id=cualitativo).count(), 2
+        )
+
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_admin(self, mock):
         """
         Test de creacion correcta de Objetivo por admin
@@ -335,7 +460,7 @@ class ObjetivoTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(response.data["id"])
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_docente(self, mock):
         """
         Test de creacion de Objetivo por docente
@@ -351,7 +476,7 @@ class ObjetivoTests(APITestCase):
         response = self.client.post("/api/objetivos/", data, format="json")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_otra_institucion(self, mock):
         """
         Test de creacion de Objetivo para un seguimiento de otra institucion
@@ -368,7 +493,7 @@ class ObjetivoTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(response.data["detail"], "No encontrado.")
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_no_en_progreso(self, mock):
         """
         Test de creacion de Objetivo para un seguimiento que no está en progreso
@@ -388,7 +513,7 @@ class ObjetivoTests(APITestCase):
             "No se puede modificar un Seguimiento que no se encuentra en progreso",
         )
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_no_integrante(self, mock):
         """
         Test de creacion de Objetivo para un seguimiento del que no es integrante
@@ -405,7 +530,7 @@ class ObjetivoTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(response.data["detail"], "No encontrado.")
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_no_encargado(self, mock):
         """
         Test de creacion de Objetivo para un seguimiento del que no es encargado
@@ -424,7 +549,7 @@ class ObjetivoTests(APITestCase):
             response.data["detail"], "No tiene permiso para crear un objetivo"
         )
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_cualitativo_sin_descripcion(self, mock):
         """
         Test de creacion de Objetivo cualitativo sin descripción
@@ -444,7 +569,7 @@ class ObjetivoTests(APITestCase):
             "Para este tipo de objetivos es necesario fijar una descripción",
         )
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_cuantitativo_sin_valor(self, mock):
         """
         Test de creacion de Objetivo cuantitativo sin valor
@@ -463,7 +588,7 @@ class ObjetivoTests(APITestCase):
             f"No se ingreso un valor, o no se encuentra en el rango permitido de {float(tipo_objetivo.valor_minimo)} a {float(tipo_objetivo.valor_maximo)}",
         )
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_cuantitativo_fuera_rango(self, mock):
         """
         Test de creacion de Objetivo cuantitativo valor fuera de rango
@@ -483,7 +608,7 @@ class ObjetivoTests(APITestCase):
             f"No se ingreso un valor, o no se encuentra en el rango permitido de {float(tipo_objetivo.valor_minimo)} a {float(tipo_objetivo.valor_maximo)}",
         )
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_cuantitativo_no_multiple(self, mock):
         """
         Test de creacion de Objetivo cuantitativo no multiple
@@ -503,7 +628,7 @@ class ObjetivoTests(APITestCase):
             "Ya existe un objetivo de este mismo tipo en el seguimiento. No está permitido tener dos objetivos del mismo tipo",
         )
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_tipo_no_existente(self, mock):
         """
         Test de creacion de Objetivo cuantitativo con tipo no existente
@@ -519,7 +644,7 @@ class ObjetivoTests(APITestCase):
         response = self.client.post("/api/objetivos/", data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @patch("objetivos.api.views.django_rq")
+    @patch("objetivos.recalculo.django_rq")
     def test_create_objetivo_seguimiento_no_existente(self, mock):
         """
         Test de creacion de Objetivo cuantitativo con seguimiento no existente
@@ -581,6 +706,44 @@ class ObjetivoTests(APITestCase):
         )
         self.assertFalse(objetivo_alumno_2.alcanzada)
 
+    def test_update_objetivo_cuantitativo_evalua_ultimo_valor(self):
+        """
+        Test de modificación de Objetivo cuantitativo que evalúa solo el
+        último valor de cada alumno y desmarca al que deja de alcanzarlo
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        objetivo_id = self.objetivo_2.id
+        anterior = AlumnoObjetivo.objects.create(
+            objetivo=self.objetivo_2,
+            alumno_curso=self.alumno_curso_2,
+            fecha_relacionada=datetime.date(2000, 1, 1),
+            valor=90,
+            alcanzada=False,
+        )
+        response = self.client.patch(
+            f"/api/objetivos/{objetivo_id}/",
+            {"valor_objetivo_cuantitativo": 60},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            AlumnoObjetivo.objects.get(pk=self.alumno_objetivo_1.id).alcanzada
+        )
+        self.assertFalse(
+            AlumnoObjetivo.objects.get(pk=self.alumno_objetivo_2.id).alcanzada
+        )
+        self.assertFalse(AlumnoObjetivo.objects.get(pk=anterior.id).alcanzada)
+
+        response = self.client.patch(
+            f"/api/objetivos/{objetivo_id}/",
+            {"valor_objetivo_cuantitativo": 70},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            AlumnoObjetivo.objects.get(pk=self.alumno_objetivo_1.id).alcanzada
+        )
+
     def test_update_objetivo_cuantitativo_valor_fuera_rango(self):
         """
         Test de modificación de Objetivo cuantitativo con su valor fuera de rango
@@ -881,6 +1044,11 @@ class AlumnoObjetivoTests(APITestCase):
         cls.group_admin.permissions.add(
             Permission.objects.get(name="Can view alumno objetivo")
         )
+        cls.group_admin.permissions.add(
+            Permission.objects.get(
+                name="Puede ver el tablero de objetivos de un seguimiento"
+            )
+        )
         cls.group_admin.save()
 
         cls.group_docente = Group.objects.create(name="Docente")
@@ -1033,6 +1201,7 @@ class AlumnoObjetivoTests(APITestCase):
             nombre="Promedio notas",
             cuantitativo=True,
             multiple=False,
+            calculador="promedio",
             valor_minimo=0,
             valor_maximo=100,
         )
@@ -1148,7 +1317,8 @@ class AlumnoObjetivoTests(APITestCase):
 
     def test_get_cualitativa_no_existente(self):
         """
-        Test de obtencion de AlumnoObjetivo cualitativa no existente
+        Test de obtencion de AlumnoObjetivo cualitativa no existente, que se
+        responde sin crearla
         """
         self.client.force_authenticate(user=self.user_admin)
         self.alumno_objetivo_3.delete()
@@ -1169,6 +1339,7 @@ class AlumnoObjetivoTests(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(isinstance(response.data, dict))
+        self.assertFalse(response.data["alcanzada"])
         self.assertEquals(
             len(
                 AlumnoObjetivo.objects.filter(
@@ -1176,7 +1347,7 @@ class AlumnoObjetivoTests(APITestCase):
                     alumno_curso__exact=self.alumno_curso_1,
                 )
             ),
-            1,
+            0,
         )
 
         AlumnoObjetivo.objects.filter(
@@ -1205,7 +1376,7 @@ class AlumnoObjetivoTests(APITestCase):
                     alumno_curso__exact=self.alumno_curso_1,
                 )
             ),
-            1,
+            0,
         )
 
     def test_get_cuantitativa_no_existente(self):
@@ -1450,3 +1621,362 @@ class AlumnoObjetivoTests(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(isinstance(response.data, dict))
+
+
+    #############
+    #  TABLERO  #
+    #############
+
+    def test_tablero_seguimiento(self):
+        """
+        Test del tablero con el último valor de cada objetivo por alumno
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        # Se buscan de nuevo porque otros tests borran las instancias
+        cualitativo, cuantitativo = Objetivo.objects.filter(
+            seguimiento=self.seguimiento_1
+        ).order_by("id")
+        AlumnoObjetivo.objects.create(
+            objetivo=cuantitativo,
+            alumno_curso=self.alumno_curso_1,
+            fecha_relacionada=datetime.date(2000, 1, 1),
+            valor=90,
+            alcanzada=True,
+        )
+        response = self.client.get(
+            f"/api/objetivos/seguimiento/{self.seguimiento_1.id}/tablero/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["seguimiento"], self.seguimiento_1.id)
+        self.assertEqual(
+            [o["id"] for o in response.data["objetivos"]],
+            [cualitativo.id, cuantitativo.id],
+        )
+        celdas = {
+            alumno["alumno_curso"]: [
+                (c["objetivo"], c["valor"], c["alcanzada"])
+                for c in alumno["objetivos"]
+            ]
+            for alumno in response.data["alumnos"]
+        }
+        self.assertEqual(
+            celdas,
+            {
+                self.alumno_curso_1.id: [
+                    (cualitativo.id, None, True),
+                    (cuantitativo.id, 65, False),
+                ],
+                self.alumno_curso_2.id: [
+                    (cualitativo.id, None, False),
+                    (cuantitativo.id, 50, False),
+                ],
+            },
+        )
+
+    def test_tablero_consultas_no_dependen_de_alumnos(self):
+        """
+        Test de que el tablero no hace más consultas con más alumnos
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        url = f"/api/objetivos/seguimiento/{self.seguimiento_1.id}/tablero/"
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url)
+        alumno = Alumno.objects.create(
+            dni=4, nombre="Alumno4", apellido="4", institucion=self.institucion_1
+        )
+        alumno_curso = AlumnoCurso.objects.create(
+            alumno=alumno, curso=self.curso_1, anio_lectivo=self.anio_lectivo_1
+        )
+        self.seguimiento_1.alumnos.add(alumno_curso)
+        AlumnoObjetivo.objects.create(
+            objetivo=Objetivo.objects.filter(
+                seguimiento=self.seguimiento_1, tipo_objetivo__cuantitativo=True
+            ).get(),
+            alumno_curso=alumno_curso,
+            valor=80,
+            alcanzada=True,
+        )
+        with self.assertNumQueries(len(consultas)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["alumnos"]), 3)
+
+    def test_tablero_seguimiento_otra_institucion(self):
+        """
+        Test del tablero de un seguimiento de otra institución
+        """
+        self.client.force_authenticate(user=self.user_admin)
+        response = self.client.get(
+            f"/api/objetivos/seguimiento/{self.seguimiento_3.id}/tablero/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tablero_sin_permiso(self):
+        """
+        Test del tablero sin el permiso
+        """
+        self.client.force_authenticate(user=self.user_docente)
+        response = self.client.get(
+            f"/api/objetivos/seguimiento/{self.seguimiento_1.id}/tablero/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+@patch("objetivos.recalculo.django_rq")
+class RecalculoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.institucion = Institucion.objects.create(
+            nombre="Institucion_1", identificador="1234"
+        )
+        cls.alumno = Alumno.objects.create(
+            dni=1, nombre="Alumno", apellido="1", institucion=cls.institucion,
+        )
+        cls.materia = Materia.objects.create(
+            nombre="Matematicas",
+            anio=Anio.objects.create(
+                nombre="Anio1",
+                carrera=Carrera.objects.create(
+                    nombre="Carrera1", institucion=cls.institucion
+                ),
+            ),
+        )
+
+    def test_drenar_agrupa_por_alumno(self, mock_rq):
+        """
+        Test de que el drenado pide un recalculo por alumno y tipo, desde
+        la fecha mas temprana, y vacia el outbox
+        """
+        recalculo.recalcular_asistencias(
+            [self.alumno.id], datetime.date(2019, 3, 6)
+        )
+        recalculo.recalcular_asistencia(self.alumno.id, "2019-03-04")
+        recalculo.recalcular_calificacion(
+            self.alumno.id, self.materia.id, datetime.date(2019, 3, 5)
+        )
+        with patch("objetivos.recalculo.encolar_recalculo") as encolar:
+            eventos, grupos = recalculo.drenar_eventos()
+
+        self.assertEqual((eventos, grupos), (3, 2))
+        encolar.assert_any_call(
+            recalculo.ASISTENCIA,
+            self.alumno.id,
+            datetime.date(2019, 3, 4),
+            None,
+        )
+        encolar.assert_any_call(
+            recalculo.CALIFICACION,
+            self.alumno.id,
+            datetime.date(2019, 3, 5),
+            self.materia.id,
+        )
+        self.assertFalse(EventoRecalculo.objects.exists())
+
+    def test_calculador_de_tipo_objetivo(self, mock_rq):
+        """
+        Test de que el calculador sale sólo del campo calculador y no del
+        nombre del tipo de objetivo
+        """
+        presentismo = TipoObjetivo(
+            nombre="Presentismo",
+            cuantitativo=True,
+            multiple=False,
+            calculador="asistencia",
+        )
+        promedio = TipoObjetivo(
+            nombre="Promedio de asistencia",
+            cuantitativo=True,
+            multiple=False,
+            calculador="promedio",
+        )
+        sin_calculador = TipoObjetivo(
+            nombre="Promedio general", cuantitativo=True, multiple=False
+        )
+        cualitativo = TipoObjetivo(
+            nombre="Promedio de conducta", cuantitativo=False, multiple=True
+        )
+        self.assertIs(
+            recalculo.calculador_de(presentismo),
+            recalculo.CALCULADORES["asistencia"],
+        )
+        self.assertIs(
+            recalculo.calculador_de(promedio),
+            recalculo.CALCULADORES["promedio"],
+        )
+        self.assertFalse(
+            recalculo.CALCULADORES["asistencia"].corresponde(promedio)
+        )
+        self.assertIsNone(recalculo.calculador_de(sin_calculador))
+        self.assertIsNone(recalculo.calculador_de(cualitativo))
+
+    def test_calculador_requerido_tipo_objetivo(self, mock_rq):
+        """
+        Test de que un tipo cuantitativo simple necesita calculador y los
+        demás no lo aceptan
+        """
+        for data, valido in (
+            ({"cuantitativo": True, "multiple": False}, False),
+            (
+                {
+                    "cuantitativo": True,
+                    "multiple": False,
+                    "calculador": "promedio",
+                },
+                True,
+            ),
+            (
+                {
+                    "cuantitativo": False,
+                    "multiple": True,
+                    "calculador": "asistencia",
+                },
+                False,
+            ),
+            ({"cuantitativo": False, "multiple": True}, True),
+        ):
+            serializer = serializers.CreateTipoObjetivoSerializer(
+                data={"nombre": "Tipo", **data}
+            )
+            self.assertEqual(serializer.is_valid(), valido, data)
+
+    def test_drenar_conserva_eventos_si_falla(self, mock_rq):
+        """
+        Test de que los eventos quedan en el outbox si no se pudo encolar
+        """
+        recalculo.recalcular_asistencia(
+            self.alumno.id, datetime.date(2019, 3, 4)
+        )
+        with patch(
+            "objetivos.recalculo.encolar_recalculo", side_effect=Exception
+        ):
+            with self.assertRaises(Exception):
+                recalculo.drenar_eventos()
+        self.assertEqual(EventoRecalculo.objects.count(), 1)
+
+    def test_primer_pedido_encola_job(self, mock_rq):
+        """
+        Test de que el primer pedido para un alumno encola un job demorado
+        """
+        mock_rq.get_connection().register_script.return_value = Mock(
+            return_value=1
+        )
+        encolado = recalculo.encolar_recalculo(
+            recalculo.ASISTENCIA, 7, datetime.date(2019, 3, 4)
+        )
+        self.assertTrue(encolado)
+        unir_fecha = mock_rq.get_connection().register_script.return_value
+        self.assertEqual(
+            unir_fecha.call_args[1]["keys"][0], "recalculo:asistencia:7"
+        )
+        self.assertEqual(unir_fecha.call_args[1]["args"][0], "2019-03-04")
+        args = mock_rq.get_queue().enqueue_in.call_args[0]
+        self.assertEqual(
+            args[1:],
+            (recalculo.ejecutar_recalculo, "asistencia", 7, "2019-03-04", None),
+        )
+
+    def test_drenar_reintenta_si_falla_encolado(self, mock_rq):
+        """
+        Test de que si falla el encolado del job la fecha pendiente no queda
+        en Redis y el siguiente drenado vuelve a encolarlo
+        """
+        pendientes = {}
+
+        def unir_fecha(keys, args):
+            if keys[0] in pendientes:
+                return 0
+            pendientes[keys[0]] = args[0]
+            return 1
+
+        conexion = mock_rq.get_connection()
+        conexion.register_script.return_value = Mock(side_effect=unir_fecha)
+        conexion.delete.side_effect = pendientes.pop
+        queue = mock_rq.get_queue()
+        queue.enqueue_in.side_effect = [ConnectionError, None]
+
+        recalculo.recalcular_asistencia(
+            self.alumno.id, datetime.date(2019, 3, 4)
+        )
+        with self.assertRaises(ConnectionError):
+            recalculo.drenar_eventos()
+        self.assertEqual(pendientes, {})
+        self.assertEqual(EventoRecalculo.objects.count(), 1)
+
+        self.assertEqual(recalculo.drenar_eventos(), (1, 1))
+        self.assertEqual(queue.enqueue_in.call_count, 2)
+        self.assertEqual(
+            queue.enqueue_in.call_args[0][1:],
+            (
+                recalculo.ejecutar_recalculo,
+                "asistencia",
+                self.alumno.id,
+                "2019-03-04",
+                None,
+            ),
+        )
+        self.assertFalse(EventoRecalculo.objects.exists())
+
+    def test_pedido_pendiente_no_encola(self, mock_rq):
+        """
+        Test de que un pedido con un job pendiente se une a ese job
+        """
+        mock_rq.get_connection().register_script.return_value = Mock(
+            return_value=0
+        )
+        encolado = recalculo.encolar_recalculo(
+            recalculo.CALIFICACION, 7, datetime.date(2019, 3, 4), 3
+        )
+        self.assertFalse(encolado)
+        mock_rq.get_queue().enqueue_in.assert_not_called()
+        mock_rq.get_queue().enqueue.assert_not_called()
+
+    def test_ejecutar_usa_fecha_mas_temprana(self, mock_rq):
+        """
+        Test de que el job recalcula desde la fecha pendiente más temprana
+        """
+        mock_rq.get_connection().pipeline().execute.return_value = [
+            b"2019-03-01",
+            1,
+        ]
+        recalculo_calificacion = Mock(return_value=None)
+        with patch.dict(
+            recalculo.RECALCULOS,
+            {recalculo.CALIFICACION: recalculo_calificacion},
+        ):
+            recalculo.ejecutar_recalculo(
+                recalculo.CALIFICACION, 7, "2019-03-04", 3
+            )
+        recalculo_calificacion.assert_called_once_with(
+            7, 3, datetime.date(2019, 3, 1)
+        )
+
+    def test_ejecutar_cuenta_filas_escritas(self, mock_rq):
+        """
+        Test de que el job suma a las estadísticas las filas que escribió
+        """
+        pipeline = mock_rq.get_connection().pipeline()
+        pipeline.execute.return_value = [None, 0]
+        filas = {"insertados": 1, "actualizados": 2, "eliminados": 0}
+        with patch.dict(
+            recalculo.RECALCULOS,
+            {recalculo.ASISTENCIA: Mock(return_value=filas)},
+        ):
+            recalculo.ejecutar_recalculo(recalculo.ASISTENCIA, 7, "2019-03-04")
+        pipeline.hincrby.assert_any_call(
+            recalculo.CLAVE_ESTADISTICAS, "asistencia:actualizados", 2
+        )
+        self.assertEqual(pipeline.hincrby.call_count, 3)
+
+    def test_estadisticas(self, mock_rq):
+        """
+        Test de lectura de los contadores de coalescencia
+        """
+        mock_rq.get_connection().hgetall.return_value = {
+            b"asistencia:encolados": b"2",
+            b"asistencia:coalescidos": b"5",
+        }
+        estadisticas = recalculo.estadisticas_recalculo()
+        self.assertEqual(
+            estadisticas["asistencia"], {"encolados": 2, "coalescidos": 5}
+        )
+        self.assertEqual(
+            estadisticas["calificacion"], {"encolados": 0, "coalescidos": 0}
+        )
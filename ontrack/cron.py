@@ -13,3 +13,12 @@ class Backup(CronJobBase):
     def do(self):
         management.call_command("dbbackup")
         management.call_command("mediabackup", clean=True)
+
+
+class CursosSinAsistencia(CronJobBase):
+    RUN_AT_TIMES = ["20:00"]
+    schedule = Schedule(run_at_times=RUN_AT_TIMES)
+    code = "asistencias.CursosSinAsistencia"
+
+    def do(self):
+        management.call_command("cursos_sin_asistencia")
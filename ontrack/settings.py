@@ -194,6 +194,7 @@ SWAGGER_SETTINGS = {
 
 CRON_CLASSES = [
     "ontrack.cron.Backup",
+    "ontrack.cron.CursosSinAsistencia",
 ]
 
 
@@ -0,0 +1,9 @@
+"""
+Utilidades compartidas por los tests de las apps.
+"""
+
+# Cache en memoria para los tests que guardan resultados cacheados, así no
+# dependen de tener Redis levantado.
+CACHE_LOCAL = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
@@ -0,0 +1,47 @@
+"""
+Versiones en cache para invalidar resultados cacheados.
+
+Cada resultado guarda en su clave la versión de lo que depende (un curso,
+un alumno, una institución). Invalidar es incrementar esa versión: las
+claves viejas dejan de leerse y vencen solas.
+"""
+import logging
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def version(clave):
+    """
+    Devuelve la versión guardada en la clave. Si se perdió del cache arranca
+    de un valor que no se haya usado antes, para no volver a leer
+    resultados de versiones anteriores.
+    """
+    cache.add(clave, int(time.time() * 1000000), None)
+    return cache.get(clave)
+
+
+def incrementar_versiones(claves):
+    """
+    Incrementa las versiones ya mismo, para que la misma transacción no lea
+    un resultado viejo, y otra vez al confirmar, por si otra consulta cacheó
+    el estado anterior mientras la transacción seguía abierta. Si el cache
+    no responde el cambio se guarda igual: los resultados cacheados vencen
+    solos.
+    """
+    claves = list(claves)
+
+    def incrementar():
+        try:
+            for clave in claves:
+                version(clave)
+                cache.incr(clave)
+        except Exception:
+            logger.exception("No se pudo invalidar el cache")
+
+    # Fuera de una transacción on_commit ya lo incrementa en el momento
+    if transaction.get_connection().in_atomic_block:
+        incrementar()
+    transaction.on_commit(incrementar)